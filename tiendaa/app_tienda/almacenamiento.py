@@ -0,0 +1,112 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Archivos a medio subir (limpiar_archivos no los registra)
+PREFIJO_TEMPORAL = '.subiendo-'
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    Guarda cada archivo con el nombre de su hash SHA-256 dentro de la carpeta
+    de upload_to: subir dos veces la misma imagen apunta al mismo archivo en
+    disco en lugar de crear "1_nRYSkE3.webp", "1_tNB6dlB.webp", etc.
+    Las referencias se cuentan en ArchivoAlmacenado (ver referencias.py) y el
+    comando limpiar_archivos borra los que quedan sin uso.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo se calcula en _save a partir del contenido
+        return name
+
+    def _save(self, name, content):
+        huella = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for bloque in content.chunks():
+            huella.update(bloque)
+        content.seek(0)
+
+        carpeta = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        nombre = os.path.join(carpeta, huella.hexdigest() + extension).replace('\\', '/')
+
+        # Primero la fila y después el archivo, en la misma transacción:
+        # limpiar_archivos reclama la fila antes de borrar el archivo, así que
+        # o esperamos a que termine (y lo escribimos de nuevo) o ve la fila
+        # recién tocada y lo deja
+        with transaction.atomic():
+            registrar_archivo(nombre, content.size)
+            if not self.exists(nombre):
+                self._guardar_exclusivo(nombre, content)
+        return nombre
+
+    def nombre_por_contenido(self, nombre):
+        # Los archivos ya guardados por este storage se llaman <sha256>.<ext>
+        base = os.path.splitext(os.path.basename(nombre))[0]
+        return len(base) == 64 and all(c in '0123456789abcdef' for c in base)
+
+    def _guardar_exclusivo(self, nombre, content):
+        # FileSystemStorage._save reintenta con get_available_name si el
+        # archivo ya existe, y aquí ese nombre nunca cambia. Se escribe a un
+        # temporal y se enlaza con el nombre final: si otra petición guardó el
+        # mismo contenido al mismo tiempo, el enlace falla y el suyo sirve igual.
+        # Nadie ve nunca un archivo a medio escribir.
+        destino = self.path(nombre)
+        carpeta = os.path.dirname(destino)
+        os.makedirs(carpeta, exist_ok=True)
+        temporal = os.path.join(carpeta, f'{PREFIJO_TEMPORAL}{uuid.uuid4().hex}')
+        descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                for bloque in content.chunks():
+                    archivo.write(bloque)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporal, self.file_permissions_mode)
+            try:
+                os.link(temporal, destino)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(temporal)
+
+
+almacenamiento_contenido = AlmacenamientoPorContenido()
+
+
+def obtener_almacenamiento():
+    # Se pasa como callable a los FileField para que las migraciones no dependan de la instancia
+    return almacenamiento_contenido
+
+
+def registrar_archivo(nombre, tamano=0):
+    from .models import ArchivoAlmacenado
+    # Tocar `actualizado` reinicia la gracia: el archivo recién subido todavía
+    # no tiene referencias hasta que se guarde el modelo que lo usa
+    if not ArchivoAlmacenado.objects.filter(nombre=nombre).update(actualizado=timezone.now()):
+        ArchivoAlmacenado.objects.get_or_create(nombre=nombre, defaults={'tamano': tamano or 0})
+
+
+def sumar_referencia(nombre):
+    from .models import ArchivoAlmacenado
+    if not nombre:
+        return
+    if not ArchivoAlmacenado.objects.filter(nombre=nombre).update(referencias=F('referencias') + 1):
+        # Archivos asignados por nombre sin pasar por el storage (p. ej. placeholders)
+        _, creado = ArchivoAlmacenado.objects.get_or_create(nombre=nombre, defaults={'referencias': 1})
+        if not creado:
+            ArchivoAlmacenado.objects.filter(nombre=nombre).update(referencias=F('referencias') + 1)
+
+
+def restar_referencia(nombre):
+    from .models import ArchivoAlmacenado
+    if nombre:
+        # La fecha marca desde cuándo corre el periodo de gracia antes de borrarlo
+        ArchivoAlmacenado.objects.filter(nombre=nombre, referencias__gt=0).update(
+            referencias=F('referencias') - 1, actualizado=timezone.now()
+        )
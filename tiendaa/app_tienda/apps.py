@@ -3,4 +3,10 @@ from django.apps import AppConfig
 
 class AppTiendaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'app_tienda'
\ No newline at end of file
+    name = 'app_tienda'
+
+    def ready(self):
+        # Conteo de referencias de los archivos subidos, invalidación de cachés,
+        # contador de consultas por petición, triggers del índice de búsqueda y
+        # contador de bajas del catálogo
+        from . import busqueda, cupones, iva, medicion, referencias, revalidacion, roles  # noqa: F401
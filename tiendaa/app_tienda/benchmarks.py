@@ -0,0 +1,35 @@
+import random
+import statistics
+
+# Utilidades compartidas por los comandos bench_* (no se usan en las vistas)
+
+# Usuarios, SKU y cupones de generar_datos empiezan así; bench_carga los busca por este prefijo
+PREFIJO_CARGA = 'carga'
+
+MARCAS = ['Hyalu', 'Mela', 'Cicaplast', 'Effaclar', 'Toleriane', 'Lipikar', 'Anthelios', 'Pure Vitamin']
+TIPOS = ['Sérum', 'Crema', 'Gel Limpiador', 'Protector Solar', 'Tónico', 'Bálsamo', 'Loción', 'Mascarilla']
+ACTIVOS = [
+    'Ácido Hialurónico', 'Niacinamida', 'Vitamina C', 'Retinol', 'Pantenol',
+    'Ceramidas', 'Ácido Salicílico', 'Melasyl™', 'Péptidos', 'Agua Termal',
+]
+DETALLES = ['Piel Sensible', 'Piel Grasa', 'Antimanchas', 'Hidratante', 'Reparador', 'SPF 50+', 'Noche', 'Día']
+
+
+def nombre_producto(rnd=random):
+    return f'{rnd.choice(MARCAS)} {rnd.choice(TIPOS)} {rnd.choice(ACTIVOS)} {rnd.choice(DETALLES)} {rnd.randint(30, 500)}ml'
+
+
+def percentiles(muestras):
+    # Devuelve p50/p95/p99 en milisegundos a partir de muestras en segundos
+    if not muestras:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    if len(muestras) == 1:
+        valor = round(muestras[0] * 1000, 3)
+        return {'p50': valor, 'p95': valor, 'p99': valor}
+    cortes = statistics.quantiles(muestras, n=100, method='inclusive')
+    return {
+        'p50': round(cortes[49] * 1000, 3),
+        'p95': round(cortes[94] * 1000, 3),
+        'p99': round(cortes[98] * 1000, 3),
+    }
+
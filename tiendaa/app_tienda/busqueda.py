@@ -0,0 +1,105 @@
+import re
+import unicodedata
+
+from django.db import connection, connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .models import Producto
+
+# Índice de texto completo (FTS5) sobre Producto.nombre. Solo existe en SQLite;
+# en otros motores se usa la búsqueda por ORM de más abajo. Lo mantienen
+# triggers sobre app_tienda_producto (migración 0021): cualquier INSERT, UPDATE
+# o DELETE lo actualiza, venga del ORM, del admin o de SQL directo.
+TABLA_FTS = 'app_tienda_producto_fts'
+LIMITE_RESULTADOS = 50
+
+# Los de la migración 0021. SQLite los borra con la tabla cuando una migración
+# la reconstruye (así aplica Django casi todos los ALTER), por eso después de
+# cada migrate se vuelven a crear si faltan (ver asegurar_triggers)
+TRIGGERS = {
+    'app_tienda_producto_fts_ai': (
+        "AFTER INSERT ON app_tienda_producto BEGIN "
+        f"INSERT INTO {TABLA_FTS} (rowid, nombre) VALUES (new.id, new.nombre); END"
+    ),
+    'app_tienda_producto_fts_ad': (
+        "AFTER DELETE ON app_tienda_producto BEGIN "
+        f"DELETE FROM {TABLA_FTS} WHERE rowid = old.id; END"
+    ),
+    'app_tienda_producto_fts_au': (
+        "AFTER UPDATE OF id, nombre ON app_tienda_producto BEGIN "
+        f"DELETE FROM {TABLA_FTS} WHERE rowid = old.id; "
+        f"INSERT INTO {TABLA_FTS} (rowid, nombre) VALUES (new.id, new.nombre); END"
+    ),
+}
+
+
+def normalizar(texto):
+    # "Sérum Ácido" -> "serum acido"
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return texto.lower()
+
+
+def terminos(texto):
+    # Solo letras y números: evita inyectar sintaxis de FTS5 (comillas, NEAR, *, etc.)
+    return re.findall(r'\w+', normalizar(texto))
+
+
+_fts_por_base = {}
+
+
+def fts_disponible():
+    # Se consulta el esquema una sola vez por base de datos
+    nombre = str(connection.settings_dict['NAME'])
+    if nombre not in _fts_por_base:
+        _fts_por_base[nombre] = (
+            connection.vendor == 'sqlite' and TABLA_FTS in connection.introspection.table_names()
+        )
+    return _fts_por_base[nombre]
+
+
+def buscar_productos(texto, limite=LIMITE_RESULTADOS):
+    """
+    Búsqueda por prefijo e insensible a tildes. En SQLite usa el índice FTS5
+    ordenado por relevancia (bm25); en otros motores cae a icontains.
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return []
+
+    if fts_disponible():
+        # Cada palabra como prefijo: "hial aci" -> "hial"* "aci"*
+        consulta = ' '.join(f'"{p}"*' for p in palabras)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s ORDER BY rank LIMIT %s',
+                [consulta, limite],
+            )
+            ids = [fila[0] for fila in cursor.fetchall()]
+        encontrados = Producto.objects.in_bulk(ids)
+        return [encontrados[i] for i in ids if i in encontrados]
+
+    productos = Producto.objects.all()
+    for palabra in palabras:
+        productos = productos.filter(nombre__icontains=palabra)
+    return list(productos.order_by('nombre', 'id')[:limite])
+
+
+@receiver(post_migrate)
+def asegurar_triggers(sender, using, **kwargs):
+    if sender.label != 'app_tienda':
+        return
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite' or TABLA_FTS not in conexion.introspection.table_names():
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'app_tienda_producto'")
+        faltan = set(TRIGGERS) - {fila[0] for fila in cursor.fetchall()}
+        if not faltan:
+            return
+        for nombre in faltan:
+            cursor.execute(f'CREATE TRIGGER {nombre} {TRIGGERS[nombre]}')
+        # Mientras faltaban, el índice pudo quedar desfasado
+        cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        cursor.execute(f'INSERT INTO {TABLA_FTS} (rowid, nombre) SELECT id, nombre FROM app_tienda_producto')
@@ -0,0 +1,110 @@
+from decimal import Decimal
+
+from django.contrib import messages
+
+from .models import Producto
+from .reservas import aclave_carrito, areservado_por_otros, clave_carrito, reservado_por_otros
+
+# En la sesión el carrito es solo {"<producto_id>": cantidad}. Nombre, precio
+# y disponibilidad se leen de la base al mostrarlo o al pagar, así nunca
+# quedan desactualizados y cada clic escribe unos pocos bytes.
+CLAVE_SESION = 'carrito'
+
+
+def _normalizar(carrito):
+    # Sesiones de antes guardaban un dict por producto
+    return {
+        producto_id: item['cantidad'] if isinstance(item, dict) else item
+        for producto_id, item in (carrito or {}).items()
+    }
+
+
+def obtener(request):
+    return _normalizar(request.session.get(CLAVE_SESION))
+
+
+async def aobtener(request):
+    return _normalizar(await request.session.aget(CLAVE_SESION))
+
+
+def guardar(request, carrito):
+    request.session[CLAVE_SESION] = carrito
+
+
+async def aguardar(request, carrito):
+    await request.session.aset(CLAVE_SESION, carrito)
+
+
+def vaciar(request):
+    request.session[CLAVE_SESION] = {}
+
+
+def _quitar(request, carrito, producto_ids):
+    # Productos borrados: si siguieran en la sesión ningún checkout pasaría.
+    # Sus reservas ya no existen (se borran en cascada con el producto)
+    for producto_id in producto_ids:
+        carrito.pop(str(producto_id), None)
+    messages.warning(request, 'Algunos productos de tu carrito ya no están disponibles y se quitaron.')
+
+
+def descartar(request, carrito, producto_ids):
+    """Quita del carrito (en su lugar) los productos que ya no existen."""
+    _quitar(request, carrito, producto_ids)
+    guardar(request, carrito)
+
+
+async def adescartar(request, carrito, producto_ids):
+    _quitar(request, carrito, producto_ids)
+    await aguardar(request, carrito)
+
+
+def _faltantes(carrito, productos):
+    return [producto_id for producto_id in carrito if int(producto_id) not in productos]
+
+
+def _productos(carrito):
+    return Producto.objects.only('id', 'nombre', 'precio_base', 'stock', 'imagen').filter(
+        id__in=[int(producto_id) for producto_id in carrito]
+    )
+
+
+def _lineas(carrito, productos, reservado):
+    items, total = {}, Decimal('0.00')
+    for producto_id, cantidad in carrito.items():
+        producto = productos[int(producto_id)]
+        subtotal = producto.precio_base * cantidad
+        items[producto_id] = {
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'precio': producto.precio_base,
+            'cantidad': cantidad,
+            'stock': max(producto.stock - reservado.get(producto.id, 0), 0),  # máximo que este carrito puede apartar
+            'imagen': producto.imagen.url if producto.imagen else '',
+            'subtotal_item': subtotal,
+        }
+        total += subtotal
+    return items, total
+
+
+def resolver(request, carrito):
+    """
+    Arma las líneas para mostrar: {"<id>": {id, nombre, precio, cantidad,
+    stock, imagen, subtotal_item}} y el total, con una consulta de productos
+    y otra de reservas. Los productos que ya no existen se quitan del
+    carrito de la sesión (ver descartar).
+    """
+    productos = {producto.id: producto for producto in _productos(carrito)}
+    faltantes = _faltantes(carrito, productos)
+    if faltantes:
+        descartar(request, carrito, faltantes)
+    reservado = reservado_por_otros(list(productos), clave_carrito(request))
+    return _lineas(carrito, productos, reservado)
+
+
+async def aresolver(request, carrito):
+    productos = {producto.id: producto async for producto in _productos(carrito)}
+    faltantes = _faltantes(carrito, productos)
+    if faltantes:
+        await adescartar(request, carrito, faltantes)
+    reservado = await areservado_por_otros(list(productos), await aclave_carrito(request))
+    return _lineas(carrito, productos, reservado)
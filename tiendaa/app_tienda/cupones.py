@@ -0,0 +1,89 @@
+import re
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CanjeCupon, Cupon
+
+# Cada código consultado se guarda en la caché compartida: los válidos con sus
+# datos y los inexistentes como "no existe" durante menos tiempo. Así un bot
+# probando códigos inventados no llega a la base más de una vez por código.
+CLAVE_CUPON = 'cupon:{}'
+SEGUNDOS_CUPON = 300
+SEGUNDOS_INEXISTENTE = 60
+NO_EXISTE = 'no-existe'
+FORMATO_CODIGO = re.compile(r'^[A-Z0-9_-]{1,20}$')
+
+
+class CuponNoValido(Exception):
+    pass
+
+
+def normalizar_codigo(codigo):
+    return (codigo or '').strip().upper()
+
+
+def _datos_cupon(codigo):
+    clave = CLAVE_CUPON.format(codigo)
+    datos = cache.get(clave)
+    if datos is None:
+        cupon = (
+            Cupon.objects.filter(codigo=codigo, activo=True)
+            .values('id', 'descuento_porcentaje', 'valido_desde', 'valido_hasta', 'usos_maximos', 'usos_por_usuario')
+            .first()
+        )
+        datos = cupon or NO_EXISTE
+        cache.set(clave, datos, SEGUNDOS_CUPON if cupon else SEGUNDOS_INEXISTENTE)
+    return None if datos == NO_EXISTE else datos
+
+
+def validar_cupon(codigo, ahora=None):
+    """
+    Devuelve los datos del cupón si está activo y dentro de su vigencia.
+    Las fechas se revisan con los datos en caché, sin consultas extra.
+    Los límites de uso se comprueban al canjear (ver canjear_cupon).
+    """
+    codigo = normalizar_codigo(codigo)
+    # Códigos con forma imposible ni siquiera se buscan
+    if not FORMATO_CODIGO.match(codigo):
+        raise CuponNoValido('El cupón no existe o no está activo.')
+    datos = _datos_cupon(codigo)
+    if datos is None:
+        raise CuponNoValido('El cupón no existe o no está activo.')
+
+    ahora = ahora or timezone.now()
+    if datos['valido_desde'] and ahora < datos['valido_desde']:
+        raise CuponNoValido('El cupón todavía no está vigente.')
+    if datos['valido_hasta'] and ahora > datos['valido_hasta']:
+        raise CuponNoValido('El cupón ya venció.')
+    return datos
+
+
+def canjear_cupon(datos, usuario):
+    """
+    Suma un uso al cupón y al cliente con UPDATE condicionados (sin leer y
+    luego escribir), así dos compras simultáneas no pueden pasarse del límite.
+    Debe llamarse dentro de la transacción del pedido.
+    """
+    with transaction.atomic():
+        usos_libres = Q(usos_maximos__isnull=True) | Q(usos__lt=F('usos_maximos'))
+        if not Cupon.objects.filter(usos_libres, id=datos['id'], activo=True).update(usos=F('usos') + 1):
+            raise CuponNoValido('El cupón ya alcanzó su límite de usos.')
+
+        canje, _ = CanjeCupon.objects.get_or_create(cupon_id=datos['id'], usuario=usuario)
+        canjes = CanjeCupon.objects.filter(id=canje.id)
+        if datos['usos_por_usuario'] is not None:
+            canjes = canjes.filter(usos__lt=datos['usos_por_usuario'])
+        if not canjes.update(usos=F('usos') + 1):
+            raise CuponNoValido('Ya usaste este cupón el máximo de veces permitido.')
+
+
+@receiver(post_save, sender=Cupon)
+@receiver(post_delete, sender=Cupon)
+def invalidar_cupon(sender, instance, **kwargs):
+    # Incluye el caso de un código que antes se guardó como inexistente
+    transaction.on_commit(lambda: cache.delete(CLAVE_CUPON.format(instance.codigo)))
@@ -0,0 +1,38 @@
+from django.db.models import Prefetch
+
+from .models import Pedido, PedidoProducto
+
+# Impresión de órdenes de despacho por lotes: pedidos, clientes, líneas y
+# productos se cargan en dos consultas sin importar cuántos pedidos haya.
+MAXIMO_LOTE = 1000
+
+
+def pedidos_para_despacho(ids=None, estado='Pendiente', limite=MAXIMO_LOTE):
+    """
+    Pedidos a imprimir: los `ids` indicados o, si no hay, los del `estado`
+    (los más antiguos primero, que son los que se despachan antes).
+    Cada pedido trae sus líneas con el producto en `pedido.lineas`.
+    """
+    pedidos = Pedido.objects.select_related('cliente')
+    if ids:
+        pedidos = pedidos.filter(id__in=ids)
+    elif estado in dict(Pedido.ESTADOS):
+        pedidos = pedidos.filter(estado=estado)
+    lineas = PedidoProducto.objects.select_related('producto').only(
+        'pedido_id', 'cantidad', 'producto__id', 'producto__nombre'
+    ).order_by('id')
+    pedidos = pedidos.prefetch_related(Prefetch('items', queryset=lineas, to_attr='lineas'))
+    return list(pedidos.order_by('fecha', 'id')[:min(limite, MAXIMO_LOTE)])
+
+
+def lista_de_recoleccion(pedidos):
+    # Una fila por producto con el total a sacar de bodega y en cuántos pedidos va
+    por_producto = {}
+    for pedido in pedidos:
+        for linea in pedido.lineas:
+            fila = por_producto.setdefault(
+                linea.producto_id, {'producto': linea.producto, 'cantidad': 0, 'pedidos': 0}
+            )
+            fila['cantidad'] += linea.cantidad
+            fila['pedidos'] += 1
+    return sorted(por_producto.values(), key=lambda fila: (fila['producto'].nombre, fila['producto'].id))
@@ -0,0 +1,168 @@
+import gzip
+import mimetypes
+import posixpath
+import re
+from functools import cached_property
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import views as vistas_staticfiles
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    # Opcional: sin él solo se escriben las variantes .gz
+    brotli = None
+
+# Archivos estáticos con huella (perfil TIENDA_ESTATICOS=comprimidos, ver
+# settings.py). collectstatic minifica CSS y JS, les pone el hash del
+# contenido en el nombre (styles.css -> styles.3f2a9c1b7d4e.css, anotado en
+# staticfiles.json) y deja al lado las variantes .gz y .br. {% static %}
+# devuelve el nombre con huella: si el archivo cambia, cambia la URL, así
+# que se puede cachear un año sin revalidar y la segunda visita no descarga
+# ningún estático.
+# `servir` entrega STATIC_ROOT con esas cabeceras y la variante comprimida
+# que acepte el navegador; un nginx delante puede hacer lo mismo con
+# gzip_static/brotli_static y `expires max`.
+UN_ANIO = 60 * 60 * 24 * 365
+COMPRIMIBLES = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.xml', '.html')
+# (codificación, extensión) en orden de preferencia
+VARIANTES = (('br', '.br'), ('gzip', '.gz'))
+
+_COMENTARIOS_O_CADENAS_CSS = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.S)
+_CADENAS_CSS = re.compile(r'("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')')
+
+
+def minificar_css(texto):
+    # Sin comentarios ni espacios de más; el contenido de las cadenas no se toca
+    texto = _COMENTARIOS_O_CADENAS_CSS.sub(lambda m: ' ' if m.group().startswith('/*') else m.group(), texto)
+    partes = _CADENAS_CSS.split(texto)
+    for i in range(0, len(partes), 2):
+        parte = re.sub(r'\s+', ' ', partes[i])
+        parte = re.sub(r' ?([{};,>]) ?', r'\1', parte)
+        partes[i] = re.sub(r': ', ':', parte).replace(';}', '}')
+    return ''.join(partes).strip()
+
+
+def minificar_js(texto):
+    """
+    Conservador: sin sangría, líneas vacías ni comentarios de línea completa.
+    Los saltos de línea se quedan (el punto y coma automático depende de
+    ellos). Si hay template literals o cadenas que siguen en la línea
+    siguiente, el archivo queda como está.
+    """
+    if '`' in texto or re.search(r'\\\r?\n', texto):
+        return texto
+    lineas = (linea.strip() for linea in texto.splitlines())
+    return '\n'.join(linea for linea in lineas if linea and not linea.startswith('//')) + '\n'
+
+
+MINIFICADORES = {'.css': minificar_css, '.js': minificar_js}
+
+
+def _minificador(nombre):
+    base, extension = posixpath.splitext(nombre)
+    # Los .min.css / .min.js (los del admin, p. ej.) ya vienen minificados
+    if base.endswith('.min'):
+        return None
+    return MINIFICADORES.get(extension)
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = self._minificar(paths)
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            self._comprimir()
+
+    def _minificar(self, paths):
+        # La copia en STATIC_ROOT se reemplaza por la minificada y el hash se
+        # calcula sobre ella, no sobre el original de la app
+        minificados = dict(paths)
+        for nombre in paths:
+            minificador = _minificador(nombre)
+            if minificador is None:
+                continue
+            with self.open(nombre) as archivo:
+                texto = archivo.read().decode()
+            self.delete(nombre)
+            self._save(nombre, ContentFile(minificador(texto).encode()))
+            minificados[nombre] = (self, nombre)
+        return minificados
+
+    def _comprimir(self):
+        # Solo los nombres con huella: son los que piden las páginas
+        for nombre in set(self.hashed_files.values()):
+            if not nombre.endswith(COMPRIMIBLES):
+                continue
+            with self.open(nombre) as archivo:
+                contenido = archivo.read()
+            variantes = {'.gz': gzip.compress(contenido, 9, mtime=0)}
+            if brotli is not None:
+                variantes['.br'] = brotli.compress(contenido)
+            for extension, comprimido in variantes.items():
+                if self.exists(nombre + extension):
+                    self.delete(nombre + extension)
+                # Los archivos muy chicos crecen al comprimirlos
+                if len(comprimido) < len(contenido):
+                    self._save(nombre + extension, ContentFile(comprimido))
+
+    @cached_property
+    def nombres_con_huella(self):
+        return frozenset(self.hashed_files.values())
+
+
+def _codificaciones_aceptadas(request):
+    return {
+        parte.split(';')[0].strip().lower()
+        for parte in request.headers.get('Accept-Encoding', '').split(',')
+    }
+
+
+def servir(request, ruta):
+    # En desarrollo los estáticos salen de las apps, sin collectstatic
+    if settings.DEBUG:
+        return vistas_staticfiles.serve(request, ruta)
+
+    nombre = posixpath.normpath(ruta).lstrip('/')
+    archivo = Path(safe_join(settings.STATIC_ROOT, nombre))
+    if not archivo.is_file():
+        raise Http404(f'"{ruta}" no existe')
+
+    # Solo los nombres con huella pueden cachearse para siempre
+    inmutable = nombre in getattr(staticfiles_storage, 'nombres_con_huella', ())
+    if not inmutable:
+        estado = archivo.stat()
+        respuesta = get_conditional_response(request, last_modified=int(estado.st_mtime))
+        if respuesta is not None:
+            return respuesta
+
+    aceptadas = _codificaciones_aceptadas(request)
+    servido, codificacion, hay_variantes = archivo, None, False
+    for candidata, extension in VARIANTES:
+        variante = archivo.with_name(archivo.name + extension)
+        if variante.is_file():
+            hay_variantes = True
+            if codificacion is None and candidata in aceptadas:
+                servido, codificacion = variante, candidata
+
+    tipo, _ = mimetypes.guess_type(nombre)
+    respuesta = FileResponse(servido.open('rb'), content_type=tipo or 'application/octet-stream')
+    if codificacion:
+        respuesta['Content-Encoding'] = codificacion
+    if hay_variantes:
+        patch_vary_headers(respuesta, ('Accept-Encoding',))
+    if inmutable:
+        patch_cache_control(respuesta, public=True, max_age=UN_ANIO, immutable=True)
+    else:
+        respuesta['Last-Modified'] = http_date(archivo.stat().st_mtime)
+        patch_cache_control(respuesta, no_cache=True)
+    return respuesta
@@ -0,0 +1,121 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Devolucion, Pedido, PedidoProducto
+from .resumen import precio_pagado
+
+# Las exportaciones se generan fila por fila: values_list().iterator() lee de
+# la base en bloques (sin llenar la caché del queryset ni crear modelos) y cada
+# fila se escribe al cliente apenas sale. La memoria no crece con el tamaño.
+FILAS_POR_BLOQUE = 2000
+# Una celda de texto que empieza así se antepone con ' en el CSV
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _pedidos():
+    return Pedido.objects.values_list(
+        'id', 'fecha', 'cliente__username', 'estado', 'subtotal', 'descuento', 'iva_aplicado', 'total'
+    )
+
+
+def _lineas():
+    return PedidoProducto.objects.values_list(
+        'pedido_id', 'pedido__fecha', 'pedido__estado', 'producto_id', 'producto__nombre',
+        'cantidad', 'precio_unitario',
+    )
+
+
+def _devoluciones():
+    # Al precio pagado, como en el resumen del reporte financiero
+    monto = ExpressionWrapper(F('cantidad') * precio_pagado(), output_field=DecimalField())
+    return Devolucion.objects.annotate(monto=monto).values_list(
+        'id', 'pedido_id', 'fecha_devolucion', 'pedido__estado', 'producto_id', 'producto__nombre',
+        'cantidad', 'monto', 'motivo', 'procesado',
+    )
+
+
+# tipo: (consulta, campo de fecha, campo de estado, encabezados)
+EXPORTACIONES = {
+    'pedidos': (
+        _pedidos, 'fecha', 'estado',
+        ['pedido', 'fecha', 'cliente', 'estado', 'subtotal', 'descuento', 'iva', 'total'],
+    ),
+    'lineas': (
+        _lineas, 'pedido__fecha', 'pedido__estado',
+        ['pedido', 'fecha', 'estado', 'producto', 'nombre', 'cantidad', 'precio_unitario'],
+    ),
+    'devoluciones': (
+        _devoluciones, 'fecha_devolucion', 'pedido__estado',
+        ['devolucion', 'pedido', 'fecha', 'estado', 'producto', 'nombre', 'cantidad', 'monto', 'motivo', 'procesado'],
+    ),
+}
+
+
+def inicio_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def filtrar(tipo, desde=None, hasta=None, estado=None):
+    """
+    Consulta de la exportación `tipo` filtrada por rango de días (ambos
+    incluidos) y estado del pedido. Fechas y estados inválidos se ignoran.
+    """
+    consulta, campo_fecha, campo_estado, _ = EXPORTACIONES[tipo]
+    filas = consulta()
+    desde, hasta = parse_date(desde or ''), parse_date(hasta or '')
+    # Rango de fechas-hora (no __date) para poder usar los índices por fecha
+    if desde:
+        filas = filas.filter(**{f'{campo_fecha}__gte': inicio_dia(desde)})
+    if hasta:
+        filas = filas.filter(**{f'{campo_fecha}__lt': inicio_dia(hasta + timedelta(days=1))})
+    if estado in dict(Pedido.ESTADOS):
+        filas = filas.filter(**{campo_estado: estado})
+    return filas.order_by('id')
+
+
+class _Eco:
+    # csv.writer escribe aquí y nos devuelve la línea tal cual
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    return valor
+
+
+def _celda_csv(valor):
+    # Texto que una hoja de cálculo tomaría como fórmula (nombres, motivos)
+    valor = _texto(valor)
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def filas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezados)
+    for fila in filas.iterator(chunk_size=FILAS_POR_BLOQUE):
+        yield escritor.writerow([_celda_csv(valor) for valor in fila])
+
+
+def filas_jsonl(encabezados, filas):
+    for fila in filas.iterator(chunk_size=FILAS_POR_BLOQUE):
+        yield json.dumps(dict(zip(encabezados, map(_texto, fila))), ensure_ascii=False, default=str) + '\n'
+
+
+def generar(tipo, formato, filas):
+    encabezados = EXPORTACIONES[tipo][3]
+    if formato == 'jsonl':
+        return filas_jsonl(encabezados, filas)
+    return filas_csv(encabezados, filas)
@@ -0,0 +1,158 @@
+import textwrap
+import zlib
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from .almacenamiento import almacenamiento_contenido, restar_referencia, sumar_referencia
+from .models import Factura
+from .tareas import encolar
+
+# Cada pedido tiene un PDF de factura que se genera una sola vez en el pool de
+# tareas, después de confirmar la compra. Mientras tanto documento_digital
+# queda vacío (o con el placeholder de los pedidos antiguos).
+PLACEHOLDER = 'facturas/factura_placeholder.pdf'
+PENDIENTES = ('', PLACEHOLDER)
+
+EMPRESA = 'MI TIENDA S.A.'
+RUC = '1790000000001'
+
+# Página A4 en puntos
+ANCHO, ALTO = 595, 842
+MARGEN = 50
+LIMITE_INFERIOR = 110
+
+
+def iva_valor(pedido):
+    return ((pedido.subtotal - pedido.descuento) * (pedido.iva_aplicado / 100)).quantize(Decimal('0.01'))
+
+
+def _escapar(texto):
+    return str(texto).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _texto(x, y, contenido, tamano=10, negrita=False):
+    return f"BT /{'F2' if negrita else 'F1'} {tamano} Tf {x} {y} Td ({_escapar(contenido)}) Tj ET"
+
+
+def documento_pdf(paginas):
+    """
+    Arma un PDF mínimo (fuentes estándar Helvetica, sin dependencias externas).
+    `paginas` es una lista de listas de comandos de texto (ver _texto).
+    """
+    fuente = '<< /Type /Font /Subtype /Type1 /BaseFont /{} /Encoding /WinAnsiEncoding >>'
+    objetos = {
+        1: b'<< /Type /Catalog /Pages 2 0 R >>',
+        3: fuente.format('Helvetica').encode(),
+        4: fuente.format('Helvetica-Bold').encode(),
+    }
+    hijos = []
+    for i, comandos in enumerate(paginas):
+        pagina, contenido = 5 + 2 * i, 6 + 2 * i
+        flujo = zlib.compress('\n'.join(comandos).encode('cp1252', 'replace'))
+        objetos[pagina] = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {ANCHO} {ALTO}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {contenido} 0 R >>'
+        ).encode()
+        objetos[contenido] = b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(flujo) + flujo + b'\nendstream'
+        hijos.append(f'{pagina} 0 R')
+    objetos[2] = f"<< /Type /Pages /Kids [{' '.join(hijos)}] /Count {len(hijos)} >>".encode()
+
+    salida = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    posiciones = {}
+    for numero in sorted(objetos):
+        posiciones[numero] = len(salida)
+        salida += b'%d 0 obj\n' % numero + objetos[numero] + b'\nendobj\n'
+    inicio_xref = len(salida)
+    total = max(objetos) + 1
+    salida += b'xref\n0 %d\n0000000000 65535 f \n' % total
+    for numero in range(1, total):
+        salida += b'%010d 00000 n \n' % posiciones[numero]
+    salida += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (total, inicio_xref)
+    return bytes(salida)
+
+
+def _paginas_factura(pedido, items):
+    paginas = [[]]
+    y = ALTO - MARGEN
+
+    def linea(x, contenido, tamano=10, negrita=False):
+        paginas[-1].append(_texto(x, y, contenido, tamano, negrita))
+
+    def encabezado_tabla():
+        nonlocal y
+        linea(MARGEN, 'Producto', negrita=True)
+        linea(340, 'Cant.', negrita=True)
+        linea(400, 'Precio Unit.', negrita=True)
+        linea(480, 'Subtotal', negrita=True)
+        y -= 18
+
+    linea(MARGEN, EMPRESA, 16, True)
+    linea(360, 'FACTURA DIGITAL', 16, True)
+    y -= 18
+    linea(MARGEN, f'RUC: {RUC}')
+    linea(360, f'Orden: #00{pedido.id}')
+    y -= 14
+    linea(360, f"Fecha: {timezone.localtime(pedido.fecha):%d/%m/%Y %H:%M}")
+    y -= 30
+
+    linea(MARGEN, 'Cliente', negrita=True)
+    y -= 14
+    linea(MARGEN, pedido.cliente.username)
+    if pedido.cliente.email:
+        y -= 14
+        linea(MARGEN, pedido.cliente.email)
+    y -= 20
+    linea(MARGEN, 'Dirección de entrega', negrita=True)
+    for parte in textwrap.wrap(pedido.direccion_envio, 90)[:4]:
+        y -= 14
+        linea(MARGEN, parte)
+    y -= 30
+
+    encabezado_tabla()
+    for item in items:
+        if y < LIMITE_INFERIOR:
+            paginas.append([])
+            y = ALTO - MARGEN
+            encabezado_tabla()
+        linea(MARGEN, textwrap.shorten(item.producto.nombre, 55, placeholder='...'))
+        linea(340, item.cantidad)
+        linea(400, f'${item.precio_unitario:.2f}')
+        linea(480, f'${item.subtotal_linea:.2f}')
+        y -= 16
+
+    if y < LIMITE_INFERIOR:
+        paginas.append([])
+        y = ALTO - MARGEN
+    y -= 14
+    for etiqueta, valor, negrita in (
+        ('Subtotal:', f'${pedido.subtotal:.2f}', False),
+        ('Descuento:', f'-${pedido.descuento:.2f}', False),
+        (f'IVA ({pedido.iva_aplicado}%):', f'${iva_valor(pedido):.2f}', False),
+        ('TOTAL:', f'${pedido.total:.2f}', True),
+    ):
+        linea(380, etiqueta, negrita=negrita)
+        linea(480, valor, negrita=negrita)
+        y -= 16
+    return paginas
+
+
+def generar_factura(pedido_id):
+    factura = Factura.objects.select_related('pedido__cliente').filter(pedido_id=pedido_id).first()
+    # Ya generada (o el pedido se borró): nada que hacer
+    if factura is None or factura.documento_digital.name not in PENDIENTES:
+        return
+    pedido = factura.pedido
+    items = pedido.items.select_related('producto').order_by('id')
+    contenido = documento_pdf(_paginas_factura(pedido, items))
+
+    nombre = almacenamiento_contenido.save('facturas/factura.pdf', ContentFile(contenido))
+    if Factura.objects.filter(id=factura.id, documento_digital__in=PENDIENTES).update(documento_digital=nombre):
+        sumar_referencia(nombre)
+        restar_referencia(factura.documento_digital.name)
+
+
+def programar_factura(pedido):
+    # Se llama dentro de la transacción del checkout; corre al confirmarse
+    encolar(generar_factura, pedido.id)
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User, Group
-from .models import Producto 
+from .cupones import FORMATO_CODIGO, normalizar_codigo
+from .models import Cupon, Producto
 
 class RegistroForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput)
@@ -22,8 +23,9 @@ class ProductoForm(forms.ModelForm):
     class Meta:
         model = Producto
         # Asegúrate de agregar 'imagen' aquí adentro
-        fields = ['nombre', 'precio_base', 'stock', 'imagen'] 
+        fields = ['sku', 'nombre', 'precio_base', 'stock', 'imagen'] 
         widgets = {
+            'sku': forms.TextInput(attrs={'class': 'form-control'}),
             'nombre': forms.TextInput(attrs={'class': 'form-control'}),
             'precio_base': forms.NumberInput(attrs={'class': 'form-control'}),
             'stock': forms.NumberInput(attrs={'class': 'form-control'}),
@@ -31,6 +33,54 @@ class ProductoForm(forms.ModelForm):
         }
 
 
+class FilaProductoForm(ProductoForm):
+    # Mismas reglas que ProductoForm para cada fila de la importación masiva;
+    # la imagen llega como URL y se descarga después
+    sku = forms.CharField(max_length=64)
+    imagen = forms.CharField(max_length=500, required=False)
+
+    class Meta(ProductoForm.Meta):
+        fields = ['sku', 'nombre', 'precio_base', 'stock']
+
+    def validate_unique(self):
+        # El SKU repetido no es un error: es una actualización
+        pass
+
+
+class ImportarProductosForm(forms.Form):
+    archivo = forms.FileField(label='Archivo CSV o JSONL', widget=forms.ClearableFileInput(attrs={'class': 'form-control'}))
+
+
+class CuponForm(forms.ModelForm):
+    descuento_porcentaje = forms.IntegerField(min_value=1, max_value=100)
+    # Límites opcionales: vacío = sin límite
+    usos_maximos = forms.IntegerField(min_value=1, required=False)
+    usos_por_usuario = forms.IntegerField(min_value=1, required=False)
+
+    class Meta:
+        model = Cupon
+        fields = ['codigo', 'descuento_porcentaje', 'usos_maximos', 'usos_por_usuario', 'valido_desde', 'valido_hasta']
+        # datetime-local no lleva zona: el formulario la interpreta en la hora local (TIME_ZONE)
+        widgets = {
+            'valido_desde': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+            'valido_hasta': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+        }
+
+    def clean_codigo(self):
+        # .strip() y mayúsculas: así se buscan al canjear
+        codigo = normalizar_codigo(self.cleaned_data['codigo'])
+        if not FORMATO_CODIGO.match(codigo):
+            raise forms.ValidationError('Solo letras, números, "-" y "_" (hasta 20 caracteres).')
+        return codigo
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('valido_desde'), cleaned_data.get('valido_hasta')
+        if desde and hasta and desde >= hasta:
+            raise forms.ValidationError('"Válido hasta" debe ser posterior a "Válido desde".')
+        return cleaned_data
+
+
 class CrearEmpleadoForm(forms.ModelForm):
     password = forms.CharField(widget=forms.PasswordInput, label="Contraseña")
     # Definimos las opciones de roles manualmente o desde la DB
@@ -0,0 +1,61 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .almacenamiento import almacenamiento_contenido, restar_referencia, sumar_referencia
+from .models import TAMANOS_IMAGEN, Producto
+from .tareas import encolar
+
+CALIDAD_WEBP = 80
+
+
+def _derivado_webp(original, ancho):
+    imagen = original.copy()
+    # Nunca agrandamos: si el original es más chico se queda en su tamaño
+    imagen.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+    salida = BytesIO()
+    imagen.save(salida, 'WEBP', quality=CALIDAD_WEBP, method=4)
+    return salida.getvalue(), imagen.width
+
+
+def generar_derivados(producto_id, nombre_original):
+    producto = Producto.objects.filter(id=producto_id).only('id', 'imagen', 'imagenes_derivadas').first()
+    # Si la imagen cambió mientras esperábamos, otra tarea se encarga
+    if producto is None or producto.imagen.name != nombre_original:
+        return
+
+    with producto.imagen.open('rb') as archivo:
+        original = ImageOps.exif_transpose(Image.open(archivo))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    derivados = {}
+    for tamano, ancho in TAMANOS_IMAGEN.items():
+        contenido, ancho_real = _derivado_webp(original, ancho)
+        # El storage nombra por contenido: el mismo resultado nunca se guarda
+        # dos veces y el archivo se puede cachear para siempre
+        nombre = almacenamiento_contenido.save(f'productos/derivados/{tamano}.webp', ContentFile(contenido))
+        derivados[tamano] = {'nombre': nombre, 'ancho': ancho_real}
+
+    if Producto.objects.filter(id=producto_id, imagen=nombre_original).update(
+        imagenes_derivadas=derivados, actualizado=timezone.now()
+    ):
+        for derivado in derivados.values():
+            sumar_referencia(derivado['nombre'])
+        # Al regenerar, los anteriores dejan de usarse
+        for derivado in producto.imagenes_derivadas.values():
+            restar_referencia(derivado['nombre'])
+
+
+def programar_derivados(producto):
+    # Se llama después de guardar un producto cuya imagen cambió
+    if producto.imagenes_derivadas:
+        for derivado in producto.imagenes_derivadas.values():
+            restar_referencia(derivado['nombre'])
+        producto.imagenes_derivadas = {}
+        Producto.objects.filter(id=producto.id).update(imagenes_derivadas={}, actualizado=timezone.now())
+    if producto.imagen:
+        encolar(generar_derivados, producto.id, producto.imagen.name)
@@ -0,0 +1,68 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ConfiguracionIVA
+
+IVA_POR_DEFECTO = Decimal('15.00')
+
+# El IVA vigente se guarda en memoria del proceso junto con la versión con la
+# que se leyó y la hora de lectura. Cuando configuracion_iva agrega una fila
+# se cambia la versión en la caché 'default': los procesos que la comparten
+# (Redis, Memcached) vuelven a leer de inmediato. Con LocMemCache cada proceso
+# tiene su propia versión, así que además el valor en memoria dura a lo sumo
+# IVA_SEGUNDOS_MEMORIA: pasado ese tiempo se relee de la base.
+CLAVE_VERSION = 'iva:version'
+_memoria = {'version': None, 'porcentaje': None, 'leido': 0.0}
+
+
+def _version_actual():
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, uuid.uuid4().hex, None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def iva_en(fecha):
+    """
+    Porcentaje de IVA en vigor en `fecha`: la fila más reciente con
+    vigente_desde <= fecha, en una búsqueda por iva_vigencia_idx (sin recorrer
+    el historial). Sin filas anteriores, IVA_POR_DEFECTO.
+    """
+    porcentaje = (
+        ConfiguracionIVA.objects.filter(vigente_desde__lte=fecha)
+        .order_by('-vigente_desde', '-id')
+        .values_list('porcentaje', flat=True)
+        .first()
+    )
+    return porcentaje if porcentaje is not None else IVA_POR_DEFECTO
+
+
+def iva_vigente():
+    # La versión se lee antes que la base: si cambia mientras leemos, la próxima llamada recarga.
+    # Un cambio programado a futuro entra como mucho IVA_SEGUNDOS_MEMORIA tarde
+    version = _version_actual()
+    vigente = time.monotonic() - _memoria['leido'] < getattr(settings, 'IVA_SEGUNDOS_MEMORIA', 30)
+    if vigente and _memoria['version'] == version:
+        return _memoria['porcentaje']
+    porcentaje = iva_en(timezone.now())
+    _memoria.update(version=version, porcentaje=porcentaje, leido=time.monotonic())
+    return porcentaje
+
+
+@receiver(post_save, sender=ConfiguracionIVA)
+@receiver(post_delete, sender=ConfiguracionIVA)
+def invalidar_iva(sender, **kwargs):
+    def cambiar_version():
+        _memoria['version'] = None
+        cache.set(CLAVE_VERSION, uuid.uuid4().hex, None)
+    # Después del commit, para que nadie recargue y vuelva a leer la fila vieja
+    transaction.on_commit(cambiar_version)
@@ -0,0 +1,205 @@
+import asyncio
+import io
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from app_tienda.benchmarks import percentiles
+from app_tienda.models import Producto, Reserva
+
+
+class _Medicion:
+    def __init__(self):
+        self.latencias = []
+        self.errores = 0
+        self.claves = set()
+        self.candado = threading.Lock()
+
+    def anotar(self, segundos, estado, cookies):
+        with self.candado:
+            self.latencias.append(segundos)
+            self.errores += estado >= 500
+            if settings.SESSION_COOKIE_NAME in cookies:
+                self.claves.add(cookies[settings.SESSION_COOKIE_NAME].value)
+
+
+def _cabecera_cookie(cookies):
+    return '; '.join(f'{nombre}={cookie.value}' for nombre, cookie in cookies.items())
+
+
+def _recorrido(rnd, productos, ciclos, solo_lectura):
+    # Lo que hace un comprador: mira el catálogo, agrega algo y revisa el carrito
+    for _ in range(ciclos):
+        yield '/'
+        if not solo_lectura:
+            yield f'/agregar-carrito/{rnd.choice(productos)}/'
+        yield '/carrito/'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara catálogo y carrito bajo WSGI (vistas síncronas, N hilos) y bajo ASGI '
+        '(vistas async de views_async.py) con muchos clientes lentos. Los servidores se '
+        'simulan en el proceso: un cliente lento tarda --lentitud ms en recibir cada '
+        'respuesta. En WSGI ese tiempo ocupa un hilo; en ASGI solo un await.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=100, help='Clientes concurrentes.')
+        parser.add_argument('--ciclos', type=int, default=3, help='Recorridos catálogo/agregar/carrito por cliente.')
+        parser.add_argument('--lentitud', type=int, default=200, help='Milisegundos que tarda un cliente en recibir la respuesta.')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del servidor WSGI (como gunicorn --threads).')
+        parser.add_argument(
+            '--solo-lectura', action='store_true',
+            help='Sin agregar al carrito: aísla el efecto de los clientes lentos de los bloqueos de escritura.',
+        )
+        parser.add_argument('--solo', choices=['wsgi', 'asgi'], help='Medir solo un despliegue.')
+
+    def handle(self, *args, **options):
+        prefijo = f'bench-asgi-{uuid.uuid4().hex[:8]}'
+        Producto.objects.bulk_create(
+            Producto(nombre=f'{prefijo}-{i}', precio_base=10, stock=1_000_000) for i in range(20)
+        )
+        productos = list(Producto.objects.filter(nombre__startswith=prefijo).values_list('id', flat=True))
+        claves = set()
+        # Los 500 ya se cuentan; sin esto cada uno imprime su traceback
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        try:
+            for despliegue, urlconf, medir in (
+                ('wsgi', 'tiendaa.urls', self._medir_wsgi),
+                ('asgi', 'tiendaa.urls_asgi', self._medir_asgi),
+            ):
+                if options['solo'] and options['solo'] != despliegue:
+                    continue
+                with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=['testserver']):
+                    medicion = _Medicion()
+                    inicio = time.perf_counter()
+                    medir(productos, options, medicion)
+                    duracion = time.perf_counter() - inicio
+                claves |= medicion.claves
+                self._reportar(despliegue, medicion, duracion)
+        finally:
+            Reserva.objects.filter(producto_id__in=productos).delete()
+            Producto.objects.filter(id__in=productos).delete()
+            Session.objects.filter(session_key__in=claves).delete()
+
+    def _reportar(self, despliegue, medicion, duracion):
+        p = percentiles(medicion.latencias)
+        self.stdout.write(
+            f"{despliegue:5} peticiones={len(medicion.latencias)} errores={medicion.errores} "
+            f"rps={len(medicion.latencias) / duracion:.0f} "
+            f"p50={p['p50']}ms p95={p['p95']}ms p99={p['p99']}ms"
+        )
+
+    def _medir_wsgi(self, productos, options, medicion):
+        aplicacion = WSGIHandler()
+        lentitud = options['lentitud'] / 1000
+
+        def atender(ruta, cookies):
+            # Corre en un hilo del servidor, que queda ocupado hasta que el cliente recibe todo
+            estado = {}
+
+            def start_response(status, headers, exc_info=None):
+                estado['codigo'] = int(status.split()[0])
+                estado['cookies'] = [valor for nombre, valor in headers if nombre.lower() == 'set-cookie']
+
+            entorno = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'REMOTE_ADDR': '127.0.0.1', 'HTTP_HOST': 'testserver',
+                'HTTP_COOKIE': _cabecera_cookie(cookies),
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            try:
+                respuesta = aplicacion(entorno, start_response)
+                try:
+                    b''.join(respuesta)
+                    time.sleep(lentitud)
+                finally:
+                    respuesta.close()
+            finally:
+                connection.close()
+            return estado['codigo'], estado['cookies']
+
+        servidor = ThreadPoolExecutor(max_workers=options['hilos'])
+
+        def cliente(semilla):
+            cookies = SimpleCookie()
+            for ruta in _recorrido(random.Random(semilla), productos, options['ciclos'], options['solo_lectura']):
+                inicio = time.perf_counter()
+                codigo, nuevas = servidor.submit(atender, ruta, cookies).result()
+                for cookie in nuevas:
+                    cookies.load(cookie)
+                medicion.anotar(time.perf_counter() - inicio, codigo, cookies)
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['clientes']) as navegadores:
+                list(navegadores.map(cliente, range(options['clientes'])))
+        finally:
+            servidor.shutdown()
+
+    def _medir_asgi(self, productos, options, medicion):
+        aplicacion = ASGIHandler()
+        lentitud = options['lentitud'] / 1000
+
+        async def pedir(ruta, cookies):
+            alcance = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'query_string': b'',
+                'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+                'headers': [
+                    (b'host', b'testserver'),
+                    (b'cookie', _cabecera_cookie(cookies).encode()),
+                ],
+            }
+            estado = {'cookies': []}
+            cuerpo_enviado = [False]
+
+            async def receive():
+                if not cuerpo_enviado[0]:
+                    cuerpo_enviado[0] = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # El cliente sigue conectado; Django cancela esta espera al terminar
+                await asyncio.Future()
+
+            async def send(mensaje):
+                if mensaje['type'] == 'http.response.start':
+                    estado['codigo'] = mensaje['status']
+                    estado['cookies'] = [
+                        valor.decode() for nombre, valor in mensaje['headers'] if nombre.lower() == b'set-cookie'
+                    ]
+                elif not mensaje.get('more_body', False):
+                    # Cliente lento: la petición espera sin ocupar un hilo
+                    await asyncio.sleep(lentitud)
+
+            await aplicacion(alcance, receive, send)
+            return estado['codigo'], estado['cookies']
+
+        async def cliente(semilla):
+            cookies = SimpleCookie()
+            for ruta in _recorrido(random.Random(semilla), productos, options['ciclos'], options['solo_lectura']):
+                inicio = time.perf_counter()
+                codigo, nuevas = await pedir(ruta, cookies)
+                for cookie in nuevas:
+                    cookies.load(cookie)
+                medicion.anotar(time.perf_counter() - inicio, codigo, cookies)
+
+        async def todos():
+            await asyncio.gather(*(cliente(semilla) for semilla in range(options['clientes'])))
+
+        asyncio.run(todos())
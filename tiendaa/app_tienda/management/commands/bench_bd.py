@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from app_tienda import resumen, tareas
+from app_tienda.benchmarks import percentiles
+from app_tienda.models import Pedido, Producto
+from app_tienda.pedidos import registrar_pedido
+
+PERFILES = ('simple', 'produccion')
+
+
+class _Resultados:
+    def __init__(self):
+        self.tipos = defaultdict(lambda: {'latencias': [], 'errores': 0})
+        self.candado = threading.Lock()
+
+    def anotar(self, tipo, segundos, error):
+        with self.candado:
+            self.tipos[tipo]['latencias'].append(segundos)
+            self.tipos[tipo]['errores'] += error
+
+
+class Command(BaseCommand):
+    help = (
+        'Lectores (reporte financiero, exportación, mis compras) y escritores (checkouts) '
+        'concurrentes sobre la base del perfil actual (TIENDA_BD). Reporta operaciones por '
+        'segundo, errores ("database is locked") y p50/p95/p99 por tipo. Con --comparar '
+        'repite la medición con los perfiles simple y produccion. Todo corre en un proceso: '
+        'lectores y escritores también compiten por la CPU. Lo creado se borra al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=8, help='Hilos que leen los reportes.')
+        parser.add_argument('--escritores', type=int, default=4, help='Hilos que registran pedidos.')
+        parser.add_argument('--duracion', type=int, default=15, help='Segundos de medición.')
+        parser.add_argument('--comparar', action='store_true', help='Medir cada perfil de base en su propio proceso.')
+        parser.add_argument(
+            '--reiniciar-journal', action='store_true',
+            help='Volver la base al journal por defecto (DELETE) antes de medir: WAL queda guardado en el archivo.',
+        )
+        parser.add_argument('--json', action='store_true', help='Imprimir el resultado como JSON.')
+
+    def handle(self, *args, **options):
+        if options['comparar']:
+            return self._comparar(options)
+        if options['reiniciar_journal'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+
+        prefijo = f'bench-bd-{uuid.uuid4().hex[:8]}'
+        producto = Producto.objects.create(nombre=prefijo, precio_base=10, stock=1_000_000_000)
+        User.objects.bulk_create(User(username=f'{prefijo}-{i}') for i in range(max(options['escritores'], 1)))
+        compradores = list(User.objects.filter(username__startswith=f'{prefijo}-'))
+        financiero = User.objects.create_user(f'{prefijo}.finanzas')
+        financiero.groups.add(Group.objects.get_or_create(name='Financiero')[0])
+        claves = []
+        # Los 500 ya se cuentan; sin esto cada uno imprime su traceback
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        try:
+            resultados, duracion = self._medir(options, producto, compradores, financiero, claves)
+        finally:
+            self._limpiar(prefijo, producto, claves)
+
+        informe = self._informe(resultados, duracion)
+        if options['json']:
+            self.stdout.write(json.dumps(informe))
+            return
+        self._imprimir(informe)
+
+    def _medir(self, options, producto, compradores, financiero, claves):
+        resultados = _Resultados()
+        hoy = timezone.localdate()
+        exportar = f'/reporte/exportar/pedidos/?desde={hoy}&hasta={hoy}&estado=Pendiente'
+        fin = time.perf_counter() + options['duracion']
+        candado = threading.Lock()
+
+        def pedir(navegador, tipo, url):
+            inicio = time.perf_counter()
+            respuesta = navegador.get(url)
+            if respuesta.streaming:
+                b''.join(respuesta.streaming_content)
+            resultados.anotar(tipo, time.perf_counter() - inicio, respuesta.status_code >= 500)
+
+        def lector(numero):
+            # Un financiero que revisa el reporte y exporta, y un cliente que mira sus compras
+            finanzas = Client(raise_request_exception=False)
+            finanzas.force_login(financiero)
+            cliente = Client(raise_request_exception=False)
+            cliente.force_login(compradores[numero % len(compradores)])
+            try:
+                while time.perf_counter() < fin:
+                    pedir(finanzas, 'reporte', '/reporte/')
+                    pedir(cliente, 'mis_compras', '/mis-compras/')
+                    pedir(finanzas, 'exportar', exportar)
+            finally:
+                with candado:
+                    claves.extend(
+                        navegador.cookies[settings.SESSION_COOKIE_NAME].value for navegador in (finanzas, cliente)
+                    )
+                connection.close()
+
+        def escritor(usuario):
+            carrito = {str(producto.id): 1}
+            try:
+                while time.perf_counter() < fin:
+                    # Como una petición: la conexión se cierra o se reusa según CONN_MAX_AGE
+                    close_old_connections()
+                    inicio = time.perf_counter()
+                    try:
+                        registrar_pedido(usuario, 'Bodega de pruebas', carrito)
+                        error = False
+                    except OperationalError:
+                        error = True
+                    resultados.anotar('checkout', time.perf_counter() - inicio, error)
+                    close_old_connections()
+            finally:
+                connection.close()
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            hilos = [threading.Thread(target=lector, args=(i,)) for i in range(options['lectores'])]
+            hilos += [threading.Thread(target=escritor, args=(u,)) for u in compradores[:options['escritores']]]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+        return resultados, duracion
+
+    def _limpiar(self, prefijo, producto, claves):
+        # Las facturas se generan en segundo plano; se espera a que terminen antes de borrar
+        tareas.esperar()
+        pedidos = Pedido.objects.filter(cliente__username__startswith=f'{prefijo}-')
+        por_dia = (
+            pedidos.annotate(dia=TruncDate('fecha')).values('dia', 'estado')
+            .annotate(cuantos=Count('id'), total=Sum('total')).order_by()
+        )
+        for fila in por_dia:
+            resumen.sumar(fila['dia'], fila['estado'], -fila['cuantos'], -Decimal(str(fila['total'])))
+        pedidos.delete()
+        producto.delete()
+        User.objects.filter(username__startswith=prefijo).delete()
+        Session.objects.filter(session_key__in=claves).delete()
+
+    def _informe(self, resultados, duracion):
+        modo = None
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                modo = cursor.fetchone()[0]
+        tipos = {}
+        todas, errores = 0, 0
+        for tipo, datos in sorted(resultados.tipos.items()):
+            tipos[tipo] = {
+                'operaciones': len(datos['latencias']),
+                'errores': datos['errores'],
+                'ops': round(len(datos['latencias']) / duracion, 2),
+                **percentiles(datos['latencias']),
+            }
+            todas += len(datos['latencias'])
+            errores += datos['errores']
+        return {
+            'perfil': settings.BD_PERFIL,
+            'journal': modo,
+            'bases': sorted(connections),
+            'duracion_s': round(duracion, 2),
+            'total': {'operaciones': todas, 'errores': errores, 'ops': round(todas / duracion, 2)},
+            'tipos': tipos,
+        }
+
+    def _imprimir(self, informe):
+        self.stdout.write(
+            f"perfil={informe['perfil']} journal={informe['journal']} bases={','.join(informe['bases'])}"
+        )
+        for tipo, fila in informe['tipos'].items():
+            self.stdout.write(
+                f"  {tipo:12} operaciones={fila['operaciones']} errores={fila['errores']} ops/s={fila['ops']} "
+                f"p50={fila['p50']}ms p95={fila['p95']}ms p99={fila['p99']}ms"
+            )
+        total = informe['total']
+        self.stdout.write(self.style.SUCCESS(
+            f"  total        operaciones={total['operaciones']} errores={total['errores']} ops/s={total['ops']}"
+        ))
+
+    def _comparar(self, options):
+        # Cada perfil en un proceso nuevo: DATABASES se lee una sola vez al arrancar
+        for perfil in PERFILES:
+            comando = [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_bd', '--json',
+                f"--lectores={options['lectores']}", f"--escritores={options['escritores']}",
+                f"--duracion={options['duracion']}",
+            ]
+            if perfil == 'simple':
+                comando.append('--reiniciar-journal')
+            proceso = subprocess.run(
+                comando, env={**os.environ, 'TIENDA_BD': perfil}, capture_output=True, text=True,
+            )
+            if proceso.returncode:
+                raise CommandError(f'Falló la medición con el perfil {perfil}:\n{proceso.stderr}')
+            self._imprimir(json.loads(proceso.stdout.strip().splitlines()[-1]))
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_tienda.benchmarks import nombre_producto, percentiles
+from app_tienda.busqueda import _fts_por_base, buscar_productos, fts_disponible, reconstruir_indice
+from app_tienda.models import Producto
+
+# Amplias: coinciden con miles de productos (domina el coste de ordenar por relevancia).
+# Selectivas: pocas coincidencias o ninguna (donde icontains recorre toda la tabla).
+CONSULTAS = {
+    'amplias': ['seru', 'acido', 'crema nia', 'piel sens', 'vitamina c'],
+    'selectivas': ['hyalu serum melasyl noche', 'cicaplast balsamo pept', 'acido salicilico grasa 45', 'zzz', 'retinol spf'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de la búsqueda de productos (FTS5 vs. icontains). Todo se revierte al terminar.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=100_000)
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            Producto.objects.bulk_create(
+                (Producto(nombre=nombre_producto(rnd), precio_base=rnd.randint(5, 90), stock=rnd.randint(0, 50))
+                 for _ in range(options['productos'])),
+                batch_size=5000,
+            )
+            reconstruir_indice()
+            self.stdout.write(f"{options['productos']} productos creados e indexados en {time.perf_counter() - inicio:.1f}s")
+
+            if fts_disponible():
+                self._medir('FTS5', options['repeticiones'])
+                # Forzamos el camino del ORM para comparar
+                nombre = next(iter(_fts_por_base))
+                _fts_por_base[nombre] = False
+                try:
+                    self._medir('icontains', options['repeticiones'])
+                finally:
+                    _fts_por_base[nombre] = True
+            else:
+                self._medir('icontains', options['repeticiones'])
+
+            transaction.set_rollback(True)
+
+    def _medir(self, etiqueta, repeticiones):
+        for grupo, consultas in CONSULTAS.items():
+            muestras = []
+            for _ in range(repeticiones):
+                for consulta in consultas:
+                    inicio = time.perf_counter()
+                    buscar_productos(consulta)
+                    muestras.append(time.perf_counter() - inicio)
+            p = percentiles(muestras)
+            self.stdout.write(
+                f"{etiqueta:10} {grupo:10} consultas={len(muestras)} "
+                f"p50={p['p50']}ms p95={p['p95']}ms p99={p['p99']}ms"
+            )
@@ -0,0 +1,217 @@
+import html
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from app_tienda.benchmarks import MARCAS, PREFIJO_CARGA, TIPOS, percentiles
+from app_tienda.models import Pedido, Producto
+
+# Enlace "Ver más" (paginación por cursor) dentro del HTML
+ENLACE_SIGUIENTE = re.compile(r'href="(\?[^"]*cursor=[^"]*)"')
+
+
+def _siguiente(respuesta):
+    coincidencia = ENLACE_SIGUIENTE.search(respuesta.content.decode())
+    return html.unescape(coincidencia.group(1)) if coincidencia else None
+
+
+def compra(sesion, rnd, datos):
+    # Navega el catálogo, busca, agrega de 1 a 3 productos, revisa el carrito y paga
+    respuesta = sesion.pedir('catalogo', '/')
+    siguiente = _siguiente(respuesta)
+    if siguiente:
+        sesion.pedir('catalogo_pagina', '/' + siguiente)
+    sesion.pedir('catalogo_filtrado', '/', {'orden': 'precio', 'disponibles': '1', 'precio_max': rnd.randint(10, 80)})
+    sesion.pedir('buscar', '/buscar/', {'q': f'{rnd.choice(MARCAS)} {rnd.choice(TIPOS)}'})
+    for producto_id in rnd.sample(datos['productos'], rnd.randint(1, 3)):
+        sesion.pedir('agregar', f'/agregar-carrito/{producto_id}/')
+    sesion.pedir('carrito', '/carrito/')
+    sesion.pedir('checkout_form', '/checkout/')
+    sesion.pedir('checkout', '/checkout/', {'direccion': 'Av. de pruebas 123'}, metodo='post')
+
+
+def bodega(sesion, rnd, datos):
+    respuesta = sesion.pedir('bodega', '/bodega/')
+    siguiente = _siguiente(respuesta)
+    if siguiente:
+        sesion.pedir('bodega_pagina', '/bodega/' + siguiente)
+    sesion.pedir('bodega_todos', '/bodega/', {'estado': 'todos'})
+    sesion.pedir('despacho_lote', '/orden-despacho/lote/', {'limite': 50})
+
+
+def finanzas(sesion, rnd, datos):
+    respuesta = sesion.pedir('reporte', '/reporte/')
+    siguiente = _siguiente(respuesta)
+    if siguiente:
+        sesion.pedir('reporte_pagina', '/reporte/' + siguiente)
+
+
+# nombre: (recorrido, tipo de usuario de generar_datos, peso en la mezcla de clientes)
+ESCENARIOS = {
+    'compra': (compra, 'cliente', 8),
+    'bodega': (bodega, 'bodega', 1),
+    'finanzas': (finanzas, 'finanzas', 1),
+}
+
+
+class _Resultados:
+    def __init__(self):
+        self.pasos = defaultdict(lambda: {'latencias': [], 'errores': 0, 'consultas': 0})
+        self.candado = threading.Lock()
+
+    def anotar(self, paso, segundos, respuesta):
+        medicion = getattr(respuesta, 'medicion', None)
+        with self.candado:
+            datos = self.pasos[paso]
+            datos['latencias'].append(segundos)
+            datos['errores'] += respuesta.status_code >= 500
+            datos['consultas'] += medicion.consultas if medicion else 0
+
+
+class _Sesion:
+    # Un navegador con sesión iniciada que anota cada petición con el nombre de su paso
+    def __init__(self, usuario, resultados):
+        self.navegador = Client(raise_request_exception=False)
+        self.navegador.force_login(usuario)
+        self.resultados = resultados
+
+    def pedir(self, paso, url, datos=None, metodo='get'):
+        inicio = time.perf_counter()
+        respuesta = getattr(self.navegador, metodo)(url, datos)
+        self.resultados.anotar(paso, time.perf_counter() - inicio, respuesta)
+        return respuesta
+
+
+def _resumen(latencias, errores, duracion):
+    return {
+        'peticiones': len(latencias),
+        'errores': errores,
+        'rps': round(len(latencias) / duracion, 2) if duracion else 0,
+        **percentiles(latencias),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga local sobre los datos de generar_datos: clientes concurrentes que compran '
+        '(catálogo, búsqueda, carrito, checkout), revisan la bodega o el reporte financiero. Reporta '
+        'p50/p95/p99, peticiones por segundo y consultas por paso, y lo guarda en JSON para comparar '
+        'corridas. Los checkouts crean pedidos reales en la base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=20, help='Navegadores concurrentes.')
+        parser.add_argument('--duracion', type=int, default=30, help='Segundos de carga.')
+        parser.add_argument(
+            '--escenario', action='append', choices=list(ESCENARIOS),
+            help='Solo estos escenarios (se puede repetir). Por defecto la mezcla 8:1:1.',
+        )
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto bench_carga-<fecha>.json).')
+        parser.add_argument('--etiqueta', default='', help='Nombre de la corrida, se guarda en el JSON.')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        escenarios = options['escenario'] or list(ESCENARIOS)
+        usuarios = {}
+        for nombre in escenarios:
+            tipo = ESCENARIOS[nombre][1]
+            usuarios[tipo] = list(User.objects.filter(username__startswith=f'{PREFIJO_CARGA}-{tipo}-'))
+            if not usuarios[tipo]:
+                raise CommandError(f'No hay usuarios "{PREFIJO_CARGA}-{tipo}-*": ejecuta antes generar_datos.')
+        productos = list(
+            Producto.objects.filter(sku__startswith=PREFIJO_CARGA.upper(), stock__gt=0)
+            .order_by('?').values_list('id', flat=True)[:5000]
+        )
+        if 'compra' in escenarios and not productos:
+            raise CommandError('No hay productos con stock generados por generar_datos.')
+
+        # Reparto de clientes según el peso de cada escenario
+        mezcla = [nombre for nombre in escenarios for _ in range(ESCENARIOS[nombre][2])]
+        asignados = [mezcla[i % len(mezcla)] for i in range(options['clientes'])]
+        datos = {'productos': productos}
+        resultados = _Resultados()
+        # Los 500 ya se cuentan; sin esto cada uno imprime su traceback
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        fin = time.perf_counter() + options['duracion']
+        recorridos = defaultdict(int)
+        candado = threading.Lock()
+
+        def cliente(numero, escenario):
+            rnd = random.Random(options['semilla'] + numero)
+            recorrido, tipo, _ = ESCENARIOS[escenario]
+            try:
+                sesion = _Sesion(rnd.choice(usuarios[tipo]), resultados)
+                while time.perf_counter() < fin:
+                    recorrido(sesion, rnd, datos)
+                    with candado:
+                        recorridos[escenario] += 1
+            finally:
+                connection.close()
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            hilos = [threading.Thread(target=cliente, args=(i, e)) for i, e in enumerate(asignados)]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            duracion = time.perf_counter() - inicio
+
+        informe = self._informe(options, escenarios, asignados, recorridos, resultados, duracion)
+        salida = options['salida'] or f'bench_carga-{timezone.localtime():%Y%m%d-%H%M%S}.json'
+        with open(salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+
+        for paso, fila in informe['pasos'].items():
+            self.stdout.write(
+                f"{paso:18} peticiones={fila['peticiones']} errores={fila['errores']} rps={fila['rps']} "
+                f"p50={fila['p50']}ms p95={fila['p95']}ms p99={fila['p99']}ms consultas={fila['consultas_promedio']}"
+            )
+        total = informe['total']
+        self.stdout.write(self.style.SUCCESS(
+            f"total peticiones={total['peticiones']} errores={total['errores']} rps={total['rps']} "
+            f"p50={total['p50']}ms p95={total['p95']}ms p99={total['p99']}ms -> {salida}"
+        ))
+
+    def _informe(self, options, escenarios, asignados, recorridos, resultados, duracion):
+        pasos = {}
+        todas, errores = [], 0
+        for paso, datos in resultados.pasos.items():
+            pasos[paso] = {
+                **_resumen(datos['latencias'], datos['errores'], duracion),
+                'consultas_promedio': round(datos['consultas'] / len(datos['latencias']), 2),
+            }
+            todas += datos['latencias']
+            errores += datos['errores']
+        return {
+            'etiqueta': options['etiqueta'],
+            'fecha': timezone.now().isoformat(),
+            'duracion_s': round(duracion, 2),
+            'clientes': {nombre: asignados.count(nombre) for nombre in escenarios},
+            'recorridos': dict(recorridos),
+            'entorno': {
+                'motor': connection.vendor,
+                'sesiones': settings.SESION_PERFIL,
+                'urlconf': settings.ROOT_URLCONF,
+                'debug': settings.DEBUG,
+            },
+            'volumen': {
+                'productos': Producto.objects.count(),
+                'pedidos': Pedido.objects.count(),
+                'usuarios': User.objects.count(),
+            },
+            'total': _resumen(todas, errores, duracion),
+            'pasos': dict(sorted(pasos.items())),
+        }
@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from app_tienda.benchmarks import percentiles
+from app_tienda.models import Pedido, PedidoProducto, Producto
+from app_tienda.pedidos import StockInsuficiente, registrar_pedido
+
+
+def _checkout_legado(cliente, direccion, carrito):
+    # Réplica del checkout anterior (leer, restar y guardar fuera de transacción),
+    # solo para comparar: es el que pierde actualizaciones de stock
+    pedido = Pedido.objects.create(cliente=cliente, direccion_envio=direccion, iva_aplicado=0, subtotal=0, total=0)
+    for producto_id, cantidad in carrito.items():
+        producto = Producto.objects.get(id=producto_id)
+        if producto.stock < cantidad:
+            raise StockInsuficiente([producto.nombre])
+        PedidoProducto.objects.create(pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=producto.precio_base)
+        producto.stock -= cantidad
+        producto.save()
+    return pedido, 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Lanza compras concurrentes del mismo producto y verifica que nunca se venda '
+        'más del stock. Los datos de prueba se borran al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--compras-por-hilo', type=int, default=10)
+        parser.add_argument('--stock', type=int, default=50)
+        parser.add_argument('--legado', action='store_true', help='Usar el checkout anterior para comparar.')
+
+    def handle(self, *args, **options):
+        comprar = _checkout_legado if options['legado'] else registrar_pedido
+        prefijo = f'bench-checkout-{uuid.uuid4().hex[:8]}'
+        producto = Producto.objects.create(nombre=prefijo, precio_base=10, stock=options['stock'])
+        usuarios = [User(username=f'{prefijo}-{i}') for i in range(options['hilos'])]
+        User.objects.bulk_create(usuarios)
+        usuarios = list(User.objects.filter(username__startswith=prefijo))
+
+        resultados = {'vendidas': 0, 'agotado': 0, 'reintentos': 0}
+        latencias = []
+        candado = threading.Lock()
+        carrito = {str(producto.id): 1}
+
+        def cliente(usuario):
+            try:
+                for _ in range(options['compras_por_hilo']):
+                    inicio = time.perf_counter()
+                    while True:
+                        try:
+                            comprar(usuario, 'Bodega de pruebas', carrito)
+                            clave = 'vendidas'
+                        except StockInsuficiente:
+                            clave = 'agotado'
+                        except OperationalError:
+                            # SQLite: "database is locked" cuando dos escritores chocan
+                            with candado:
+                                resultados['reintentos'] += 1
+                            time.sleep(random.uniform(0.001, 0.01))
+                            continue
+                        break
+                    with candado:
+                        resultados[clave] += 1
+                        latencias.append(time.perf_counter() - inicio)
+            finally:
+                connection.close()
+
+        try:
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+                list(pool.map(cliente, usuarios))
+            duracion = time.perf_counter() - inicio
+
+            producto.refresh_from_db()
+            lineas = PedidoProducto.objects.filter(producto=producto).aggregate(total=Sum('cantidad'))['total'] or 0
+            p = percentiles(latencias)
+            self.stdout.write(
+                f"compras={len(latencias)} vendidas={resultados['vendidas']} agotado={resultados['agotado']} "
+                f"reintentos={resultados['reintentos']} duracion={duracion:.2f}s "
+                f"p50={p['p50']}ms p95={p['p95']}ms p99={p['p99']}ms"
+            )
+            self.stdout.write(f"stock inicial={options['stock']} stock final={producto.stock} unidades en pedidos={lineas}")
+
+            sobreventa = lineas > options['stock'] or lineas + producto.stock != options['stock']
+        finally:
+            Pedido.objects.filter(cliente__in=usuarios).delete()
+            producto.delete()
+            User.objects.filter(username__startswith=prefijo).delete()
+
+        if sobreventa:
+            raise CommandError('Se vendió más de lo que había en stock o se perdieron actualizaciones.')
+        self.stdout.write(self.style.SUCCESS('Sin sobreventa: cada unidad vendida salió del stock exactamente una vez.'))
@@ -0,0 +1,71 @@
+import random
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from app_tienda.benchmarks import nombre_producto
+from app_tienda.models import Pedido, PedidoProducto, Producto
+from app_tienda.views import imprimir_despacho_lote, imprimir_orden_despacho
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara imprimir N órdenes de despacho una por una contra el lote '
+        'consolidado (consultas y tiempo). Todo se revierte al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=1000)
+        parser.add_argument('--lineas', type=int, default=3, help='Líneas por pedido.')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        with transaction.atomic():
+            prefijo = f'bench-despacho-{uuid.uuid4().hex[:8]}'
+            bodeguero = User.objects.create(username=prefijo, is_superuser=True, is_staff=True)
+            productos = Producto.objects.bulk_create(
+                Producto(nombre=nombre_producto(rnd), precio_base=rnd.randint(5, 90), stock=1000) for _ in range(200)
+            )
+            pedidos = Pedido.objects.bulk_create(
+                Pedido(cliente=bodeguero, direccion_envio='Bodega de pruebas', iva_aplicado=15, subtotal=10, total=11.5)
+                for _ in range(options['pedidos'])
+            )
+            PedidoProducto.objects.bulk_create(
+                (PedidoProducto(pedido=pedido, producto=producto, cantidad=rnd.randint(1, 4), precio_unitario=10)
+                 for pedido in pedidos for producto in rnd.sample(productos, options['lineas'])),
+                batch_size=5000,
+            )
+            ids = [pedido.id for pedido in pedidos]
+
+            fabrica = RequestFactory()
+
+            def peticion(url, **parametros):
+                request = fabrica.get(url, parametros)
+                request.user = bodeguero
+                request.session = SessionStore()
+                return request
+
+            def uno_por_uno():
+                for pedido_id in ids:
+                    imprimir_orden_despacho(peticion('/orden-despacho/'), pedido_id)
+
+            def lote():
+                imprimir_despacho_lote(peticion('/orden-despacho/lote/', pedido=ids))
+
+            for etiqueta, funcion in (('uno por uno', uno_por_uno), ('lote', lote)):
+                with CaptureQueriesContext(connection) as consultas:
+                    inicio = time.perf_counter()
+                    funcion()
+                    duracion = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{etiqueta:12} pedidos={len(ids)} consultas={len(consultas)} duracion={duracion:.2f}s"
+                )
+
+            transaction.set_rollback(True)
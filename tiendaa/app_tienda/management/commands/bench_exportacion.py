@@ -0,0 +1,52 @@
+import time
+import tracemalloc
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_tienda import exportaciones
+from app_tienda.models import Pedido
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la memoria pico de exportar pedidos en streaming contra cargar '
+        'el listado completo. Todo se revierte al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=200_000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cliente = User.objects.create(username=f'bench-export-{uuid.uuid4().hex[:8]}')
+            Pedido.objects.bulk_create(
+                (Pedido(cliente=cliente, direccion_envio='Bodega de pruebas', iva_aplicado=15,
+                        subtotal=10, total=11.5) for _ in range(options['pedidos'])),
+                batch_size=5000,
+            )
+
+            def streaming():
+                filas = exportaciones.filtrar('pedidos')
+                return sum(len(linea) for linea in exportaciones.generar('pedidos', 'csv', filas))
+
+            def en_memoria():
+                # Como hacía el reporte: todos los pedidos como modelos en una lista
+                pedidos = list(Pedido.objects.select_related('cliente').order_by('id'))
+                return sum(len(f'{p.id},{p.fecha},{p.cliente.username},{p.estado},{p.total}\n') for p in pedidos)
+
+            for etiqueta, funcion in (('streaming', streaming), ('en memoria', en_memoria)):
+                tracemalloc.start()
+                inicio = time.perf_counter()
+                tamano = funcion()
+                duracion = time.perf_counter() - inicio
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"{etiqueta:11} pedidos={options['pedidos']} bytes={tamano} "
+                    f"duracion={duracion:.2f}s memoria_pico={pico / 1024 / 1024:.1f}MB"
+                )
+
+            transaction.set_rollback(True)
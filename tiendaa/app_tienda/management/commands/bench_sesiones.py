@@ -0,0 +1,108 @@
+import logging
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from app_tienda.benchmarks import percentiles
+from app_tienda.models import Producto, Reserva
+
+
+def _perfiles(carpeta_cache):
+    memoria = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{uuid.uuid4().hex}'}
+    archivo = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': carpeta_cache}
+    return {
+        'db': ('db', memoria),
+        'cached_db': ('cached_db', memoria),
+        'cache-memoria': ('cache', memoria),
+        'cache-archivo': ('cache', archivo),
+        'firmada': ('firmada', memoria),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide peticiones por segundo de los endpoints del carrito (agregar, ver, actualizar) '
+        'con cada perfil de sesión. Los productos y sesiones de prueba se borran al terminar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=8, help='Clientes anónimos concurrentes.')
+        parser.add_argument('--ciclos', type=int, default=30, help='Ciclos agregar/ver/actualizar por cliente.')
+        parser.add_argument('--perfil', action='append', help='Medir solo estos perfiles (se puede repetir).')
+
+    def handle(self, *args, **options):
+        prefijo = f'bench-sesiones-{uuid.uuid4().hex[:8]}'
+        productos = Producto.objects.bulk_create(
+            Producto(nombre=f'{prefijo}-{i}', precio_base=10, stock=1_000_000) for i in range(20)
+        )
+        productos = list(Producto.objects.filter(nombre__startswith=prefijo).values_list('id', flat=True))
+        carpeta_cache = tempfile.mkdtemp(prefix='bench-sesiones-')
+        claves = []
+        # Los 500 ya se cuentan; sin esto cada uno imprime su traceback
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+        try:
+            for nombre, (perfil, cache) in _perfiles(carpeta_cache).items():
+                if options['perfil'] and nombre not in options['perfil']:
+                    continue
+                with override_settings(
+                    SESSION_ENGINE=settings.PERFILES_SESION[perfil],
+                    CACHES={**settings.CACHES, 'sesiones': cache},
+                    ALLOWED_HOSTS=['testserver'],
+                ):
+                    self._medir(nombre, productos, options, claves)
+        finally:
+            Reserva.objects.filter(producto_id__in=productos).delete()
+            Producto.objects.filter(id__in=productos).delete()
+            Session.objects.filter(session_key__in=claves).delete()
+            shutil.rmtree(carpeta_cache, ignore_errors=True)
+
+    def _medir(self, nombre, productos, options, claves):
+        latencias = []
+        errores = [0]
+        candado = threading.Lock()
+
+        def cliente(semilla):
+            rnd = random.Random(semilla)
+            # Un 500 (p. ej. "database is locked") se cuenta como error en vez de cortar la medición
+            navegador = Client(raise_request_exception=False)
+            propias, fallidas = [], 0
+            try:
+                for _ in range(options['ciclos']):
+                    producto_id = rnd.choice(productos)
+                    for metodo, url, datos in (
+                        ('get', f'/agregar-carrito/{producto_id}/', None),
+                        ('get', '/carrito/', None),
+                        ('post', f'/actualizar-carrito/{producto_id}/', {'cantidad': rnd.randint(1, 3)}),
+                    ):
+                        inicio = time.perf_counter()
+                        respuesta = getattr(navegador, metodo)(url, datos)
+                        propias.append(time.perf_counter() - inicio)
+                        fallidas += respuesta.status_code >= 500
+                clave = navegador.cookies.get(settings.SESSION_COOKIE_NAME)
+                with candado:
+                    latencias.extend(propias)
+                    errores[0] += fallidas
+                    if clave:
+                        claves.append(clave.value)
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clientes']) as pool:
+            list(pool.map(cliente, range(options['clientes'])))
+        duracion = time.perf_counter() - inicio
+        p = percentiles(latencias)
+        self.stdout.write(
+            f"{nombre:14} peticiones={len(latencias)} errores={errores[0]} rps={len(latencias) / duracion:.0f} "
+            f"p50={p['p50']}ms p95={p['p95']}ms p99={p['p99']}ms"
+        )
@@ -0,0 +1,237 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from app_tienda import resumen
+from app_tienda.benchmarks import PREFIJO_CARGA, nombre_producto
+from app_tienda.iva import iva_vigente
+from app_tienda.models import Cupon, Devolucion, Factura, Pedido, PedidoProducto, Producto
+
+MOTIVOS = ['Producto dañado', 'No era lo que esperaba', 'Reacción alérgica', 'Llegó tarde', 'Envase abierto']
+CIUDADES = ['Quito', 'Guayaquil', 'Cuenca', 'Ambato', 'Loja', 'Manta', 'Ibarra']
+CENTAVO = Decimal('0.01')
+
+
+def _insertar(modelo, campos, filas):
+    """
+    INSERT preparado con executemany: para millones de filas es varias veces
+    más rápido que bulk_create, que arma un objeto y una expresión por fila.
+    `filas` son listas de valores Python en el orden de `campos`.
+    """
+    columnas = [modelo._meta.get_field(campo) for campo in campos]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(modelo._meta.db_table),
+        ', '.join(connection.ops.quote_name(c.column) for c in columnas),
+        ', '.join(['%s'] * len(columnas)),
+    )
+    preparar = [c.get_db_prep_save for c in columnas]
+    # La conexión real y no el proxy `connection`: resolverlo por cada valor es lo más caro
+    conexion = connections[DEFAULT_DB_ALIAS]
+    with conexion.cursor() as cursor:
+        cursor.executemany(sql, [
+            [p(valor, conexion) for p, valor in zip(preparar, fila)] for fila in filas
+        ])
+
+
+def _siguiente_id(modelo):
+    return (modelo.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+
+
+def _estado(antiguedad_dias, rnd):
+    # Los pedidos viejos ya se entregaron; los de los últimos días siguen en bodega
+    if antiguedad_dias > 14:
+        return 'Entregado' if rnd.random() < 0.97 else 'Enviado'
+    if antiguedad_dias > 3:
+        return rnd.choices(['Pendiente', 'Enviado', 'Entregado'], [1, 5, 4])[0]
+    return 'Pendiente' if rnd.random() < 0.7 else 'Enviado'
+
+
+class Command(BaseCommand):
+    help = (
+        f'Genera datos sintéticos para pruebas de carga (usuarios "{PREFIJO_CARGA}-*" en los grupos '
+        'cliente/Bodeguero/Financiero, productos, pedidos con sus líneas y facturas, devoluciones y '
+        'cupones) con inserciones masivas. Pensado para una base de pruebas: los datos se quedan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=20_000)
+        parser.add_argument('--bodegueros', type=int, default=5)
+        parser.add_argument('--financieros', type=int, default=3)
+        parser.add_argument('--productos', type=int, default=100_000)
+        parser.add_argument('--pedidos', type=int, default=1_000_000)
+        parser.add_argument('--lineas', type=int, default=5, help='Máximo de líneas por pedido (promedio la mitad).')
+        parser.add_argument('--devoluciones', type=int, default=20_000, help='Aproximado.')
+        parser.add_argument('--cupones', type=int, default=500)
+        parser.add_argument('--dias', type=int, default=365, help='Antigüedad máxima de los pedidos.')
+        parser.add_argument('--lote', type=int, default=10_000, help='Pedidos por transacción.')
+        parser.add_argument('--contrasena', default='carga1234', help='Contraseña de todos los usuarios generados.')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f'{PREFIJO_CARGA}-').exists():
+            raise CommandError(f'Ya hay usuarios "{PREFIJO_CARGA}-*" en esta base; genera sobre una base nueva.')
+        if options['productos'] < options['lineas']:
+            raise CommandError('Se necesitan al menos tantos productos como líneas por pedido.')
+
+        rnd = random.Random(options['semilla'])
+        inicio = time.perf_counter()
+        clientes = self._usuarios(options)
+        self._avance('usuarios', len(clientes), inicio)
+        precios = self._productos(options, rnd)
+        self._avance('productos', len(precios), inicio)
+        cupones = self._cupones(options, rnd)
+        self._avance('cupones', len(cupones), inicio)
+        pedidos, lineas, devoluciones = self._pedidos(options, rnd, clientes, precios, cupones, inicio)
+
+        # Secuencias (PostgreSQL) tras insertar con id explícito; en SQLite no hace nada
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Producto, Pedido]):
+                cursor.execute(sql)
+        resumen.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Listo en {time.perf_counter() - inicio:.0f}s: {len(clientes)} clientes, {len(precios)} productos, '
+            f'{pedidos} pedidos, {lineas} líneas, {devoluciones} devoluciones, {len(cupones)} cupones.'
+        ))
+
+    def _avance(self, que, cuantos, inicio):
+        self.stdout.write(f'{que}: {cuantos} ({time.perf_counter() - inicio:.0f}s)')
+
+    def _usuarios(self, options):
+        # Una sola contraseña hasheada para todos: el hash cuesta ~0,5 s por usuario
+        contrasena = make_password(options['contrasena'])
+        grupos = {
+            nombre: Group.objects.get_or_create(name=nombre)[0]
+            for nombre in ('cliente', 'Bodeguero', 'Financiero')
+        }
+        tipos = (
+            ('cliente', 'cliente', options['clientes']),
+            ('bodega', 'Bodeguero', options['bodegueros']),
+            ('finanzas', 'Financiero', options['financieros']),
+        )
+        with transaction.atomic():
+            for tipo, _, cantidad in tipos:
+                User.objects.bulk_create(
+                    (User(username=f'{PREFIJO_CARGA}-{tipo}-{i:06d}', password=contrasena) for i in range(cantidad)),
+                    batch_size=5000,
+                )
+            miembros = []
+            for tipo, grupo, _ in tipos:
+                ids = User.objects.filter(username__startswith=f'{PREFIJO_CARGA}-{tipo}-').values_list('id', flat=True)
+                miembros += [User.groups.through(user_id=i, group_id=grupos[grupo].id) for i in ids]
+            User.groups.through.objects.bulk_create(miembros, batch_size=5000)
+        return list(
+            User.objects.filter(username__startswith=f'{PREFIJO_CARGA}-cliente-').values_list('id', flat=True)
+        )
+
+    def _productos(self, options, rnd):
+        # {id: precio}; un 10 % agotado para que el catálogo tenga de todo
+        primero = _siguiente_id(Producto)
+        ahora = timezone.now()
+        precios = {}
+        filas = []
+        for i in range(options['productos']):
+            producto_id = primero + i
+            precios[producto_id] = Decimal(rnd.randint(199, 12_000)) / 100
+            stock = 0 if rnd.random() < 0.1 else rnd.randint(1, 500)
+            filas.append([
+                producto_id, f'{PREFIJO_CARGA.upper()}-{i:06d}', nombre_producto(rnd), precios[producto_id], stock,
+                {}, '', ahora,
+            ])
+        with transaction.atomic():
+            for desde in range(0, len(filas), options['lote']):
+                _insertar(
+                    Producto,
+                    ['id', 'sku', 'nombre', 'precio_base', 'stock', 'imagenes_derivadas', 'imagen_origen', 'actualizado'],
+                    filas[desde:desde + options['lote']],
+                )
+        return precios
+
+    def _cupones(self, options, rnd):
+        ahora = timezone.now()
+        with transaction.atomic():
+            Cupon.objects.bulk_create(
+                (Cupon(
+                    codigo=f'{PREFIJO_CARGA.upper()}{i:05d}',
+                    descuento_porcentaje=rnd.choice([5, 10, 15, 20, 30]),
+                    activo=rnd.random() < 0.8,
+                    valido_hasta=ahora + timedelta(days=rnd.randint(-30, 180)) if rnd.random() < 0.5 else None,
+                    usos_maximos=rnd.choice([None, 100, 1000]),
+                    usos=rnd.randint(0, 50),
+                ) for i in range(options['cupones'])),
+                batch_size=5000,
+            )
+        return list(
+            Cupon.objects.filter(codigo__startswith=PREFIJO_CARGA.upper()).values_list('descuento_porcentaje', flat=True)
+        )
+
+    def _pedidos(self, options, rnd, clientes, precios, cupones, inicio):
+        ahora = timezone.now()
+        iva = iva_vigente()
+        segundos = options['dias'] * 86_400
+        ids_productos = list(precios)
+        # Las devoluciones salen de pedidos entregados (~90 % del total)
+        probabilidad_devolucion = min(1.0, options['devoluciones'] / max(options['pedidos'] * 0.9, 1))
+        siguiente = _siguiente_id(Pedido)
+        total_lineas = total_devoluciones = 0
+
+        for desde in range(0, options['pedidos'], options['lote']):
+            pedidos, lineas, facturas, devoluciones = [], [], [], []
+            for pedido_id in range(siguiente + desde, siguiente + min(desde + options['lote'], options['pedidos'])):
+                # Más pedidos recientes que antiguos
+                antiguedad = rnd.random() ** 2 * segundos
+                fecha = ahora - timedelta(seconds=antiguedad)
+                estado = _estado(antiguedad / 86_400, rnd)
+
+                subtotal = Decimal('0.00')
+                elegidos = rnd.sample(ids_productos, rnd.randint(1, options['lineas']))
+                for producto_id in elegidos:
+                    cantidad = rnd.choices([1, 2, 3], [6, 3, 1])[0]
+                    subtotal += precios[producto_id] * cantidad
+                    lineas.append([pedido_id, producto_id, cantidad, precios[producto_id]])
+
+                descuento = Decimal('0.00')
+                if cupones and rnd.random() < 0.1:
+                    descuento = (subtotal * rnd.choice(cupones) / 100).quantize(CENTAVO)
+                total = ((subtotal - descuento) * (1 + iva / 100)).quantize(CENTAVO)
+                pedidos.append([
+                    pedido_id, rnd.choice(clientes), f'Calle {rnd.randint(1, 999)}, {rnd.choice(CIUDADES)}',
+                    fecha, iva, subtotal, descuento, total, estado, fecha,
+                ])
+                facturas.append([pedido_id, ''])
+
+                if estado == 'Entregado' and rnd.random() < probabilidad_devolucion:
+                    devoluciones.append([
+                        pedido_id, rnd.choice(elegidos), 1, rnd.choice(MOTIVOS),
+                        min(fecha + timedelta(days=rnd.randint(1, 20)), ahora), rnd.random() < 0.6,
+                    ])
+
+            with transaction.atomic():
+                _insertar(
+                    Pedido,
+                    [
+                        'id', 'cliente', 'direccion_envio', 'fecha', 'iva_aplicado', 'subtotal', 'descuento',
+                        'total', 'estado', 'actualizado',
+                    ],
+                    pedidos,
+                )
+                _insertar(PedidoProducto, ['pedido', 'producto', 'cantidad', 'precio_unitario'], lineas)
+                # Facturas pendientes: el PDF se generaría al pedirlo (generar_facturas)
+                _insertar(Factura, ['pedido', 'documento_digital'], facturas)
+                _insertar(
+                    Devolucion, ['pedido', 'producto', 'cantidad', 'motivo', 'fecha_devolucion', 'procesado'],
+                    devoluciones,
+                )
+            total_lineas += len(lineas)
+            total_devoluciones += len(devoluciones)
+            if (desde // options['lote']) % 10 == 9:
+                self._avance('pedidos', desde + len(pedidos), inicio)
+        return options['pedidos'], total_lineas, total_devoluciones
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from app_tienda.imagenes import generar_derivados
+from app_tienda.models import Producto
+
+
+class Command(BaseCommand):
+    help = 'Genera las versiones WebP (miniatura, tarjeta, detalle) de las imágenes de producto.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todos', action='store_true', help='Regenerar también los que ya tienen derivados.')
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.exclude(imagen='').exclude(imagen__isnull=True)
+        if not options['todos']:
+            productos = productos.filter(imagenes_derivadas={})
+
+        total = 0
+        for producto_id, imagen in productos.values_list('id', 'imagen').iterator():
+            try:
+                generar_derivados(producto_id, imagen)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'Producto {producto_id} ({imagen}): {error}')
+                continue
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Derivados generados para {total} productos.'))
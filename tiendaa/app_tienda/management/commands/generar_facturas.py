@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app_tienda.facturas import PENDIENTES, generar_factura
+from app_tienda.models import Factura
+
+
+class Command(BaseCommand):
+    help = 'Genera el PDF de las facturas que todavía no lo tienen (pedidos antiguos o tareas perdidas).'
+
+    def handle(self, *args, **options):
+        total = 0
+        pendientes = Factura.objects.filter(documento_digital__in=PENDIENTES)
+        for pedido_id in pendientes.values_list('pedido_id', flat=True).iterator():
+            try:
+                generar_factura(pedido_id)
+            except OSError as error:
+                self.stderr.write(f'Pedido {pedido_id}: {error}')
+                continue
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Facturas generadas: {total}.'))
@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_tienda.importacion import TAMANO_LOTE, detectar_formato, importar_productos
+from app_tienda.tareas import esperar
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea o actualiza productos por SKU desde un CSV o JSONL '
+        '(sku, nombre, precio_base, stock, imagen). Lee el archivo en streaming.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto se deduce de la extensión.')
+        parser.add_argument('--imagenes', help='Carpeta base para las imágenes con ruta relativa.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        if not os.path.isfile(options['archivo']):
+            raise CommandError(f"No existe el archivo {options['archivo']}.")
+        formato = options['formato'] or detectar_formato(options['archivo'])
+
+        def avance(resultado):
+            self.stdout.write(f'  {resultado.procesados} productos guardados, {resultado.total_errores} filas con error')
+
+        with open(options['archivo'], 'rb') as archivo:
+            resultado = importar_productos(archivo, formato, options['imagenes'], options['lote'], avance)
+
+        # Las imágenes se descargan en el pool de tareas; esperamos antes de salir
+        esperar()
+
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f'Línea {linea}: {mensaje}')
+        if resultado.total_errores > len(resultado.errores):
+            self.stderr.write(f'... y {resultado.total_errores - len(resultado.errores)} errores más.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Creados: {resultado.creados}, actualizados: {resultado.actualizados}, '
+            f'sin cambios: {resultado.sin_cambios}, '
+            f'con error: {resultado.total_errores}, {resultado.segundos:.1f}s '
+            f'({resultado.filas_por_segundo} filas/s).'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app_tienda.reservas import barrer_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Borra las reservas de carrito vencidas (pensado para correr cada pocos minutos con cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = barrer_vencidas(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} reservas vencidas liberadas.'))
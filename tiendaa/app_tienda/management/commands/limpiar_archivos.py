@@ -0,0 +1,132 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from app_tienda.almacenamiento import PREFIJO_TEMPORAL, almacenamiento_contenido
+from app_tienda.models import ArchivoAlmacenado, Factura, Producto
+
+CARPETAS = ('productos', 'facturas')
+
+
+class Command(BaseCommand):
+    help = 'Borra los archivos subidos que ningún producto o factura usa (referencias = 0).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gracia-horas', type=int, default=24,
+                            help='No borrar archivos que quedaron huérfanos hace menos de estas horas.')
+        parser.add_argument('--recontar', action='store_true',
+                            help='Recalcular las referencias desde la base y registrar archivos del disco sin control.')
+        parser.add_argument('--consolidar', action='store_true',
+                            help='Renombrar por contenido los archivos subidos antes de este storage, '
+                                 'unir los duplicados y apuntar la base a ellos (implica --recontar).')
+        parser.add_argument('--simular', action='store_true', help='Solo mostrar lo que se borraría.')
+
+    def handle(self, *args, **options):
+        if options['consolidar'] and not options['simular']:
+            self.consolidar()
+        if options['recontar'] or options['consolidar']:
+            self.recontar()
+
+        limite = timezone.now() - timedelta(hours=options['gracia_horas'])
+        huerfanos = ArchivoAlmacenado.objects.filter(referencias=0, actualizado__lt=limite)
+
+        borrados = 0
+        liberados = 0
+        for archivo in huerfanos.iterator():
+            self.stdout.write(f'{"(simulado) " if options["simular"] else ""}{archivo.nombre}')
+            if options['simular']:
+                continue
+            with transaction.atomic():
+                # Primero se reclama la fila: si alguien lo volvió a subir o a
+                # referenciar (lo que toca `actualizado`) el DELETE no encuentra
+                # nada y el archivo se queda. Una subida que llegue después
+                # espera a esta transacción, no encuentra la fila y lo reescribe
+                reclamada = ArchivoAlmacenado.objects.filter(
+                    id=archivo.id, referencias=0, actualizado__lt=limite
+                ).delete()[0]
+                if not reclamada:
+                    continue
+                almacenamiento_contenido.delete(archivo.nombre)
+            borrados += 1
+            liberados += archivo.tamano
+
+        self.stdout.write(self.style.SUCCESS(f'{borrados} archivos borrados, {liberados / 1024:.1f} KB liberados.'))
+
+    def consolidar(self):
+        """
+        Los archivos de antes del storage por contenido ("1.webp",
+        "1_nRYSkE3.webp", ...) pasan a <sha256>.<ext>; las copias idénticas
+        quedan en un solo archivo y los productos y facturas apuntan a él.
+        """
+        renombrados = {}
+        for nombre in self._archivos_en_disco():
+            if almacenamiento_contenido.nombre_por_contenido(nombre):
+                continue
+            with almacenamiento_contenido.open(nombre, 'rb') as archivo:
+                # El storage calcula el nombre por contenido (y registra el archivo)
+                nuevo = almacenamiento_contenido.save(nombre, archivo)
+            renombrados[nombre] = nuevo
+
+        for viejo, nuevo in renombrados.items():
+            with transaction.atomic():
+                # `actualizado` cambia la versión de la tarjeta cacheada del producto
+                Producto.objects.filter(imagen=viejo).update(imagen=nuevo, actualizado=timezone.now())
+                Factura.objects.filter(documento_digital=viejo).update(documento_digital=nuevo)
+                ArchivoAlmacenado.objects.filter(nombre=viejo).delete()
+            almacenamiento_contenido.delete(viejo)
+            self.stdout.write(f'{viejo} -> {nuevo}')
+        self.stdout.write(
+            f'Archivos consolidados: {len(renombrados)} en {len(set(renombrados.values()))} por contenido.'
+        )
+
+    def recontar(self):
+        conteo = Counter()
+        for nombre in Producto.objects.exclude(imagen='').exclude(imagen__isnull=True).values_list('imagen', flat=True).iterator():
+            conteo[nombre] += 1
+        for derivados in Producto.objects.exclude(imagenes_derivadas={}).values_list('imagenes_derivadas', flat=True).iterator():
+            for derivado in derivados.values():
+                conteo[derivado['nombre']] += 1
+        for nombre in Factura.objects.exclude(documento_digital='').values_list('documento_digital', flat=True).iterator():
+            conteo[nombre] += 1
+
+        conocidos = set()
+        cambiados = []
+        for archivo in ArchivoAlmacenado.objects.only('id', 'nombre', 'referencias').iterator():
+            conocidos.add(archivo.nombre)
+            if archivo.referencias != conteo[archivo.nombre]:
+                archivo.referencias = conteo[archivo.nombre]
+                cambiados.append(archivo)
+        ArchivoAlmacenado.objects.bulk_update(cambiados, ['referencias'], batch_size=500)
+
+        # Archivos en disco que nunca se registraron (subidos antes de este storage)
+        nuevos = []
+        for nombre in self._archivos_en_disco():
+            if nombre in conocidos:
+                continue
+            modificado = almacenamiento_contenido.get_modified_time(nombre)
+            nuevos.append(ArchivoAlmacenado(
+                nombre=nombre,
+                referencias=conteo[nombre],
+                tamano=almacenamiento_contenido.size(nombre),
+            ))
+            nuevos[-1]._modificado = modificado
+        creados = ArchivoAlmacenado.objects.bulk_create(nuevos, batch_size=500, ignore_conflicts=True)
+        # auto_now pisa la fecha al crear; la gracia debe contar desde la fecha del archivo
+        for archivo in creados:
+            ArchivoAlmacenado.objects.filter(nombre=archivo.nombre).update(actualizado=archivo._modificado)
+
+        self.stdout.write(f'Referencias corregidas: {len(cambiados)}; archivos registrados desde disco: {len(nuevos)}.')
+
+    def _archivos_en_disco(self):
+        pendientes = [c for c in CARPETAS if almacenamiento_contenido.exists(c)]
+        while pendientes:
+            carpeta = pendientes.pop()
+            subcarpetas, archivos = almacenamiento_contenido.listdir(carpeta)
+            pendientes.extend(f'{carpeta}/{s}' for s in subcarpetas)
+            for archivo in archivos:
+                if archivo.startswith(PREFIJO_TEMPORAL):
+                    continue
+                yield f'{carpeta}/{archivo}'
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from app_tienda.exportaciones import inicio_dia
+from app_tienda.models import Pedido
+from app_tienda.pedidos import TRANSICIONES, TransicionNoValida, mover_pedidos
+
+
+class Command(BaseCommand):
+    help = (
+        'Pasa pedidos al siguiente estado (Pendiente -> Enviado -> Entregado) en un solo UPDATE, '
+        'con historial y resumen diario. Ej.: mover_pedidos Entregado --hasta 2026-10-01'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('estado', choices=sorted(TRANSICIONES.values()))
+        parser.add_argument('--ids', type=int, nargs='+', help='Pedidos puntuales.')
+        parser.add_argument('--hasta', help='Solo pedidos creados hasta este día (AAAA-MM-DD, incluido).')
+        parser.add_argument('--todos', action='store_true', help='Todos los pedidos en el estado anterior.')
+
+    def handle(self, *args, **options):
+        pedidos = Pedido.objects.all()
+        if options['ids']:
+            pedidos = pedidos.filter(id__in=options['ids'])
+        if options['hasta']:
+            hasta = parse_date(options['hasta'])
+            if hasta is None:
+                raise CommandError('--hasta debe tener el formato AAAA-MM-DD.')
+            pedidos = pedidos.filter(fecha__lt=inicio_dia(hasta + timedelta(days=1)))
+        if not (options['ids'] or options['hasta'] or options['todos']):
+            raise CommandError('Indica --ids, --hasta o --todos.')
+
+        try:
+            movidos = mover_pedidos(pedidos, options['estado'])
+        except TransicionNoValida:
+            raise CommandError('Algunos pedidos cambiaron mientras se movían; vuelve a intentarlo.')
+        self.stdout.write(self.style.SUCCESS(f"Pedidos movidos a {options['estado']}: {movidos}."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app_tienda import resumen
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen diario de ventas (reporte financiero) desde los pedidos y devoluciones.'
+
+    def handle(self, *args, **options):
+        filas = resumen.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Resumen reconstruido: {filas} filas (día, estado).'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app_tienda.busqueda import fts_disponible, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de productos (FTS5) desde la tabla de productos.'
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            self.stdout.write(self.style.WARNING('Este motor no tiene índice FTS5; la búsqueda usa el ORM.'))
+            return
+        total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido: {total} productos.'))
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Consultas, tiempo en la base y tiempo total de cada petición, por nombre de
+# vista ('catalogo_publico', 'checkout', 'admin:index', ...). Cada conexión
+# lleva un execute_wrapper que anota en la medición de la petición en curso;
+# esta viaja en un ContextVar, así también se cuentan las consultas de las
+# vistas async (que corren en otro hilo vía sync_to_async).
+# Las consultas de respuestas en streaming y de tareas en segundo plano
+# ocurren fuera de la petición y no se cuentan.
+logger = logging.getLogger(__name__)
+
+_actual = ContextVar('medicion', default=None)
+_acumulado = {}
+_candado = threading.Lock()
+
+
+class PresupuestoExcedido(Exception):
+    pass
+
+
+class Medicion:
+    def __init__(self):
+        self.vista = None
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.segundos = 0.0
+        self._inicio = time.perf_counter()
+
+    @property
+    def presupuesto(self):
+        return getattr(settings, 'PRESUPUESTO_CONSULTAS', {}).get(self.vista)
+
+    @property
+    def excedida(self):
+        return self.presupuesto is not None and self.consultas > self.presupuesto
+
+
+def _contar(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.segundos_db += time.perf_counter() - inicio
+
+
+@receiver(connection_created)
+def instalar_contador(sender, connection, **kwargs):
+    # connection_created se repite en cada reconexión del mismo hilo
+    if _contar not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_contar)
+
+
+def estadisticas():
+    """{vista: {peticiones, consultas_promedio, consultas_max, ms_db_promedio, ms_promedio}}"""
+    with _candado:
+        copia = {vista: list(valores) for vista, valores in _acumulado.items()}
+    return {
+        vista: {
+            'peticiones': peticiones,
+            'consultas_promedio': round(consultas / peticiones, 2),
+            'consultas_max': maximo,
+            'ms_db_promedio': round(segundos_db * 1000 / peticiones, 3),
+            'ms_promedio': round(segundos * 1000 / peticiones, 3),
+        }
+        for vista, (peticiones, consultas, maximo, segundos_db, segundos) in sorted(copia.items())
+    }
+
+
+def reiniciar():
+    with _candado:
+        _acumulado.clear()
+
+
+def _registrar(medicion):
+    with _candado:
+        valores = _acumulado.setdefault(medicion.vista, [0, 0, 0, 0.0, 0.0])
+        valores[0] += 1
+        valores[1] += medicion.consultas
+        valores[2] = max(valores[2], medicion.consultas)
+        valores[3] += medicion.segundos_db
+        valores[4] += medicion.segundos
+
+
+class MedicionConsultasMiddleware:
+    """
+    Va primero en MIDDLEWARE para que cuente también las consultas de sesión
+    y autenticación. Deja la medición en response.medicion (la usan los
+    tests de presupuesto) y, con MEDICION_CABECERAS, la expone en las
+    cabeceras X-Consultas y Server-Timing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _actual.set(medicion)
+        try:
+            response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        return self._terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _actual.set(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _actual.reset(token)
+        return self._terminar(request, response, medicion)
+
+    def _terminar(self, request, response, medicion):
+        medicion.segundos = time.perf_counter() - medicion._inicio
+        coincidencia = getattr(request, 'resolver_match', None)
+        medicion.vista = coincidencia.view_name if coincidencia else None
+        _registrar(medicion)
+        response.medicion = medicion
+
+        if getattr(settings, 'MEDICION_CABECERAS', False):
+            response['X-Consultas'] = medicion.consultas
+            response['Server-Timing'] = (
+                f'db;dur={medicion.segundos_db * 1000:.1f}, total;dur={medicion.segundos * 1000:.1f}'
+            )
+
+        # Los errores 500 ya se reportan por su lado (y su página de error también consulta)
+        if medicion.excedida and response.status_code < 500:
+            mensaje = (
+                f'{medicion.vista}: {medicion.consultas} consultas '
+                f'(presupuesto {medicion.presupuesto}) en {request.path}'
+            )
+            if getattr(settings, 'MEDICION_ESTRICTA', False):
+                raise PresupuestoExcedido(mensaje)
+            logger.warning(mensaje)
+        return response
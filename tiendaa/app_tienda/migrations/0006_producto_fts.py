@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def crear_indice_fts(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+        # remove_diacritics: "serum" encuentra "Sérum"; prefix: acelera las búsquedas por prefijo
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS app_tienda_producto_fts USING fts5("
+            "nombre, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            "INSERT INTO app_tienda_producto_fts (rowid, nombre) "
+            "SELECT id, nombre FROM app_tienda_producto"
+        )
+
+
+def borrar_indice_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS app_tienda_producto_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0005_producto_indices_catalogo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_fts, borrar_indice_fts),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0006_producto_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='imagenes_derivadas',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
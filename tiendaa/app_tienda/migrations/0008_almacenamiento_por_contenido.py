@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:28
+
+import app_tienda.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0007_producto_imagenes_derivadas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='factura',
+            name='documento_digital',
+            field=models.FileField(storage=app_tienda.almacenamiento.obtener_almacenamiento, upload_to='facturas/'),
+        ),
+        migrations.AlterField(
+            model_name='producto',
+            name='imagen',
+            field=models.ImageField(blank=True, null=True, storage=app_tienda.almacenamiento.obtener_almacenamiento, upload_to='productos/'),
+        ),
+        migrations.CreateModel(
+            name='ArchivoAlmacenado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True)),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('tamano', models.PositiveBigIntegerField(default=0)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('referencias', 0)), fields=['actualizado'], name='archivo_huerfano_idx')],
+            },
+        ),
+    ]
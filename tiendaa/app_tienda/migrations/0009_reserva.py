@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0008_almacenamiento_por_contenido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carrito', models.CharField(max_length=32)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira', models.DateTimeField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='app_tienda.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expira'], name='reserva_expira_idx'), models.Index(fields=['producto', 'expira'], name='reserva_producto_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('carrito', 'producto'), name='reserva_carrito_producto_unica')],
+            },
+        ),
+    ]
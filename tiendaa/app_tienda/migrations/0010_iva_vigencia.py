@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0009_reserva'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='configuracioniva',
+            index=models.Index(fields=['fecha_actualizacion', 'id'], name='iva_vigencia_idx'),
+        ),
+    ]
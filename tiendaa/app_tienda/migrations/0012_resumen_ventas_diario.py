@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def llenar_resumen(apps, schema_editor):
+    # Las bases existentes arrancan con el resumen ya calculado. Copia fija
+    # del cálculo de ese momento (no importa app_tienda.resumen, que cambia):
+    # devoluciones en el estado de su pedido, al precio de lista
+    Pedido = apps.get_model('app_tienda', 'Pedido')
+    Devolucion = apps.get_model('app_tienda', 'Devolucion')
+    ResumenVentasDiario = apps.get_model('app_tienda', 'ResumenVentasDiario')
+    cero = Decimal('0.00')
+
+    filas = {}
+    por_dia = (
+        Pedido.objects.annotate(dia=TruncDate('fecha'))
+        .values('dia', 'estado')
+        .annotate(pedidos=Count('id'), total=Sum('total'))
+        .order_by()
+    )
+    for fila in por_dia.iterator():
+        filas[(fila['dia'], fila['estado'])] = ResumenVentasDiario(
+            fecha=fila['dia'], estado=fila['estado'], pedidos=fila['pedidos'], total=fila['total'] or cero
+        )
+
+    devoluciones = (
+        Devolucion.objects.annotate(dia=TruncDate('fecha_devolucion'))
+        .values('dia', 'pedido__estado')
+        .annotate(monto=Sum(F('cantidad') * F('producto__precio_base')))
+        .order_by()
+    )
+    for fila in devoluciones.iterator():
+        clave = (fila['dia'], fila['pedido__estado'])
+        if clave not in filas:
+            filas[clave] = ResumenVentasDiario(fecha=clave[0], estado=clave[1])
+        filas[clave].devoluciones_monto = fila['monto'] or cero
+
+    ResumenVentasDiario.objects.bulk_create(filas.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0011_cupon_limites'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentasDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Enviado', 'Enviado'), ('Entregado', 'Entregado')], max_length=20)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('devoluciones_monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'estado'), name='resumen_fecha_estado_unico')],
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:38
+
+import app_tienda.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0013_pedido_indices_listados'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='factura',
+            name='documento_digital',
+            field=models.FileField(blank=True, storage=app_tienda.almacenamiento.obtener_almacenamiento, upload_to='facturas/'),
+        ),
+    ]
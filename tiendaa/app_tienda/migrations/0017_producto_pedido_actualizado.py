@@ -0,0 +1,39 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def desde_fecha(apps, schema_editor):
+    # Los pedidos existentes no cambiaron desde que se crearon (hasta donde sabemos)
+    Pedido = apps.get_model('app_tienda', 'Pedido')
+    Pedido.objects.update(actualizado=models.F('fecha'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0016_producto_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(desde_fecha, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['actualizado'], name='producto_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', 'actualizado'], name='pedido_cliente_actualizado_idx'),
+        ),
+    ]
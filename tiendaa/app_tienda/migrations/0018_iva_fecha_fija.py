@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0017_producto_pedido_actualizado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='configuracioniva',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def reconstruir_resumen(apps, schema_editor):
+    # Las devoluciones pasan de la fila del estado del pedido a la fila sin
+    # estado ('') de su día, valoradas al precio pagado en la línea del pedido.
+    # Copia fija del cálculo (no importa app_tienda.resumen, que puede cambiar);
+    # las filas de pedidos por día y estado no cambian
+    Devolucion = apps.get_model('app_tienda', 'Devolucion')
+    PedidoProducto = apps.get_model('app_tienda', 'PedidoProducto')
+    ResumenVentasDiario = apps.get_model('app_tienda', 'ResumenVentasDiario')
+
+    precio_pagado = PedidoProducto.objects.filter(
+        pedido=OuterRef('pedido'), producto=OuterRef('producto')
+    ).values('precio_unitario')[:1]
+    devoluciones = (
+        Devolucion.objects.annotate(
+            dia=TruncDate('fecha_devolucion'),
+            precio=Coalesce(Subquery(precio_pagado), F('producto__precio_base')),
+        )
+        .values('dia')
+        .annotate(monto=Sum(F('cantidad') * F('precio')))
+        .order_by()
+    )
+
+    ResumenVentasDiario.objects.update(devoluciones_monto=Decimal('0.00'))
+    # Las filas que solo tenían devoluciones se vuelven a crear sin estado
+    ResumenVentasDiario.objects.filter(pedidos=0, total=0).delete()
+    ResumenVentasDiario.objects.bulk_create([
+        ResumenVentasDiario(fecha=fila['dia'], estado='', devoluciones_monto=fila['monto'] or Decimal('0.00'))
+        for fila in devoluciones.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0018_iva_fecha_fija'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconstruir_resumen, migrations.RunPython.noop),
+    ]
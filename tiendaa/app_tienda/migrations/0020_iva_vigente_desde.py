@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0019_resumen_devoluciones_por_dia'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='configuracioniva',
+            name='iva_vigencia_idx',
+        ),
+        migrations.RenameField(
+            model_name='configuracioniva',
+            old_name='fecha_actualizacion',
+            new_name='vigente_desde',
+        ),
+        migrations.AlterField(
+            model_name='configuracioniva',
+            name='vigente_desde',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='configuracioniva',
+            index=models.Index(fields=['vigente_desde', 'id'], name='iva_vigencia_idx'),
+        ),
+    ]
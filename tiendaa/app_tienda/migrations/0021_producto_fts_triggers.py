@@ -0,0 +1,45 @@
+from django.db import migrations
+
+TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS app_tienda_producto_fts_ai AFTER INSERT ON app_tienda_producto BEGIN "
+    "INSERT INTO app_tienda_producto_fts (rowid, nombre) VALUES (new.id, new.nombre); END",
+    "CREATE TRIGGER IF NOT EXISTS app_tienda_producto_fts_ad AFTER DELETE ON app_tienda_producto BEGIN "
+    "DELETE FROM app_tienda_producto_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS app_tienda_producto_fts_au AFTER UPDATE OF id, nombre ON app_tienda_producto BEGIN "
+    "DELETE FROM app_tienda_producto_fts WHERE rowid = old.id; "
+    "INSERT INTO app_tienda_producto_fts (rowid, nombre) VALUES (new.id, new.nombre); END",
+)
+
+
+def crear_triggers(apps, schema_editor):
+    # El índice se mantiene solo con cualquier escritura (admin, shell,
+    # QuerySet.update, bulk_update...), no solo desde las vistas
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or 'app_tienda_producto_fts' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for sql in TRIGGERS:
+            cursor.execute(sql)
+        # Lo que haya quedado desfasado hasta ahora
+        cursor.execute("DELETE FROM app_tienda_producto_fts")
+        cursor.execute(
+            "INSERT INTO app_tienda_producto_fts (rowid, nombre) "
+            "SELECT id, nombre FROM app_tienda_producto"
+        )
+
+
+def borrar_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sufijo in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS app_tienda_producto_fts_{sufijo}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_tienda', '0020_iva_vigente_desde'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_triggers, borrar_triggers),
+    ]
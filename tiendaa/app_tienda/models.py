@@ -1,28 +1,74 @@
 from django.db import models
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
-class ConfiguracionIVA(models.Model):
-    porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=15.0)
-    fecha_actualizacion = models.DateTimeField(auto_now=True)
+from .almacenamiento import almacenamiento_contenido, obtener_almacenamiento
+
+# Anchos (px) de las versiones WebP que se generan de cada imagen de producto
+TAMANOS_IMAGEN = {
+    'miniatura': 160,
+    'tarjeta': 480,
+    'detalle': 1200,
+}
 
 # Módulo Financiero y Tributario [cite: 21]
 class ConfiguracionIVA(models.Model):
     porcentaje = models.DecimalField(max_digits=5, decimal_places=2, default=15.0)
-    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    # Las filas no se editan: cada cambio agrega una nueva, vigente desde esta fecha
+    # (por defecto, desde que se crea; puede ser futura para programar un cambio)
+    vigente_desde = models.DateTimeField(default=timezone.now)
     # Solo el financiero puede modificar esto vía permisos de Django [cite: 24]
 
+    class Meta:
+        indexes = [
+            # "IVA vigente en la fecha T" (ver iva.py)
+            models.Index(fields=['vigente_desde', 'id'], name='iva_vigencia_idx'),
+        ]
+
 # Módulo de Clientes y Ventas [cite: 7]
 class Producto(models.Model):
+    # Código estable del proveedor: la importación masiva actualiza por aquí (ver importacion.py)
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     nombre = models.CharField(max_length=200)
     precio_base = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField()
     # Este campo es el que activa el botón en el formulario
-    imagen = models.ImageField(upload_to='productos/', null=True, blank=True)
+    imagen = models.ImageField(upload_to='productos/', storage=obtener_almacenamiento, null=True, blank=True)
+    # {'tarjeta': {'nombre': 'productos/derivados/<hash>.webp', 'ancho': 480}, ...}
+    imagenes_derivadas = models.JSONField(default=dict, blank=True, editable=False)
+    # URL o ruta de la que se importó la imagen (para no descargarla otra vez)
+    imagen_origen = models.CharField(max_length=500, blank=True, editable=False)
+    # Último cambio visible en el catálogo (ETag, ver revalidacion.py). Los
+    # UPDATE masivos (stock, derivados, importación) lo ponen a mano
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # "Versión del catálogo": MAX(actualizado) sale del índice
+            models.Index(fields=['actualizado'], name='producto_actualizado_idx'),
+            # Paginación por cursor del catálogo ordenado por precio
+            models.Index(fields=['precio_base', 'id'], name='producto_precio_idx'),
+            # Filtro "solo con stock" (índices parciales)
+            models.Index(fields=['id'], condition=models.Q(stock__gt=0), name='producto_disponible_idx'),
+            models.Index(fields=['precio_base', 'id'], condition=models.Q(stock__gt=0), name='producto_precio_disp_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
 
+    def url_imagen(self, tamano='tarjeta'):
+        # Mientras no existan los derivados se sirve el original
+        derivado = self.imagenes_derivadas.get(tamano)
+        if derivado:
+            return almacenamiento_contenido.url(derivado['nombre'])
+        return self.imagen.url if self.imagen else ''
+
+    @property
+    def srcset(self):
+        derivados = sorted(self.imagenes_derivadas.values(), key=lambda d: d['ancho'])
+        return ', '.join(f"{almacenamiento_contenido.url(d['nombre'])} {d['ancho']}w" for d in derivados)
+
 
 
 
@@ -31,10 +77,28 @@ class Cupon(models.Model):
     descuento_porcentaje = models.PositiveIntegerField(help_text="Porcentaje de descuento (ej: 15)")
     activo = models.BooleanField(default=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Límites opcionales (vacío = sin límite)
+    valido_desde = models.DateTimeField(null=True, blank=True)
+    valido_hasta = models.DateTimeField(null=True, blank=True)
+    usos_maximos = models.PositiveIntegerField(null=True, blank=True)
+    usos_por_usuario = models.PositiveIntegerField(null=True, blank=True)
+    usos = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.codigo} (-{self.descuento_porcentaje}%)"
 
+
+# Cuántas veces usó cada cliente cada cupón
+class CanjeCupon(models.Model):
+    cupon = models.ForeignKey(Cupon, on_delete=models.CASCADE, related_name='canjes')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    usos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cupon', 'usuario'], name='canje_cupon_usuario_unico'),
+        ]
+
 class Pedido(models.Model):
 
     ESTADOS = (
@@ -50,6 +114,27 @@ class Pedido(models.Model):
     descuento = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     estado = models.CharField(max_length=20, choices=ESTADOS, default='Pendiente') # [cite: 17]
+    # Último cambio (estado); mover_pedidos lo pone a mano en su UPDATE
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listados paginados por cursor, más recientes primero (bodega, reporte, mis compras)
+            models.Index(fields=['fecha', 'id'], name='pedido_fecha_idx'),
+            models.Index(fields=['estado', 'fecha', 'id'], name='pedido_estado_fecha_idx'),
+            models.Index(fields=['cliente', 'fecha', 'id'], name='pedido_cliente_fecha_idx'),
+            # Revalidación de "mis compras": último cambio y cantidad de pedidos del cliente
+            models.Index(fields=['cliente', 'actualizado'], name='pedido_cliente_actualizado_idx'),
+        ]
+
+
+# Registro de cada cambio de estado (solo se agregan filas, ver pedidos.mover_pedidos)
+class HistorialEstadoPedido(models.Model):
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='historial')
+    anterior = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    nuevo = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
 
 
 class PedidoProducto(models.Model):
@@ -64,7 +149,8 @@ class PedidoProducto(models.Model):
 
 class Factura(models.Model):
     pedido = models.OneToOneField(Pedido, on_delete=models.CASCADE)
-    documento_digital = models.FileField(upload_to='facturas/') # [cite: 14]
+    # Vacío hasta que el pool de tareas genera el PDF (ver facturas.py)
+    documento_digital = models.FileField(upload_to='facturas/', storage=obtener_almacenamiento, blank=True) # [cite: 14]
 
 
 class Devolucion(models.Model):
@@ -74,4 +160,70 @@ class Devolucion(models.Model):
     motivo = models.TextField()
     fecha_devolucion = models.DateTimeField(auto_now_add=True)
     procesado = models.BooleanField(default=False)
-    
+
+
+# Una sola fila: cuántos productos se han borrado. Borrar no mueve
+# MAX(Producto.actualizado), así que la versión del catálogo (revalidacion.py)
+# lleva también este contador, que sube con cada baja en la misma transacción
+class VersionCatalogo(models.Model):
+    bajas = models.PositiveBigIntegerField(default=0)
+
+
+# Versión de los grupos de cada usuario: sube con cada alta o baja de un
+# grupo suyo. Las sesiones guardan la versión con la que leyeron los roles
+# y la comparan en cada petición (ver roles.py)
+class VersionRoles(models.Model):
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    version = models.PositiveBigIntegerField(default=0)
+
+
+# Totales por día y estado que alimentan el reporte financiero (ver resumen.py);
+# las devoluciones van en la fila del día con estado vacío
+class ResumenVentasDiario(models.Model):
+    fecha = models.DateField()
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS)
+    pedidos = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    devoluciones_monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'estado'], name='resumen_fecha_estado_unico'),
+        ]
+
+
+# Unidades apartadas por un carrito durante RESERVA_MINUTOS
+class Reserva(models.Model):
+    carrito = models.CharField(max_length=32)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['carrito', 'producto'], name='reserva_carrito_producto_unica'),
+        ]
+        indexes = [
+            # Barrido de vencidas
+            models.Index(fields=['expira'], name='reserva_expira_idx'),
+            # Reservas vigentes por producto (disponible para vender)
+            models.Index(fields=['producto', 'expira'], name='reserva_producto_expira_idx'),
+        ]
+
+
+# Archivos subidos (nombrados por su hash) y cuántos registros los usan
+class ArchivoAlmacenado(models.Model):
+    nombre = models.CharField(max_length=255, unique=True)
+    referencias = models.PositiveIntegerField(default=0)
+    tamano = models.PositiveBigIntegerField(default=0)
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Candidatos a borrar: solo los huérfanos
+            models.Index(fields=['actualizado'], condition=models.Q(referencias=0), name='archivo_huerfano_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias})"
@@ -0,0 +1,100 @@
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Tamaños de página que el cliente puede elegir en los listados
+TAMANOS_PAGINA = (12, 24, 48, 96)
+TAMANO_PAGINA_DEFECTO = 24
+
+
+def tamano_pagina(valor, permitidos=TAMANOS_PAGINA, defecto=TAMANO_PAGINA_DEFECTO):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        return defecto
+    return valor if valor in permitidos else defecto
+
+
+def decimal_o_none(valor):
+    if valor in (None, ''):
+        return None
+    try:
+        numero = Decimal(str(valor))
+    except InvalidOperation:
+        return None
+    # NaN e Infinity son Decimal válidos, pero no se pueden comparar con un precio
+    return numero if numero.is_finite() else None
+
+
+def _codificar_cursor(valores):
+    datos = json.dumps([str(v) for v in valores]).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, modelo, campos):
+    # Un cursor manipulado o viejo simplemente vuelve a la primera página
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if len(valores) != len(campos):
+            return None
+        return [modelo._meta.get_field(c).to_python(v) for c, v in zip(campos, valores)]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _despues_del_cursor(queryset, cursor, orden):
+    campos = [o.lstrip('-') for o in orden]
+    queryset = queryset.order_by(*orden)
+
+    valores = _decodificar_cursor(cursor, queryset.model, campos) if cursor else None
+    if valores is not None:
+        condicion = Q()
+        for i, campo in enumerate(orden):
+            nombre = campos[i]
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            paso = Q(**{f'{nombre}__{operador}': valores[i]})
+            for previo, valor in zip(campos[:i], valores[:i]):
+                paso &= Q(**{previo: valor})
+            condicion |= paso
+        queryset = queryset.filter(condicion)
+    return queryset
+
+
+def _cortar(items, tamano, orden):
+    # Pedimos uno de más para saber si hay página siguiente sin hacer COUNT
+    siguiente = None
+    if len(items) > tamano:
+        items = items[:tamano]
+        ultimo = items[-1]
+        siguiente = _codificar_cursor([getattr(ultimo, o.lstrip('-')) for o in orden])
+    return items, siguiente
+
+
+def paginar_keyset(queryset, tamano, cursor=None, orden=('id',)):
+    """
+    Paginación por cursor: en vez de OFFSET filtra "después del último
+    elemento visto", así una página profunda cuesta lo mismo que la primera.
+    `orden` debe terminar en un campo único (normalmente 'id').
+    Devuelve (items, siguiente_cursor); siguiente_cursor es None en la última página.
+    """
+    queryset = _despues_del_cursor(queryset, cursor, orden)
+    return _cortar(list(queryset[:tamano + 1]), tamano, orden)
+
+
+async def apaginar_keyset(queryset, tamano, cursor=None, orden=('id',)):
+    # Igual que paginar_keyset, para vistas async
+    queryset = _despues_del_cursor(queryset, cursor, orden)
+    return _cortar([item async for item in queryset[:tamano + 1]], tamano, orden)
+
+
+def enlace_siguiente(request, siguiente):
+    # "?...&cursor=..." conservando los filtros de la petición, o None en la última página
+    if not siguiente:
+        return None
+    parametros = request.GET.copy()
+    parametros['cursor'] = siguiente
+    return f'?{parametros.urlencode()}'
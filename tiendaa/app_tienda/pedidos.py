@@ -0,0 +1,203 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, QuerySet, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cupones import canjear_cupon, validar_cupon
+from .facturas import programar_factura
+from .iva import iva_vigente
+from . import resumen
+from .models import Devolucion, Factura, HistorialEstadoPedido, Pedido, PedidoProducto, Producto, Reserva
+
+
+# Pendiente -> Enviado -> Entregado: cada estado solo se alcanza desde el anterior
+TRANSICIONES = {'Pendiente': 'Enviado', 'Enviado': 'Entregado'}
+ESTADO_ANTERIOR = {nuevo: anterior for anterior, nuevo in TRANSICIONES.items()}
+
+
+class TransicionNoValida(Exception):
+    pass
+
+
+class StockInsuficiente(Exception):
+    def __init__(self, productos, no_existen=()):
+        self.productos = productos
+        # Ids del carrito cuyos productos ya se borraron
+        self.no_existen = list(no_existen)
+        super().__init__(', '.join(productos))
+
+
+def _cantidad_por_producto(cantidades):
+    # CASE id WHEN 4 THEN 2 WHEN 5 THEN 1 END
+    return Case(
+        *[When(id=producto_id, then=Value(cantidad)) for producto_id, cantidad in cantidades.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _reservado_por_otros(carrito_id):
+    # Unidades que otros carritos tienen apartadas (reservas vigentes) de cada producto
+    reservas = Reserva.objects.filter(producto=OuterRef('pk'), expira__gt=timezone.now())
+    if carrito_id:
+        reservas = reservas.exclude(carrito=carrito_id)
+    total = reservas.values('producto').annotate(total=Sum('cantidad')).values('total')
+    return Coalesce(Subquery(total, output_field=IntegerField()), 0)
+
+
+def descontar_stock(cantidades, carrito_id=None):
+    """
+    Descuenta {producto_id: cantidad} en un solo UPDATE condicionado a que
+    haya stock suficiente en todas las filas, sin tocar lo que otros carritos
+    tienen reservado. Si alguna no alcanza, lanza StockInsuficiente (y la
+    transacción que lo envuelve se revierte).
+    """
+    if not cantidades:
+        return
+    por_producto = _cantidad_por_producto(cantidades)
+    necesario = por_producto + _reservado_por_otros(carrito_id)
+    try:
+        # Savepoint: si falla, se deshacen también las filas que sí alcanzaron
+        with transaction.atomic():
+            actualizados = Producto.objects.filter(
+                id__in=list(cantidades), stock__gte=necesario
+            ).update(stock=F('stock') - por_producto, actualizado=timezone.now())
+            if actualizados != len(cantidades):
+                raise StockInsuficiente([])
+    except StockInsuficiente:
+        agotados = Producto.objects.filter(id__in=list(cantidades), stock__lt=necesario)
+        raise StockInsuficiente([p.nombre for p in agotados] or ['producto no disponible'])
+
+
+def registrar_pedido(cliente, direccion, carrito, codigo_cupon='', carrito_id=None):
+    """
+    Crea el pedido, sus líneas y la factura, y descuenta el stock, todo en una
+    transacción: o se registra todo o no se toca nada. `carrito` es
+    {producto_id: cantidad}; los precios se toman del producto en ese momento.
+    Las reservas del carrito (carrito_id) y el uso del cupón se consumen en la
+    misma transacción. Lanza StockInsuficiente o CuponNoValido.
+    """
+    cantidades = {int(producto_id): int(cantidad) for producto_id, cantidad in carrito.items()}
+
+    with transaction.atomic():
+        # Una sola consulta para todos los productos, bloqueando sus filas
+        # (en SQLite select_for_update no hace nada; ahí protege el UPDATE condicionado)
+        productos = Producto.objects.select_for_update().in_bulk(list(cantidades))
+        faltantes = [producto_id for producto_id in cantidades if producto_id not in productos]
+        if faltantes:
+            raise StockInsuficiente([f'producto {producto_id}' for producto_id in faltantes], faltantes)
+
+        subtotal = Decimal('0.00')
+        for producto_id, cantidad in cantidades.items():
+            subtotal += productos[producto_id].precio_base * cantidad
+
+        # 1. LÓGICA DE CUPÓN: vigencia desde la caché, límites de uso con UPDATE condicionado
+        descuento = Decimal('0.00')
+        if codigo_cupon:
+            cupon = validar_cupon(codigo_cupon)
+            canjear_cupon(cupon, cliente)
+            # Calculamos el porcentaje sobre el subtotal
+            descuento = (subtotal * Decimal(str(cupon['descuento_porcentaje'] / 100))).quantize(Decimal('0.01'))
+
+        # 2. IVA DINÁMICO: Se aplica sobre el subtotal ya descontado
+        iva_porcentaje = iva_vigente()
+
+        # El impuesto se calcula sobre (Subtotal - Descuento)
+        base_imponible = subtotal - descuento
+        iva_valor = (base_imponible * (iva_porcentaje / 100)).quantize(Decimal('0.01'))
+
+        # 3. TOTAL FINAL (Redondeado a 2 decimales)
+        total = (base_imponible + iva_valor).quantize(Decimal('0.01'))
+
+        # 4. STOCK: falla sin dejar nada a medias si otro cliente se llevó las unidades
+        descontar_stock(cantidades, carrito_id)
+        if carrito_id:
+            Reserva.objects.filter(carrito=carrito_id).delete()
+
+        # 5. CREAR EL PEDIDO Y SUS LÍNEAS
+        pedido = Pedido.objects.create(
+            cliente=cliente,
+            direccion_envio=direccion,
+            iva_aplicado=iva_porcentaje,
+            subtotal=subtotal,
+            descuento=descuento,
+            total=total
+        )
+        PedidoProducto.objects.bulk_create([
+            PedidoProducto(
+                pedido=pedido,
+                producto=productos[producto_id],
+                cantidad=cantidad,
+                precio_unitario=productos[producto_id].precio_base
+            )
+            for producto_id, cantidad in cantidades.items()
+        ])
+
+        resumen.pedido_creado(pedido)
+
+        # 6. REGISTRO DE FACTURA (el PDF se genera en segundo plano al confirmar)
+        Factura.objects.create(pedido=pedido)
+        programar_factura(pedido)
+
+    return pedido, iva_valor
+
+
+def mover_pedidos(pedidos, nuevo_estado, usuario=None):
+    """
+    Pasa al `nuevo_estado` los pedidos (ids o queryset) que estén en el estado
+    anterior permitido, con un solo UPDATE. Deja una fila de historial por
+    pedido y ajusta el resumen diario agrupando por día, sin señales por fila.
+    Los que ya no estén en el estado anterior se ignoran. Devuelve cuántos cambiaron.
+    """
+    anterior = ESTADO_ANTERIOR.get(nuevo_estado)
+    if anterior is None:
+        raise TransicionNoValida(nuevo_estado)
+    if not isinstance(pedidos, QuerySet):
+        pedidos = Pedido.objects.filter(id__in=list(pedidos))
+    candidatos = pedidos.filter(estado=anterior).order_by()
+
+    with transaction.atomic():
+        # Lo que vamos a mover (bloqueado hasta el UPDATE donde la base lo soporta)
+        filas = list(candidatos.select_for_update().values_list('id', 'fecha', 'total'))
+        if not filas:
+            return 0
+        if candidatos.update(estado=nuevo_estado, actualizado=timezone.now()) != len(filas):
+            # Otro proceso cambió algún pedido entre la lectura y el UPDATE
+            raise TransicionNoValida(nuevo_estado)
+
+        HistorialEstadoPedido.objects.bulk_create(
+            (HistorialEstadoPedido(pedido_id=pedido_id, anterior=anterior, nuevo=nuevo_estado, usuario=usuario)
+             for pedido_id, _, _ in filas),
+            batch_size=1000,
+        )
+        por_dia = defaultdict(lambda: [0, Decimal('0.00')])
+        for _, fecha, total in filas:
+            dia = por_dia[resumen._dia(fecha)]
+            dia[0] += 1
+            dia[1] += total
+        for dia, (cantidad, total) in por_dia.items():
+            resumen.pedidos_movidos(dia, anterior, nuevo_estado, cantidad, total)
+    return len(filas)
+
+
+def cambiar_estado(pedido, nuevo_estado, usuario=None):
+    # Un solo pedido desde la bodega. Devuelve True si cambió.
+    try:
+        movido = mover_pedidos([pedido.id], nuevo_estado, usuario)
+    except TransicionNoValida:
+        return False
+    if movido:
+        pedido.estado = nuevo_estado
+    return bool(movido)
+
+
+def registrar_devolucion(pedido, producto, cantidad, motivo="Devolución de cliente"):
+    with transaction.atomic():
+        # Crear registro de devolución
+        devolucion = Devolucion.objects.create(pedido=pedido, producto=producto, cantidad=cantidad, motivo=motivo)
+        # Retornar al inventario (sin leer-modificar-guardar)
+        Producto.objects.filter(id=producto.id).update(stock=F('stock') + cantidad, actualizado=timezone.now())
+        resumen.devolucion_registrada(devolucion, resumen.monto_devolucion(pedido, producto, cantidad))
+    return devolucion
@@ -0,0 +1,51 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .almacenamiento import restar_referencia, sumar_referencia
+from .models import Factura, Producto
+
+# Campos de archivo cuyas referencias se cuentan en ArchivoAlmacenado
+CAMPOS_ARCHIVO = {
+    Producto: 'imagen',
+    Factura: 'documento_digital',
+}
+
+
+def _campo_afectado(sender, update_fields):
+    campo = CAMPOS_ARCHIVO.get(sender)
+    if campo and (update_fields is None or campo in update_fields):
+        return campo
+    return None
+
+
+@receiver(pre_save, sender=Producto)
+@receiver(pre_save, sender=Factura)
+def recordar_archivo_anterior(sender, instance, update_fields=None, **kwargs):
+    campo = _campo_afectado(sender, update_fields)
+    if campo is None or instance.pk is None:
+        instance._archivo_anterior = None
+        return
+    instance._archivo_anterior = (
+        sender.objects.filter(pk=instance.pk).values_list(campo, flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Factura)
+def actualizar_referencias(sender, instance, update_fields=None, **kwargs):
+    campo = _campo_afectado(sender, update_fields)
+    if campo is None:
+        return
+    anterior = getattr(instance, '_archivo_anterior', None) or ''
+    actual = getattr(instance, campo).name or ''
+    if anterior != actual:
+        sumar_referencia(actual)
+        restar_referencia(anterior)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Factura)
+def liberar_referencias(sender, instance, **kwargs):
+    restar_referencia(getattr(instance, CAMPOS_ARCHIVO[sender]).name)
+    for derivado in getattr(instance, 'imagenes_derivadas', {}).values():
+        restar_referencia(derivado['nombre'])
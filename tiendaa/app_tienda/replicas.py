@@ -0,0 +1,89 @@
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Las vistas de lectura pesadas (reporte financiero, exportaciones, mis
+# compras) leen del alias 'replica' cuando existe (perfil de base
+# 'produccion', ver settings.py); todo lo que escribe va a la principal.
+# El router no recibe la petición, así que la vista marca su contexto con
+# @leer_de_replica (un ContextVar, que también sirve en vistas async).
+# Con una réplica real, y no el mismo archivo, lo leído puede venir con
+# unos segundos de atraso: quien acaba de escribir (p. ej. mis compras
+# justo después del checkout) no vería su propio pedido. Las vistas que
+# escriben llaman a marcar_escritura(request) y, durante
+# REPLICA_ATRASO_SEGUNDOS, esa sesión sigue leyendo de la principal.
+ALIAS_REPLICA = 'replica'
+CLAVE_ESCRITURA = '_escritura_reciente'
+
+_leyendo_de_replica = ContextVar('leyendo_de_replica', default=False)
+
+
+def replica_disponible():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def _atraso():
+    return getattr(settings, 'REPLICA_ATRASO_SEGUNDOS', 10)
+
+
+def marcar_escritura(request):
+    request.session[CLAVE_ESCRITURA] = time.time()
+
+
+def _escribio_hace_poco(marca):
+    return marca is not None and time.time() - marca < _atraso()
+
+
+def leer_de_replica(vista):
+    # Ponerlo pegado a la vista: así sesión y usuario se siguen leyendo de la principal
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envuelta(request, *args, **kwargs):
+            sesion = getattr(request, 'session', None)
+            if sesion is not None and _escribio_hace_poco(await sesion.aget(CLAVE_ESCRITURA)):
+                return await vista(request, *args, **kwargs)
+            token = _leyendo_de_replica.set(True)
+            try:
+                return await vista(request, *args, **kwargs)
+            finally:
+                _leyendo_de_replica.reset(token)
+        return envuelta
+
+    @wraps(vista)
+    def envuelta(request, *args, **kwargs):
+        sesion = getattr(request, 'session', None)
+        if sesion is not None and _escribio_hace_poco(sesion.get(CLAVE_ESCRITURA)):
+            return vista(request, *args, **kwargs)
+        token = _leyendo_de_replica.set(True)
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            _leyendo_de_replica.reset(token)
+    return envuelta
+
+
+class RouterReplica:
+
+    def db_for_read(self, model, **hints):
+        if _leyendo_de_replica.get() and replica_disponible():
+            return ALIAS_REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # La réplica es una copia de la principal: sus objetos se pueden relacionar
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS_REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica se migra al copiar la principal, nunca por su cuenta
+        if db == ALIAS_REPLICA:
+            return False
+        return None
@@ -0,0 +1,120 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Producto, Reserva
+
+
+def clave_carrito(request):
+    # Identificador propio del carrito: a diferencia de session_key, no cambia al iniciar sesión
+    clave = request.session.get('carrito_id')
+    if not clave:
+        clave = uuid.uuid4().hex
+        request.session['carrito_id'] = clave
+    return clave
+
+
+async def aclave_carrito(request):
+    clave = await request.session.aget('carrito_id')
+    if not clave:
+        clave = uuid.uuid4().hex
+        await request.session.aset('carrito_id', clave)
+    return clave
+
+
+def vencimiento():
+    return timezone.now() + timedelta(minutes=getattr(settings, 'RESERVA_MINUTOS', 15))
+
+
+def _reservas_de_otros(producto_ids, clave):
+    reservas = Reserva.objects.filter(producto_id__in=producto_ids, expira__gt=timezone.now())
+    if clave:
+        reservas = reservas.exclude(carrito=clave)
+    return reservas.values_list('producto_id').annotate(total=Sum('cantidad')).order_by()
+
+
+def reservado_por_otros(producto_ids, clave=None):
+    """{producto_id: unidades apartadas por reservas vigentes de otros carritos}"""
+    return dict(_reservas_de_otros(producto_ids, clave))
+
+
+async def areservado_por_otros(producto_ids, clave=None):
+    return {producto_id: total async for producto_id, total in _reservas_de_otros(producto_ids, clave)}
+
+
+def reservar(clave, producto_id, cantidad):
+    """
+    Aparta `cantidad` unidades para el carrito (o las que queden libres).
+    Devuelve (cantidad_reservada, maximo_disponible_para_este_carrito).
+    """
+    with transaction.atomic():
+        # Bloquea el producto para que dos carritos no aparten la misma unidad
+        producto = Producto.objects.select_for_update().only('id', 'stock').get(id=producto_id)
+        maximo = max(producto.stock - reservado_por_otros([producto_id], clave).get(producto_id, 0), 0)
+        cantidad = min(cantidad, maximo)
+        if cantidad <= 0:
+            Reserva.objects.filter(carrito=clave, producto_id=producto_id).delete()
+            return 0, maximo
+        Reserva.objects.update_or_create(
+            carrito=clave, producto_id=producto_id,
+            defaults={'cantidad': cantidad, 'expira': vencimiento()},
+        )
+    return cantidad, maximo
+
+
+def liberar(clave, producto_id=None):
+    reservas = Reserva.objects.filter(carrito=clave)
+    if producto_id is not None:
+        reservas = reservas.filter(producto_id=producto_id)
+    reservas.delete()
+
+
+async def aliberar(clave, producto_id=None):
+    reservas = Reserva.objects.filter(carrito=clave)
+    if producto_id is not None:
+        reservas = reservas.filter(producto_id=producto_id)
+    await reservas.adelete()
+
+
+def renovar(clave):
+    # Mientras el cliente siga activo su carrito no vence
+    Reserva.objects.filter(carrito=clave, expira__gt=timezone.now()).update(expira=vencimiento())
+
+
+async def arenovar(clave):
+    await Reserva.objects.filter(carrito=clave, expira__gt=timezone.now()).aupdate(expira=vencimiento())
+
+
+def _anotar(productos, reservado):
+    for producto in productos:
+        producto.disponible = max(producto.stock - reservado.get(producto.id, 0), 0)
+    return productos
+
+
+def anotar_disponibles(productos):
+    # producto.disponible = stock - reservas vigentes, con una sola consulta por página
+    return _anotar(productos, reservado_por_otros([p.id for p in productos]))
+
+
+async def aanotar_disponibles(productos):
+    return _anotar(productos, await areservado_por_otros([p.id for p in productos]))
+
+
+def barrer_vencidas(lote=1000):
+    """
+    Borra las reservas vencidas por lotes recorriendo el índice de `expira`:
+    solo toca las filas vencidas, nunca la tabla completa.
+    """
+    ahora = timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            Reserva.objects.filter(expira__lte=ahora).order_by('expira').values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        total += Reserva.objects.filter(id__in=ids).delete()[0]
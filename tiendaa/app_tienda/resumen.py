@@ -0,0 +1,119 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Devolucion, Pedido, PedidoProducto, ResumenVentasDiario
+
+# El reporte financiero lee ResumenVentasDiario (unas filas por día) en vez de
+# sumar todo el historial de pedidos. Cada operación que cambia un pedido
+# ajusta aquí su día y estado; reconstruir() recalcula todo desde cero.
+
+CERO = Decimal('0.00')
+# Las devoluciones se suman por su día en una fila sin estado: el pedido
+# cambia de estado después y el monto devuelto no debe moverse con él.
+# Se valoran al precio pagado en la línea del pedido (no cambia después).
+SIN_ESTADO = ''
+
+
+def _dia(fecha_hora):
+    return timezone.localdate(fecha_hora) if timezone.is_aware(fecha_hora) else fecha_hora.date()
+
+
+def sumar(fecha, estado, pedidos=0, total=CERO, devoluciones=CERO):
+    cambios = dict(
+        pedidos=F('pedidos') + pedidos,
+        total=F('total') + total,
+        devoluciones_monto=F('devoluciones_monto') + devoluciones,
+    )
+    if ResumenVentasDiario.objects.filter(fecha=fecha, estado=estado).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenVentasDiario.objects.create(
+                fecha=fecha, estado=estado, pedidos=pedidos, total=total, devoluciones_monto=devoluciones
+            )
+    except IntegrityError:
+        # Otra petición creó la fila del día al mismo tiempo
+        ResumenVentasDiario.objects.filter(fecha=fecha, estado=estado).update(**cambios)
+
+
+def pedido_creado(pedido):
+    sumar(_dia(pedido.fecha), pedido.estado, 1, pedido.total)
+
+
+def pedidos_movidos(fecha, anterior, nuevo, pedidos, total):
+    # `pedidos` del día `fecha` pasaron de `anterior` a `nuevo`
+    sumar(fecha, anterior, -pedidos, -total)
+    sumar(fecha, nuevo, pedidos, total)
+
+
+def monto_devolucion(pedido, producto, cantidad):
+    precio = (
+        PedidoProducto.objects.filter(pedido=pedido, producto=producto)
+        .values_list('precio_unitario', flat=True).first()
+    )
+    # Un producto que no estaba en el pedido se valora a su precio actual
+    return cantidad * (precio if precio is not None else producto.precio_base)
+
+
+def devolucion_registrada(devolucion, monto):
+    sumar(_dia(devolucion.fecha_devolucion), SIN_ESTADO, devoluciones=monto)
+
+
+def totales():
+    # Tarjetas del reporte: una consulta sobre la tabla de resumen
+    dinero = DecimalField(max_digits=14, decimal_places=2)
+    return ResumenVentasDiario.objects.aggregate(
+        ingresos=Coalesce(Sum('total', filter=Q(estado='Entregado')), CERO, output_field=dinero),
+        pendientes_monto=Coalesce(Sum('total', filter=~Q(estado='Entregado')), CERO, output_field=dinero),
+        devoluciones_monto=Coalesce(Sum('devoluciones_monto'), CERO, output_field=dinero),
+    )
+
+
+def precio_pagado():
+    """
+    Precio unitario de la línea del pedido para una Devolucion (o el precio de
+    lista si la línea no existe). Lo comparten el resumen y las exportaciones.
+    """
+    linea = PedidoProducto.objects.filter(
+        pedido=OuterRef('pedido'), producto=OuterRef('producto')
+    ).values('precio_unitario')[:1]
+    return Coalesce(Subquery(linea), F('producto__precio_base'))
+
+
+def reconstruir():
+    """
+    Recalcula el resumen completo desde Pedido y Devolucion (para backfills y
+    correcciones). Las migraciones llevan su propia copia fija del cálculo.
+    """
+    filas = {}
+    por_dia = (
+        Pedido.objects.annotate(dia=TruncDate('fecha'))
+        .values('dia', 'estado')
+        .annotate(pedidos=Count('id'), total=Sum('total'))
+        .order_by()
+    )
+    for fila in por_dia.iterator():
+        filas[(fila['dia'], fila['estado'])] = ResumenVentasDiario(
+            fecha=fila['dia'], estado=fila['estado'], pedidos=fila['pedidos'], total=fila['total'] or CERO
+        )
+
+    devoluciones = (
+        Devolucion.objects.annotate(dia=TruncDate('fecha_devolucion'), precio=precio_pagado())
+        .values('dia')
+        .annotate(monto=Sum(F('cantidad') * F('precio')))
+        .order_by()
+    )
+    for fila in devoluciones.iterator():
+        clave = (fila['dia'], SIN_ESTADO)
+        if clave not in filas:
+            filas[clave] = ResumenVentasDiario(fecha=clave[0], estado=clave[1])
+        filas[clave].devoluciones_monto = fila['monto'] or CERO
+
+    with transaction.atomic():
+        ResumenVentasDiario.objects.all().delete()
+        ResumenVentasDiario.objects.bulk_create(filas.values(), batch_size=1000)
+    return len(filas)
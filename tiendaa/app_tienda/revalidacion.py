@@ -0,0 +1,100 @@
+import hashlib
+
+from django.db.models import Count, F, Max, Subquery
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Pedido, Producto, VersionCatalogo
+from .roles import roles_de
+
+# GET condicional (If-None-Match / If-Modified-Since) para catálogo, mis
+# compras y facturas: la vista calcula primero un validador barato (una
+# consulta por índice) y, si el navegador o el proxy ya tienen esa versión,
+# responde 304 sin consultar la página ni renderizar el template.
+# Los ETag son débiles: el HTML lleva un token CSRF que cambia en cada render.
+# Borrar productos no mueve MAX(actualizado) (o lo baja): cada baja suma uno a
+# VersionCatalogo.bajas en la misma transacción, así que cualquier proceso la
+# ve apenas se confirma.
+# Las reservas de otros carritos no entran en el ETag del catálogo: cambian
+# cada vez que alguien agrega o renueva, y el 304 dejaría de servir para todos.
+# "Solo quedan N" puede quedar atrasado en una página revalidada; reservar()
+# vuelve a comprobar el stock al agregar al carrito.
+FILA_VERSION = 1
+
+
+def _huella(*partes):
+    return 'W/"{}"'.format(hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest())
+
+
+def version_catalogo():
+    """
+    (último cambio de un producto, bajas). Una consulta: el producto cambiado
+    más recientemente por su índice y el contador de bajas por clave primaria.
+    """
+    bajas = VersionCatalogo.objects.filter(pk=FILA_VERSION).values('bajas')
+    fila = (
+        Producto.objects.order_by('-actualizado')
+        .annotate(bajas=Subquery(bajas))
+        .values_list('actualizado', 'bajas')
+        .first()
+    )
+    # Sin productos la consulta no devuelve filas: las bajas se leen aparte
+    return fila or (None, bajas.values_list('bajas', flat=True).first())
+
+
+def etag_catalogo(request):
+    # Además del catálogo, lo que cambia de un visitante a otro en base.html:
+    # usuario, roles y unidades del carrito. Síncrona: lee sesión y usuario
+    usuario = request.user
+    visitante = (
+        usuario.pk, usuario.is_superuser, sorted(roles_de(usuario)), len(request.session.get('carrito') or {})
+    )
+    return _huella('catalogo', version_catalogo(), visitante, request.get_full_path())
+
+
+def validadores_compras(request):
+    """
+    (ETag, Last-Modified) del historial del cliente: último cambio y cantidad
+    de sus pedidos, en una consulta sobre su índice.
+    """
+    resultado = Pedido.objects.filter(cliente=request.user).aggregate(
+        ultimo=Max('actualizado'), pedidos=Count('id')
+    )
+    etag = _huella('compras', request.user.pk, resultado['ultimo'], resultado['pedidos'], request.get_full_path())
+    return etag, resultado['ultimo']
+
+
+def validadores_factura(pedido):
+    # La factura aún en preparación (la página HTML; el PDF lleva su propio ETag)
+    return _huella('factura', pedido.id, pedido.actualizado), pedido.actualizado
+
+
+def no_modificado(request, etag, ultima_modificacion=None):
+    """HttpResponseNotModified si el cliente ya tiene esta versión, o None."""
+    segundos = int(ultima_modificacion.timestamp()) if ultima_modificacion else None
+    respuesta = get_conditional_response(request, etag=etag, last_modified=segundos)
+    if respuesta is not None:
+        return con_validadores(request, respuesta, etag, ultima_modificacion)
+    return None
+
+
+def con_validadores(request, respuesta, etag, ultima_modificacion=None):
+    # no-cache: se puede guardar, pero hay que revalidar cada vez (y eso cuesta un 304)
+    respuesta['ETag'] = etag
+    if ultima_modificacion:
+        respuesta['Last-Modified'] = http_date(ultima_modificacion.timestamp())
+    if request.user.is_authenticated:
+        patch_cache_control(respuesta, no_cache=True, private=True)
+    else:
+        patch_cache_control(respuesta, no_cache=True)
+    return respuesta
+
+
+
+@receiver(post_delete, sender=Producto)
+def producto_borrado(sender, **kwargs):
+    # En la transacción del borrado: nadie ve la baja sin el contador nuevo
+    if not VersionCatalogo.objects.filter(pk=FILA_VERSION).update(bajas=F('bajas') + 1):
+        VersionCatalogo.objects.get_or_create(pk=FILA_VERSION, defaults={'bajas': 1})
@@ -0,0 +1,158 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, User
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, SimpleLazyObject, empty
+
+from .models import VersionRoles
+
+# Los grupos del usuario se leen una vez y se guardan en la sesión junto con
+# su VersionRoles. Cada cambio de pertenencia sube esa versión en la base, y
+# BackendConRoles la trae en la misma consulta que carga al usuario: todos
+# los procesos ven el cambio en la petición siguiente, sin depender de que
+# la caché sea compartida.
+CLAVE_SESION = '_roles'
+
+
+def marcar_cambio(usuarios_id):
+    usuarios_id = set(usuarios_id)
+    if not usuarios_id:
+        return
+    # Primero las filas que falten y luego el incremento: dos altas a la vez no pierden ninguno
+    VersionRoles.objects.bulk_create(
+        [VersionRoles(usuario_id=usuario_id) for usuario_id in usuarios_id], ignore_conflicts=True
+    )
+    VersionRoles.objects.filter(usuario_id__in=usuarios_id).update(version=F('version') + 1)
+
+
+def _con_version(usuarios):
+    version = VersionRoles.objects.filter(usuario=OuterRef('pk')).values('version')[:1]
+    return usuarios.annotate(version_roles=Coalesce(Subquery(version), 0))
+
+
+class BackendConRoles(ModelBackend):
+    # Igual que ModelBackend, pero el usuario llega con version_roles
+    def get_user(self, user_id):
+        usuario = _con_version(User._default_manager.all()).filter(pk=user_id).first()
+        return usuario if usuario is not None and self.user_can_authenticate(usuario) else None
+
+    async def aget_user(self, user_id):
+        usuario = await _con_version(User._default_manager.all()).filter(pk=user_id).afirst()
+        return usuario if usuario is not None and self.user_can_authenticate(usuario) else None
+
+
+def _version(usuario):
+    version = getattr(usuario, 'version_roles', None)
+    if version is None:
+        # Sesión de otro backend: la versión cuesta una consulta aparte
+        version = VersionRoles.objects.filter(usuario=usuario).values_list('version', flat=True).first() or 0
+    return version
+
+
+def _cargar_de_base(usuario):
+    return frozenset(usuario.groups.values_list('name', flat=True))
+
+
+def _cargar(request, usuario):
+    if not usuario.is_authenticated:
+        return frozenset()
+
+    version = _version(usuario)
+    guardado = request.session.get(CLAVE_SESION)
+    if guardado and guardado.get('usuario') == usuario.pk and guardado.get('version') == version:
+        return frozenset(guardado['nombres'])
+
+    nombres = _cargar_de_base(usuario)
+    request.session[CLAVE_SESION] = {'usuario': usuario.pk, 'nombres': sorted(nombres), 'version': version}
+    return nombres
+
+
+def roles_de(usuario):
+    # Memo por petición: la consulta a la base se hace como mucho una vez
+    if not hasattr(usuario, '_roles'):
+        usuario._roles = _cargar_de_base(usuario) if usuario.is_authenticated else frozenset()
+    return usuario._roles
+
+
+def tiene_rol(usuario, nombre):
+    return usuario.is_superuser or nombre in roles_de(usuario)
+
+
+class RolesMiddleware:
+    """
+    Debe ir después de AuthenticationMiddleware. Deja los roles precargados
+    desde la sesión en request.user._roles, sin forzar la carga del usuario
+    en las peticiones que no lo usan.
+    """
+
+    # También async: bajo ASGI no obliga a pasar cada petición por un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _envolver(self, request):
+        usuario = request.user
+
+        def preparar():
+            real = usuario
+            if isinstance(usuario, LazyObject):
+                if usuario._wrapped is empty:
+                    usuario._setup()
+                real = usuario._wrapped
+            if not hasattr(real, '_roles'):
+                real._roles = _cargar(request, real)
+            return real
+
+        request.user = SimpleLazyObject(preparar)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._envolver(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._envolver(request)
+        return await self.get_response(request)
+
+
+def roles(request):
+    # Context processor: los templates preguntan por es_bodeguero, etc. sin tocar user.groups
+    usuario = request.user
+    nombres = roles_de(usuario)
+    return {
+        'roles': nombres,
+        'es_bodeguero': usuario.is_superuser or 'Bodeguero' in nombres,
+        'es_financiero': usuario.is_superuser or 'Financiero' in nombres,
+        'es_administrador': usuario.is_superuser or 'Administrador' in nombres,
+    }
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_por_membresia(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # group.user_set.clear(): después ya no se sabe a quiénes afectó
+        instance._miembros_antes = list(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        marcar_cambio(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        marcar_cambio(getattr(instance, '_miembros_antes', ()) if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Group)
+def invalidar_por_grupo(sender, instance, created, **kwargs):
+    # Un grupo renombrado cambia los nombres guardados en la sesión de sus miembros
+    if not created:
+        marcar_cambio(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidar_por_grupo_borrado(sender, instance, **kwargs):
+    marcar_cambio(instance.user_set.values_list('pk', flat=True))
@@ -0,0 +1,69 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Pool local de hilos para trabajo pesado que no debe bloquear la respuesta
+# (imágenes, documentos). Se crea al primer uso en cada proceso.
+_pool = None
+_pendientes = set()
+_candado = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TAREAS_TRABAJADORES', 2),
+            thread_name_prefix='tienda-tareas',
+        )
+    return _pool
+
+
+def _ejecutar(funcion, args):
+    try:
+        funcion(*args)
+    except Exception:
+        logger.exception('Falló la tarea en segundo plano %s%r', funcion.__name__, args)
+    finally:
+        # Cada hilo abre su propia conexión; la cerramos al terminar
+        connection.close()
+
+
+def encolar(funcion, *args):
+    """
+    Ejecuta funcion(*args) en el pool cuando la transacción actual se confirma,
+    así el trabajador nunca lee datos que todavía no existen.
+    Con TAREAS_SINCRONAS = True se ejecuta en línea (tests, scripts).
+    """
+    if getattr(settings, 'TAREAS_SINCRONAS', False):
+        funcion(*args)
+        return
+    transaction.on_commit(lambda: _enviar(funcion, args))
+
+
+def _enviar(funcion, args):
+    futuro = _obtener_pool().submit(_ejecutar, funcion, args)
+    with _candado:
+        _pendientes.add(futuro)
+    futuro.add_done_callback(_terminada)
+
+
+def _terminada(futuro):
+    with _candado:
+        _pendientes.discard(futuro)
+
+
+def esperar():
+    # Para comandos de consola: no salir hasta que terminen las tareas encoladas
+    # (incluidas las que ellas mismas encolen, p. ej. derivados de una imagen)
+    while True:
+        with _candado:
+            pendientes = list(_pendientes)
+        if not pendientes:
+            return
+        wait(pendientes)
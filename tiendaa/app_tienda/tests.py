@@ -1,3 +1,1428 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import socket
+import tempfile
+import threading
+import time
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, router
+from django.db.models import Sum
+from django.test import AsyncClient, Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from . import iva
+from .almacenamiento import almacenamiento_contenido
+from .cupones import CuponNoValido, validar_cupon
+from . import busqueda, facturas, resumen, revalidacion
+from .importacion import adjuntar_imagen, importar_productos
+from .estaticos import minificar_css, minificar_js
+from .imagenes import generar_derivados, programar_derivados
+from .medicion import PresupuestoExcedido
+from .paginacion import decimal_o_none, paginar_keyset
+from .pedidos import StockInsuficiente, descontar_stock, mover_pedidos, registrar_devolucion, registrar_pedido
+from .replicas import ALIAS_REPLICA, leer_de_replica, marcar_escritura
+from .reservas import barrer_vencidas, reservar
+from .models import (
+    TAMANOS_IMAGEN, ArchivoAlmacenado, ConfiguracionIVA, Cupon, Devolucion, Factura, Pedido, PedidoProducto, Producto, Reserva, ResumenVentasDiario,
+)
+
+
+class PresupuestoConsultasMixin:
+    """
+    Para tests de vistas: falla si la petición hizo más consultas que el
+    presupuesto de su vista en settings.PRESUPUESTO_CONSULTAS (o si la vista
+    no tiene presupuesto). La medición la deja MedicionConsultasMiddleware en
+    response.medicion e incluye sesión, usuario y roles.
+    Cada petición se mide en frío (ver en_frio) y, si no depende de lo que
+    hay en la sesión, con una sesión nueva (ver sesion_nueva): el presupuesto
+    cubre el peor caso, no una petición que se aprovecha de las anteriores.
+    Los datos de prueba deben tener más filas que el presupuesto, así un
+    N+1 siempre se nota.
+    """
+
+    def en_frio(self):
+        # Como la primera petición de un proceso recién levantado
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        iva._memoria.update(version=None)
+
+    def sesion_nueva(self, usuario=None):
+        # Primera petición de la sesión: los roles se leen de la base y se guardan en ella
+        cliente = Client()
+        if usuario is not None:
+            cliente.force_login(usuario)
+        return cliente
+
+    def assertDentroDelPresupuesto(self, respuesta):
+        medicion = respuesta.medicion
+        self.assertIsNotNone(
+            medicion.presupuesto, f'La vista {medicion.vista!r} no tiene presupuesto en PRESUPUESTO_CONSULTAS'
+        )
+        self.assertLessEqual(
+            medicion.consultas, medicion.presupuesto,
+            f'{medicion.vista}: {medicion.consultas} consultas, presupuesto {medicion.presupuesto}',
+        )
+        return respuesta
+
+    def get_con_presupuesto(self, url, datos=None, estado=200, cliente=None):
+        self.en_frio()
+        respuesta = (cliente or self.client).get(url, datos)
+        self.assertEqual(respuesta.status_code, estado, url)
+        return self.assertDentroDelPresupuesto(respuesta)
+
+    def post_con_presupuesto(self, url, datos=None, estado=302, cliente=None):
+        self.en_frio()
+        respuesta = (cliente or self.client).post(url, datos)
+        self.assertEqual(respuesta.status_code, estado, url)
+        return self.assertDentroDelPresupuesto(respuesta)
+
+
+class DatosTiendaMixin:
+    PRODUCTOS = 40
+    PEDIDOS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.productos = Producto.objects.bulk_create(
+            Producto(nombre=f'Producto {i}', sku=f'SKU-{i}', precio_base=Decimal('10.00') + i, stock=100)
+            for i in range(cls.PRODUCTOS)
+        )
+        cls.cliente = User.objects.create_user('cliente', password='clave-cliente')
+        cls.bodeguero = User.objects.create_user('bodeguero', password='clave-bodega')
+        cls.financiero = User.objects.create_user('financiero', password='clave-finanzas')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-admin')
+        cls.bodeguero.groups.add(Group.objects.create(name='Bodeguero'))
+        cls.financiero.groups.add(Group.objects.create(name='Financiero'))
+
+        # Cada pedido de un cliente distinto: si el tablero consultara
+        # pedido.cliente uno por uno se notaría en el conteo
+        for i in range(cls.PEDIDOS):
+            cliente = cls.cliente if i % 3 == 0 else User.objects.create_user(f'comprador{i}')
+            pedido = Pedido.objects.create(
+                cliente=cliente, direccion_envio='Av. Siempre Viva 742', iva_aplicado=Decimal('15.00'),
+                subtotal=Decimal('30.00'), total=Decimal('34.50'),
+            )
+            PedidoProducto.objects.bulk_create(
+                PedidoProducto(pedido=pedido, producto=producto, cantidad=1, precio_unitario=producto.precio_base)
+                for producto in cls.productos[i % 10:i % 10 + 3]
+            )
+            Factura.objects.create(pedido=pedido)
+        cls.pedido = Pedido.objects.filter(cliente=cls.cliente).first()
+
+
+class PresupuestoConsultasTests(PresupuestoConsultasMixin, DatosTiendaMixin, TestCase):
+
+    def test_catalogo(self):
+        self.get_con_presupuesto('/', cliente=self.sesion_nueva())
+        self.get_con_presupuesto('/', {'orden': 'precio', 'por_pagina': 12}, cliente=self.sesion_nueva())
+        self.get_con_presupuesto('/', cliente=self.sesion_nueva(self.cliente))
+        self.get_con_presupuesto('/buscar/', {'q': 'Producto'}, cliente=self.sesion_nueva(self.cliente))
+
+    def test_carrito(self):
+        # El carrito vive en la sesión: la primera petición es la que llega con la sesión nueva
+        self.client.force_login(self.cliente)
+        for producto in self.productos[:5]:
+            self.get_con_presupuesto(f'/agregar-carrito/{producto.id}/', estado=302)
+        respuesta = self.get_con_presupuesto('/carrito/')
+        self.assertEqual(len(respuesta.context['carrito']), 5)
+        self.post_con_presupuesto(f'/actualizar-carrito/{self.productos[0].id}/', {'cantidad': 3})
+        self.get_con_presupuesto(f'/eliminar-carrito/{self.productos[1].id}/', estado=302)
+
+    def test_checkout(self):
+        self.client.force_login(self.cliente)
+        for producto in self.productos[:12]:
+            self.client.get(f'/agregar-carrito/{producto.id}/')
+        self.get_con_presupuesto('/checkout/')
+        respuesta = self.post_con_presupuesto('/checkout/', {'direccion': 'Calle 1'}, estado=200)
+        self.assertEqual(respuesta.context['pedido'].items.count(), 12)
+
+    def test_cliente(self):
+        self.get_con_presupuesto('/mis-compras/', cliente=self.sesion_nueva(self.cliente))
+        self.get_con_presupuesto(f'/factura/{self.pedido.id}/', cliente=self.sesion_nueva(self.cliente))
+
+    def test_bodega(self):
+        for url, datos in (
+            ('/bodega/', None),
+            ('/bodega/', {'estado': 'todos'}),
+            (f'/orden-despacho/{self.pedido.id}/', None),
+            ('/orden-despacho/lote/', None),
+        ):
+            self.get_con_presupuesto(url, datos, cliente=self.sesion_nueva(self.bodeguero))
+
+    def test_finanzas(self):
+        self.get_con_presupuesto('/reporte/', cliente=self.sesion_nueva(self.financiero))
+
+    def test_administracion(self):
+        self.get_con_presupuesto('/usuarios-tienda/usuarios/', cliente=self.sesion_nueva(self.admin))
+
+    @override_settings(ROOT_URLCONF='tiendaa.urls_asgi')
+    async def test_vistas_async(self):
+        # Las consultas de las vistas async corren en otro hilo y también se cuentan
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.cliente)
+        await cliente.get(f'/agregar-carrito/{self.productos[0].id}/')
+        for url in ('/', '/carrito/'):
+            respuesta = await cliente.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertGreater(respuesta.medicion.consultas, 0)
+            self.assertDentroDelPresupuesto(respuesta)
+
+
+class MedicionConsultasTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 5
+    PEDIDOS = 0
+
+    @override_settings(MEDICION_CABECERAS=True)
+    def test_cabeceras(self):
+        respuesta = self.client.get('/')
+        self.assertEqual(respuesta['X-Consultas'], str(respuesta.medicion.consultas))
+        self.assertIn('db;dur=', respuesta['Server-Timing'])
+        self.assertEqual(respuesta.medicion.vista, 'catalogo_publico')
+
+    @override_settings(MEDICION_CABECERAS=False)
+    def test_sin_cabeceras(self):
+        self.assertNotIn('X-Consultas', self.client.get('/'))
+
+    @override_settings(PRESUPUESTO_CONSULTAS={'catalogo_publico': 0}, MEDICION_ESTRICTA=True)
+    def test_presupuesto_estricto(self):
+        with self.assertRaises(PresupuestoExcedido):
+            self.client.get('/')
+
+    @override_settings(PRESUPUESTO_CONSULTAS={'catalogo_publico': 0})
+    def test_presupuesto_aviso(self):
+        with self.assertLogs('app_tienda.medicion', 'WARNING'):
+            self.assertEqual(self.client.get('/').status_code, 200)
+
+
+class GenerarDatosTests(TestCase):
+
+    def test_volumenes_y_consistencia(self):
+        call_command(
+            'generar_datos', clientes=20, bodegueros=2, financieros=1, productos=50, pedidos=300,
+            devoluciones=30, cupones=5, lote=100, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.filter(groups__name='cliente').count(), 20)
+        self.assertEqual(User.objects.filter(groups__name='Bodeguero').count(), 2)
+        self.assertEqual(User.objects.filter(groups__name='Financiero').count(), 1)
+        self.assertEqual(Producto.objects.count(), 50)
+        self.assertEqual(Cupon.objects.count(), 5)
+        self.assertEqual(Pedido.objects.count(), 300)
+        self.assertEqual(Factura.objects.count(), 300)
+        self.assertGreater(Devolucion.objects.count(), 0)
+        self.assertFalse(Pedido.objects.filter(items__isnull=True).exists())
+
+        # Los totales de cada pedido salen de sus líneas y el resumen diario está al día
+        pedido = Pedido.objects.filter(descuento=0).first()
+        lineas = sum(linea.cantidad * linea.precio_unitario for linea in pedido.items.all())
+        self.assertEqual(pedido.subtotal, lineas)
+        # (en SQLite las sumas llegan como float: se comparan al centavo)
+        self.assertAlmostEqual(
+            ResumenVentasDiario.objects.aggregate(total=Sum('total'))['total'],
+            Pedido.objects.aggregate(total=Sum('total'))['total'],
+            places=2,
+        )
+
+        with self.assertRaises(CommandError):
+            call_command('generar_datos', clientes=1, productos=5, pedidos=1, stdout=StringIO())
+
+
+class RouterReplicaTests(TestCase):
+    # Solo se mira a dónde iría cada consulta: el alias 'replica' no se abre
+    con_replica = mock.patch('app_tienda.replicas.replica_disponible', lambda: True)
+
+    @leer_de_replica
+    def _vista(self):
+        return router.db_for_read(Pedido), router.db_for_write(Pedido)
+
+    @con_replica
+    def test_vista_marcada_lee_de_la_replica(self):
+        self.assertEqual(self._vista(), (ALIAS_REPLICA, DEFAULT_DB_ALIAS))
+        # Fuera de la vista se vuelve a leer de la principal
+        self.assertEqual(router.db_for_read(Pedido), DEFAULT_DB_ALIAS)
+
+    @mock.patch('app_tienda.replicas.replica_disponible', lambda: False)
+    def test_sin_replica_todo_va_a_la_principal(self):
+        self.assertEqual(self._vista(), (DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS))
+
+    @con_replica
+    async def test_vista_async(self):
+        @leer_de_replica
+        async def vista(request):
+            return router.db_for_read(Pedido)
+        self.assertEqual(await vista(None), ALIAS_REPLICA)
+
+    @con_replica
+    def test_dentro_de_la_vista_se_escribe_en_la_principal(self):
+        @leer_de_replica
+        def vista(request):
+            # Solo se mira el alias de la lectura: 'replica' no existe en los tests
+            lectura = Producto.objects.filter(stock__gt=0).db
+            producto = Producto.objects.create(nombre='Nuevo', precio_base=1, stock=1)
+            return lectura, producto._state.db
+
+        self.assertEqual(vista(None), (ALIAS_REPLICA, DEFAULT_DB_ALIAS))
+        self.assertTrue(Producto.objects.using(DEFAULT_DB_ALIAS).filter(nombre='Nuevo').exists())
+
+    @con_replica
+    def test_quien_acaba_de_escribir_lee_de_la_principal(self):
+        @leer_de_replica
+        def vista(request):
+            return router.db_for_read(Pedido)
+
+        request = RequestFactory().get('/')
+        request.session = {}
+        self.assertEqual(vista(request), ALIAS_REPLICA)
+        marcar_escritura(request)
+        self.assertEqual(vista(request), DEFAULT_DB_ALIAS)
+        with override_settings(REPLICA_ATRASO_SEGUNDOS=0):
+            self.assertEqual(vista(request), ALIAS_REPLICA)
+
+    @con_replica
+    def test_mis_compras_despues_del_checkout(self):
+        cliente = User.objects.create_user('cliente')
+        producto = Producto.objects.create(nombre='Crema', precio_base=Decimal('10.00'), stock=5)
+        self.client.force_login(cliente)
+        self.client.get(f'/agregar-carrito/{producto.id}/')
+        self.client.post('/checkout/', {'direccion': 'Calle 1'})
+        # Si leyera de la réplica fallaría: el alias no está configurado en los tests
+        respuesta = self.client.get('/mis-compras/')
+        self.assertEqual(list(respuesta.context['pedidos']), list(Pedido.objects.filter(cliente=cliente)))
+        self.assertEqual(len(respuesta.context['pedidos']), 1)
+
+    def test_la_replica_no_se_migra(self):
+        self.assertFalse(router.allow_migrate(ALIAS_REPLICA, 'app_tienda', model_name='pedido'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'app_tienda', model_name='pedido'))
+
+
+class RolesTests(TestCase):
+
+    def setUp(self):
+        self.grupo = Group.objects.create(name='Bodeguero')
+        self.usuario = User.objects.create_user('bodeguero', password='clave-bodega')
+        self.usuario.groups.add(self.grupo)
+        self.client.force_login(self.usuario)
+
+    def assertAcceso(self, esperado):
+        self.assertEqual(self.client.get('/bodega/').status_code, 200 if esperado else 302)
+
+    def test_los_roles_se_leen_una_vez_por_sesion(self):
+        self.assertAcceso(True)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertAcceso(True)
+        self.assertFalse([c for c in consultas if 'auth_user_groups' in c['sql']])
+
+    def test_quitar_y_dar_un_rol_vale_desde_la_peticion_siguiente(self):
+        self.assertAcceso(True)
+        # Sin caché compartida: el cambio está en la base, no en la memoria de un proceso
+        self.usuario.groups.remove(self.grupo)
+        cache.clear()
+        self.assertAcceso(False)
+        User.objects.get(pk=self.usuario.pk).groups.add(self.grupo)
+        self.assertAcceso(True)
+
+    def test_cambios_desde_el_grupo(self):
+        self.assertAcceso(True)
+        self.grupo.user_set.clear()
+        self.assertAcceso(False)
+
+        self.grupo.user_set.add(self.usuario)
+        self.assertAcceso(True)
+        self.grupo.name = 'Bodega antigua'
+        self.grupo.save()
+        self.assertAcceso(False)
+
+        Group.objects.create(name='Bodeguero').user_set.add(self.usuario)
+        self.assertAcceso(True)
+        Group.objects.filter(name='Bodeguero').delete()
+        self.assertAcceso(False)
+
+
+class RevalidacionTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 5
+    PEDIDOS = 6
+
+    def revalidar(self, url, respuesta, **cabeceras):
+        return self.client.get(url, headers={'If-None-Match': respuesta['ETag'], **cabeceras})
+
+    def test_catalogo(self):
+        respuesta = self.client.get('/')
+        self.assertTrue(respuesta['ETag'].startswith('W/'))
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+        no_modificado = self.revalidar('/', respuesta)
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertLess(no_modificado.medicion.consultas, respuesta.medicion.consultas)
+
+        # Otra página del catálogo, o el mismo catálogo con sesión iniciada, es otra versión
+        self.assertEqual(self.revalidar('/?orden=precio', respuesta).status_code, 200)
+        self.client.force_login(self.cliente)
+        respuesta = self.client.get('/')
+        self.assertEqual(self.revalidar('/', respuesta).status_code, 304)
+
+        # Agregar al carrito cambia el contador del carrito y las reservas
+        self.client.get(f'/agregar-carrito/{self.productos[0].id}/')
+        respuesta = self.assertRevalida('/', respuesta)
+
+        # Cambios de stock por UPDATE directo (checkout, devoluciones) también cuentan
+        Producto.objects.filter(id=self.productos[1].id).update(stock=0, actualizado=timezone.now())
+        respuesta = self.assertRevalida('/', respuesta)
+
+        # La baja se ve en la versión que sale de la base (en cualquier proceso),
+        # sin depender de avisos después del commit ni de la caché local
+        self.productos[2].delete()
+        cache.clear()
+        self.assertRevalida('/', respuesta)
+
+    def test_las_reservas_de_otros_no_cambian_el_catalogo(self):
+        respuesta = self.client.get('/')
+        otro = self.client_class()
+        otro.force_login(self.cliente)
+        otro.get(f'/agregar-carrito/{self.productos[0].id}/')
+        self.assertTrue(Reserva.objects.exists())
+        self.assertEqual(self.revalidar('/', respuesta).status_code, 304)
+
+    def test_version_del_catalogo(self):
+        with self.assertNumQueries(1):
+            antes = revalidacion.version_catalogo()
+        self.productos[0].delete()
+        despues = revalidacion.version_catalogo()
+        self.assertEqual(despues[1], antes[1] + 1)
+        Producto.objects.all().delete()
+        self.assertEqual(revalidacion.version_catalogo(), (None, antes[1] + self.PRODUCTOS))
+
+    def assertRevalida(self, url, anterior):
+        respuesta = self.revalidar(url, anterior)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], anterior['ETag'])
+        return respuesta
+
+    def test_mis_compras(self):
+        self.client.force_login(self.cliente)
+        respuesta = self.client.get('/mis-compras/')
+        self.assertIn('private', respuesta['Cache-Control'])
+        self.assertEqual(self.revalidar('/mis-compras/', respuesta).status_code, 304)
+        self.assertEqual(
+            self.client.get('/mis-compras/', headers={'If-Modified-Since': respuesta['Last-Modified']}).status_code,
+            304,
+        )
+        mover_pedidos([self.pedido.id], 'Enviado')
+        self.assertRevalida('/mis-compras/', respuesta)
+
+    def test_factura_pendiente(self):
+        self.client.force_login(self.cliente)
+        url = f'/factura/{self.pedido.id}/'
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 304)
+        # Otro cliente no ve la factura ni con el ETag
+        self.client.force_login(self.bodeguero)
+        self.assertEqual(self.revalidar(url, respuesta).status_code, 404)
+
+    @override_settings(ROOT_URLCONF='tiendaa.urls_asgi')
+    async def test_catalogo_async(self):
+        cliente = AsyncClient()
+        respuesta = await cliente.get('/')
+        no_modificado = await cliente.get('/', headers={'If-None-Match': respuesta['ETag']})
+        self.assertEqual(no_modificado.status_code, 304)
+
+
+class TarjetasEnCacheTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 3
+    PEDIDOS = 1
+
+    def setUp(self):
+        caches['fragmentos'].clear()
+        self.producto = self.productos[0]
+
+    def renombrar_sin_version(self, nombre):
+        # Cambio que no pasa por los caminos que mueven `actualizado`: la tarjeta sigue en caché
+        Producto.objects.filter(id=self.producto.id).update(nombre=nombre)
+
+    def test_la_tarjeta_sale_de_la_cache_hasta_que_cambia_la_version(self):
+        self.assertContains(self.client.get('/'), 'Producto 0')
+        self.renombrar_sin_version('Nombre nuevo')
+        self.assertContains(self.client.get('/'), 'Producto 0')
+
+        self.client.force_login(self.bodeguero)
+        self.client.post(f'/editar-producto/{self.producto.id}/', {
+            'sku': self.producto.sku, 'nombre': 'Editado', 'precio_base': '12.00', 'stock': 100,
+        })
+        self.assertContains(self.client.get('/'), 'Editado')
+
+    def test_checkout_y_devolucion_renuevan_la_tarjeta(self):
+        self.client.get('/')
+        self.renombrar_sin_version('Tras la venta')
+        registrar_pedido(self.cliente, 'Calle 1', {self.producto.id: 1})
+        self.assertContains(self.client.get('/'), 'Tras la venta')
+
+        self.renombrar_sin_version('Tras la devolución')
+        registrar_devolucion(self.pedido, self.producto, 1)
+        self.assertContains(self.client.get('/'), 'Tras la devolución')
+
+    def test_controles_por_rol_fuera_de_la_cache(self):
+        editar = f'/editar-producto/{self.producto.id}/'
+        self.assertNotContains(self.client.get('/'), editar)
+        self.client.force_login(self.bodeguero)
+        self.assertContains(self.client.get('/'), editar)
+        self.client.force_login(self.cliente)
+        self.assertNotContains(self.client.get('/'), editar)
+
+
+class EstaticosComprimidosTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.raiz = Path(directorio.name)
+        perfil = override_settings(STATIC_ROOT=self.raiz, STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'app_tienda.estaticos.EstaticosComprimidos'},
+        })
+        perfil.enable()
+        self.addCleanup(perfil.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_minificar_css_respeta_las_cadenas(self):
+        css = '/* tema */\n.a  >  b {\n  color: red;\n  content: "a  b: c";\n}\n'
+        self.assertEqual(minificar_css(css), '.a>b{color:red;content:"a  b: c"}')
+
+    def test_minificar_js_no_toca_template_literals(self):
+        self.assertEqual(minificar_js('// saludo\n  let a = 1;\n\n  f(a);\n'), 'let a = 1;\nf(a);\n')
+        plantilla = 'const t = `\n  hola\n`;\n'
+        self.assertEqual(minificar_js(plantilla), plantilla)
+
+    def test_las_paginas_piden_los_nombres_con_huella(self):
+        html = self.client.get('/').content.decode()
+        self.assertRegex(html, r'/static/css/styles\.[0-9a-f]{12}\.css')
+        self.assertRegex(html, r'/static/css/img/banner_skincare\.[0-9a-f]{12}\.png')
+
+    def test_se_sirve_comprimido_y_cacheable_para_siempre(self):
+        nombre = next(self.raiz.glob('css/styles.*.css')).relative_to(self.raiz).as_posix()
+        respuesta = self.client.get(f'/static/{nombre}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(respuesta['Content-Type'], 'text/css')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+        css = gzip.decompress(b''.join(respuesta.streaming_content)).decode()
+        self.assertEqual(css, (self.raiz / nombre).read_text())
+        self.assertNotIn('\n  ', css)
+
+        # Sin huella en el nombre: revalidar cada vez
+        respuesta = self.client.get('/static/css/styles.css')
+        self.assertNotIn('Content-Encoding', respuesta)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+
+class AlmacenamientoPorContenidoTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.raiz = Path(directorio.name)
+        medios = override_settings(MEDIA_ROOT=self.raiz)
+        medios.enable()
+        self.addCleanup(medios.disable)
+
+    def archivos_en(self, carpeta):
+        return sorted(p.name for p in (self.raiz / carpeta).iterdir())
+
+    def test_el_mismo_contenido_se_guarda_una_vez(self):
+        nombre = almacenamiento_contenido.save('productos/a.png', ContentFile(b'imagen'))
+        self.assertEqual(almacenamiento_contenido.save('productos/b.png', ContentFile(b'imagen')), nombre)
+        self.assertNotEqual(almacenamiento_contenido.save('productos/c.png', ContentFile(b'otra')), nombre)
+        self.assertEqual(len(self.archivos_en('productos')), 2)
+        self.assertEqual(ArchivoAlmacenado.objects.filter(nombre=nombre).count(), 1)
+
+    def test_guardado_simultaneo_del_mismo_contenido(self):
+        nombre = almacenamiento_contenido.save('productos/a.png', ContentFile(b'imagen'))
+        # La otra petición también vio que no existía y llega tarde a escribirlo
+        with mock.patch.object(almacenamiento_contenido, 'exists', return_value=False):
+            self.assertEqual(almacenamiento_contenido.save('productos/a.png', ContentFile(b'imagen')), nombre)
+        self.assertEqual(self.archivos_en('productos'), [Path(nombre).name])
+        self.assertEqual((self.raiz / nombre).read_bytes(), b'imagen')
+
+    def test_referencias_de_los_productos(self):
+        def referencias(nombre):
+            return ArchivoAlmacenado.objects.get(nombre=nombre).referencias
+
+        uno = Producto.objects.create(nombre='Uno', precio_base=1, stock=1, imagen=ContentFile(b'img', 'uno.png'))
+        dos = Producto.objects.create(nombre='Dos', precio_base=1, stock=1, imagen=ContentFile(b'img', 'dos.png'))
+        nombre = uno.imagen.name
+        self.assertEqual(dos.imagen.name, nombre)
+        self.assertEqual(referencias(nombre), 2)
+
+        dos.imagen = ContentFile(b'nueva', 'dos.png')
+        dos.save()
+        self.assertEqual(referencias(nombre), 1)
+        self.assertEqual(referencias(dos.imagen.name), 1)
+        uno.delete()
+        self.assertEqual(referencias(nombre), 0)
+
+    def test_limpiar_archivos_borra_solo_huerfanos_fuera_de_gracia(self):
+        usado = Producto.objects.create(nombre='Uno', precio_base=1, stock=1, imagen=ContentFile(b'usado', 'a.png'))
+        viejo = almacenamiento_contenido.save('productos/b.png', ContentFile(b'viejo'))
+        reciente = almacenamiento_contenido.save('productos/c.png', ContentFile(b'reciente'))
+        ArchivoAlmacenado.objects.filter(nombre=viejo).update(actualizado=timezone.now() - timedelta(days=2))
+
+        call_command('limpiar_archivos', stdout=StringIO())
+        self.assertFalse(almacenamiento_contenido.exists(viejo))
+        self.assertFalse(ArchivoAlmacenado.objects.filter(nombre=viejo).exists())
+        for nombre in (usado.imagen.name, reciente):
+            self.assertTrue(almacenamiento_contenido.exists(nombre))
+            self.assertTrue(ArchivoAlmacenado.objects.filter(nombre=nombre).exists())
+
+    def test_limpiar_archivos_no_borra_lo_que_se_vuelve_a_subir(self):
+        nombre = almacenamiento_contenido.save('productos/a.png', ContentFile(b'imagen'))
+        ArchivoAlmacenado.objects.filter(nombre=nombre).update(actualizado=timezone.now() - timedelta(days=2))
+
+        class SubidaAlListar(StringIO):
+            # La misma imagen se vuelve a subir justo después de que el comando eligió el huérfano
+            def write(salida, texto):
+                if texto.startswith(nombre):
+                    almacenamiento_contenido.save('productos/otra.png', ContentFile(b'imagen'))
+                return super().write(texto)
+
+        call_command('limpiar_archivos', stdout=SubidaAlListar())
+        self.assertTrue(almacenamiento_contenido.exists(nombre))
+        self.assertTrue(ArchivoAlmacenado.objects.filter(nombre=nombre).exists())
+
+    def test_subir_despues_de_limpiar_vuelve_a_escribir_el_archivo(self):
+        nombre = almacenamiento_contenido.save('productos/a.png', ContentFile(b'imagen'))
+        ArchivoAlmacenado.objects.filter(nombre=nombre).update(actualizado=timezone.now() - timedelta(days=2))
+        call_command('limpiar_archivos', stdout=StringIO())
+        producto = Producto.objects.create(
+            nombre='Uno', precio_base=1, stock=1, imagen=ContentFile(b'imagen', 'b.png')
+        )
+        self.assertEqual(producto.imagen.name, nombre)
+        self.assertEqual((self.raiz / nombre).read_bytes(), b'imagen')
+        self.assertEqual(ArchivoAlmacenado.objects.get(nombre=nombre).referencias, 1)
+
+    def test_consolidar_archivos_anteriores(self):
+        carpeta = self.raiz / 'productos'
+        carpeta.mkdir()
+        for nombre, contenido in (('1.webp', b'igual'), ('1_nRYSkE3.webp', b'igual'), ('2.png', b'otra')):
+            (carpeta / nombre).write_bytes(contenido)
+        uno = Producto.objects.create(nombre='Uno', precio_base=1, stock=1, imagen='productos/1.webp')
+        copia = Producto.objects.create(nombre='Copia', precio_base=1, stock=1, imagen='productos/1_nRYSkE3.webp')
+        dos = Producto.objects.create(nombre='Dos', precio_base=1, stock=1, imagen='productos/2.png')
+
+        call_command('limpiar_archivos', '--consolidar', stdout=StringIO())
+        for producto in (uno, copia, dos):
+            producto.refresh_from_db()
+        self.assertEqual(uno.imagen.name, copia.imagen.name)
+        self.assertTrue(almacenamiento_contenido.nombre_por_contenido(uno.imagen.name))
+        self.assertEqual(sorted(self.archivos_en('productos')), sorted([
+            Path(uno.imagen.name).name, Path(dos.imagen.name).name,
+        ]))
+        self.assertEqual((self.raiz / dos.imagen.name).read_bytes(), b'otra')
+        self.assertEqual(ArchivoAlmacenado.objects.get(nombre=uno.imagen.name).referencias, 2)
+        self.assertEqual(ArchivoAlmacenado.objects.get(nombre=dos.imagen.name).referencias, 1)
+        self.assertFalse(ArchivoAlmacenado.objects.filter(nombre__in=['productos/1.webp', 'productos/2.png']).exists())
+
+
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user('cliente')
+        cls.escaso = Producto.objects.create(nombre='Escaso', precio_base=Decimal('10.00'), stock=2)
+        cls.sobrado = Producto.objects.create(nombre='Sobrado', precio_base=Decimal('5.00'), stock=50)
+
+    def stock(self, producto):
+        return Producto.objects.values_list('stock', flat=True).get(id=producto.id)
+
+    def test_descontar_stock_no_vende_de_mas(self):
+        descontar_stock({self.escaso.id: 2, self.sobrado.id: 1})
+        self.assertEqual(self.stock(self.escaso), 0)
+        with self.assertRaises(StockInsuficiente) as error:
+            descontar_stock({self.escaso.id: 1, self.sobrado.id: 1})
+        self.assertEqual(error.exception.productos, ['Escaso'])
+        # Todo o nada: la fila que sí alcanzaba tampoco se descontó
+        self.assertEqual(self.stock(self.sobrado), 49)
+
+    def test_pedido_sin_stock_no_deja_nada_a_medias(self):
+        with self.assertRaises(StockInsuficiente):
+            registrar_pedido(self.cliente, 'Calle 1', {self.sobrado.id: 3, self.escaso.id: 3})
+        self.assertEqual(self.stock(self.sobrado), 50)
+        self.assertFalse(Pedido.objects.exists())
+        self.assertFalse(Factura.objects.exists())
+        self.assertFalse(ResumenVentasDiario.objects.exists())
+
+    def test_pedido_calcula_totales_y_descuenta(self):
+        pedido, iva = registrar_pedido(self.cliente, 'Calle 1', {str(self.escaso.id): 2, str(self.sobrado.id): 2})
+        self.assertEqual(pedido.subtotal, Decimal('30.00'))
+        self.assertEqual(pedido.total, pedido.subtotal + iva)
+        self.assertEqual(pedido.items.count(), 2)
+        self.assertTrue(Factura.objects.filter(pedido=pedido).exists())
+        self.assertEqual((self.stock(self.escaso), self.stock(self.sobrado)), (0, 48))
+
+
+class ReservasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user('cliente')
+        cls.producto = Producto.objects.create(nombre='Escaso', precio_base=Decimal('10.00'), stock=3)
+
+    def test_reservar_aparta_solo_lo_libre(self):
+        self.assertEqual(reservar('carrito-a', self.producto.id, 2), (2, 3))
+        # El otro carrito solo puede apartar lo que queda
+        self.assertEqual(reservar('carrito-b', self.producto.id, 5), (1, 1))
+        self.assertEqual(reservar('carrito-c', self.producto.id, 1), (0, 0))
+        self.assertFalse(Reserva.objects.filter(carrito='carrito-c').exists())
+
+    def test_el_checkout_respeta_las_reservas_de_otros(self):
+        reservar('carrito-a', self.producto.id, 2)
+        with self.assertRaises(StockInsuficiente):
+            registrar_pedido(self.cliente, 'Calle 1', {self.producto.id: 2}, carrito_id='carrito-b')
+        # Las propias no cuentan en contra y se consumen con el pedido
+        registrar_pedido(self.cliente, 'Calle 1', {self.producto.id: 2}, carrito_id='carrito-a')
+        self.assertEqual(Producto.objects.get(id=self.producto.id).stock, 1)
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_las_reservas_vencidas_liberan_el_stock(self):
+        reservar('carrito-a', self.producto.id, 3)
+        Reserva.objects.update(expira=timezone.now() - timedelta(minutes=1))
+        registrar_pedido(self.cliente, 'Calle 1', {self.producto.id: 3}, carrito_id='carrito-b')
+        self.assertEqual(barrer_vencidas(), 1)
+
+
+class IvaVigenteTests(TestCase):
+
+    def setUp(self):
+        iva._memoria.update(version=None, porcentaje=None, leido=0.0)
+
+    def nuevo_iva(self, porcentaje):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ConfiguracionIVA.objects.create(porcentaje=porcentaje)
+
+    def test_el_cambio_se_ve_al_confirmarse(self):
+        self.assertEqual(iva.iva_vigente(), iva.IVA_POR_DEFECTO)
+        self.nuevo_iva(12)
+        self.assertEqual(iva.iva_vigente(), 12)
+        with self.assertNumQueries(0):
+            self.assertEqual(iva.iva_vigente(), 12)
+
+    def test_otro_proceso_lo_ve_al_vencer_la_memoria(self):
+        self.nuevo_iva(12)
+        self.assertEqual(iva.iva_vigente(), 12)
+        # Agregado por otro proceso: aquí la versión en caché no cambió
+        ConfiguracionIVA.objects.create(porcentaje=15)
+        self.assertEqual(iva.iva_vigente(), 12)
+        with mock.patch('app_tienda.iva.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertEqual(iva.iva_vigente(), 15)
+
+    def test_guardar_una_fila_vieja_no_cambia_su_vigencia(self):
+        anterior = self.nuevo_iva(12)
+        fecha = anterior.vigente_desde
+        self.nuevo_iva(15)
+        anterior.save()
+        anterior.refresh_from_db()
+        self.assertEqual(anterior.vigente_desde, fecha)
+        self.assertEqual(iva.iva_vigente(), 15)
+
+    def test_iva_en_una_fecha_antes_y_despues_del_cambio(self):
+        ahora = timezone.now()
+        ConfiguracionIVA.objects.create(porcentaje=12, vigente_desde=ahora - timedelta(days=60))
+        ConfiguracionIVA.objects.create(porcentaje=15, vigente_desde=ahora - timedelta(days=10))
+        self.assertEqual(iva.iva_en(ahora - timedelta(days=90)), iva.IVA_POR_DEFECTO)
+        self.assertEqual(iva.iva_en(ahora - timedelta(days=30)), 12)
+        self.assertEqual(iva.iva_en(ahora - timedelta(days=10)), 15)
+        with self.assertNumQueries(1):
+            self.assertEqual(iva.iva_en(ahora), 15)
+
+    def test_un_cambio_programado_entra_en_su_fecha(self):
+        ahora = timezone.now()
+        self.nuevo_iva(12)
+        with self.captureOnCommitCallbacks(execute=True):
+            ConfiguracionIVA.objects.create(porcentaje=16, vigente_desde=ahora + timedelta(days=1))
+        self.assertEqual(iva.iva_vigente(), 12)
+        self.assertEqual(iva.iva_en(ahora + timedelta(days=2)), 16)
+        iva._memoria.update(version=None)
+        with mock.patch('app_tienda.iva.timezone.now', return_value=ahora + timedelta(days=2)):
+            self.assertEqual(iva.iva_vigente(), 16)
+
+
+class CuponesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana')
+        cls.beto = User.objects.create_user('beto')
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'clave-admin')
+        cls.producto = Producto.objects.create(nombre='Crema', precio_base=Decimal('10.00'), stock=100)
+
+    def setUp(self):
+        cache.clear()
+
+    def comprar(self, cliente, codigo):
+        return registrar_pedido(cliente, 'Calle 1', {self.producto.id: 1}, codigo)[0]
+
+    def test_limite_total_y_por_cliente(self):
+        Cupon.objects.create(codigo='DOS', descuento_porcentaje=10, usos_maximos=2, usos_por_usuario=1)
+        self.assertEqual(self.comprar(self.ana, 'dos').descuento, Decimal('1.00'))
+        with self.assertRaisesMessage(CuponNoValido, 'máximo de veces'):
+            self.comprar(self.ana, 'DOS')
+        self.comprar(self.beto, 'DOS')
+        with self.assertRaisesMessage(CuponNoValido, 'límite de usos'):
+            self.comprar(User.objects.create_user('carla'), 'DOS')
+        self.assertEqual(Cupon.objects.get(codigo='DOS').usos, 2)
+        # Los intentos rechazados no dejaron pedidos
+        self.assertEqual(Pedido.objects.count(), 2)
+
+    def test_vigencia(self):
+        ahora = timezone.now()
+        Cupon.objects.create(codigo='LUEGO', descuento_porcentaje=10, valido_desde=ahora + timedelta(days=1))
+        Cupon.objects.create(codigo='VENCIDO', descuento_porcentaje=10, valido_hasta=ahora - timedelta(days=1))
+        with self.assertRaisesMessage(CuponNoValido, 'todavía no'):
+            validar_cupon('LUEGO')
+        with self.assertRaisesMessage(CuponNoValido, 'venció'):
+            validar_cupon('VENCIDO')
+
+    def test_los_codigos_inexistentes_se_recuerdan(self):
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                with self.assertRaises(CuponNoValido):
+                    validar_cupon('INVENTADO')
+        # Con forma imposible ni siquiera se buscan
+        with self.assertNumQueries(0), self.assertRaises(CuponNoValido):
+            validar_cupon('no es un código!')
+        # Crear el cupón borra el "no existe" de la caché
+        with self.captureOnCommitCallbacks(execute=True):
+            Cupon.objects.create(codigo='INVENTADO', descuento_porcentaje=5)
+        self.assertEqual(validar_cupon('INVENTADO')['descuento_porcentaje'], 5)
+
+    def test_formulario_valida_los_limites_y_las_fechas(self):
+        self.client.force_login(self.admin)
+        respuesta = self.client.post('/admin-tienda/cupones/', {
+            'codigo': 'MAL', 'descuento_porcentaje': '10', 'usos_maximos': 'muchos', 'usos_por_usuario': '-1',
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(set(respuesta.context['form'].errors), {'usos_maximos', 'usos_por_usuario'})
+        self.assertFalse(Cupon.objects.exists())
+
+        self.client.post('/admin-tienda/cupones/', {
+            'codigo': ' verano ', 'descuento_porcentaje': '15',
+            'valido_desde': '2026-01-01T08:00', 'valido_hasta': '2026-02-01T08:00',
+        })
+        cupon = Cupon.objects.get(codigo='VERANO')
+        self.assertTrue(timezone.is_aware(cupon.valido_desde))
+        self.assertEqual(timezone.localtime(cupon.valido_desde).hour, 8)
+
+        respuesta = self.client.post('/admin-tienda/cupones/', {
+            'codigo': 'VERANO', 'descuento_porcentaje': '15',
+            'valido_desde': '2026-02-01T08:00', 'valido_hasta': '2026-01-01T08:00',
+        })
+        self.assertEqual(set(respuesta.context['form'].errors), {'codigo', '__all__'})
+
+
+class ResumenVentasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user('cliente')
+        cls.crema = Producto.objects.create(nombre='Crema', precio_base=Decimal('10.00'), stock=100)
+        cls.jabon = Producto.objects.create(nombre='Jabón', precio_base=Decimal('4.50'), stock=100)
+
+    def filas(self):
+        # Las filas que quedan en cero tras mover pedidos no cuentan
+        return {
+            (fila.fecha, fila.estado): (fila.pedidos, fila.total, fila.devoluciones_monto)
+            for fila in ResumenVentasDiario.objects.all()
+            if fila.pedidos or fila.total or fila.devoluciones_monto
+        }
+
+    def assertIgualAlReconstruido(self):
+        incremental = self.filas()
+        resumen.reconstruir()
+        self.assertEqual(incremental, self.filas())
+
+    def test_el_incremental_coincide_con_reconstruir(self):
+        pedidos = [
+            registrar_pedido(self.cliente, 'Calle 1', {self.crema.id: 2, self.jabon.id: 1})[0] for _ in range(3)
+        ]
+        self.assertIgualAlReconstruido()
+
+        mover_pedidos([p.id for p in pedidos[:2]], 'Enviado')
+        registrar_devolucion(pedidos[0], self.crema, 1)
+        self.assertIgualAlReconstruido()
+
+        # La devolución no se mueve con el estado del pedido ni con el precio del producto
+        mover_pedidos([pedidos[0].id], 'Entregado')
+        Producto.objects.filter(id=self.crema.id).update(precio_base=Decimal('99.00'))
+        self.assertIgualAlReconstruido()
+
+        tarjetas = resumen.totales()
+        self.assertEqual(tarjetas['devoluciones_monto'], Decimal('10.00'))
+        self.assertEqual(tarjetas['ingresos'], pedidos[0].total)
+        self.assertEqual(tarjetas['pendientes_monto'], pedidos[1].total + pedidos[2].total)
+
+
+# Las tareas encoladas corren en línea al ejecutar los on_commit del test
+# (en el pool usarían otra conexión, que no ve los datos del test)
+tareas_en_linea = mock.patch('app_tienda.tareas._enviar', lambda funcion, args: funcion(*args))
+
+
+@tareas_en_linea
+class FacturasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = User.objects.create_user('cliente', email='cliente@example.com')
+        cls.producto = Producto.objects.create(nombre='Crema (50 ml)', precio_base=Decimal('10.00'), stock=100)
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        medios = override_settings(MEDIA_ROOT=directorio.name)
+        medios.enable()
+        self.addCleanup(medios.disable)
+        self.client.force_login(self.cliente)
+
+    def comprar(self, generar=True):
+        with self.captureOnCommitCallbacks(execute=generar):
+            return registrar_pedido(self.cliente, 'Calle 1', {self.producto.id: 3})[0]
+
+    def test_el_pdf_se_genera_al_confirmar_y_se_sirve(self):
+        pedido = self.comprar()
+        factura = Factura.objects.get(pedido=pedido)
+        self.assertTrue(factura.documento_digital.name.startswith('facturas/'))
+        self.assertEqual(ArchivoAlmacenado.objects.get(nombre=factura.documento_digital.name).referencias, 1)
+
+        respuesta = self.client.get(f'/factura/{pedido.id}/')
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        pdf = b''.join(respuesta.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.rstrip().endswith(b'%%EOF'))
+        self.assertEqual(pdf.count(b'/Type /Page '), 1)
+
+        # El nombre es el hash: el navegador revalida con el ETag y recibe 304
+        respuesta = self.client.get(f'/factura/{pedido.id}/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_mientras_no_se_genera_se_muestra_la_pagina(self):
+        pedido = self.comprar(generar=False)
+        respuesta = self.client.get(f'/factura/{pedido.id}/')
+        self.assertEqual(respuesta['Content-Type'], 'text/html; charset=utf-8')
+        self.assertContains(respuesta, 'Crema (50 ml)')
+
+    @override_settings(ROOT_URLCONF='tiendaa.urls_asgi')
+    async def test_por_asgi_el_pdf_no_se_lee_completo_a_memoria(self):
+        pedido = await sync_to_async(self.comprar)()
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.cliente)
+        respuesta = await cliente.get(f'/factura/{pedido.id}/')
+        self.assertTrue(respuesta.is_async)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            pdf = b''.join([parte async for parte in respuesta.streaming_content])
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertEqual(int(respuesta['Content-Length']), len(pdf))
+
+    def test_solo_se_genera_una_vez(self):
+        pedido = self.comprar()
+        nombre = Factura.objects.get(pedido=pedido).documento_digital.name
+        with self.assertNumQueries(1):
+            facturas.generar_factura(pedido.id)
+        self.assertEqual(Factura.objects.get(pedido=pedido).documento_digital.name, nombre)
+
+
+@tareas_en_linea
+class DerivadosImagenTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        medios = override_settings(MEDIA_ROOT=directorio.name)
+        medios.enable()
+        self.addCleanup(medios.disable)
+
+    def producto_con_imagen(self, tamano=(600, 300), modo='RGB'):
+        salida = io.BytesIO()
+        Image.new(modo, tamano).save(salida, 'PNG')
+        producto = Producto.objects.create(nombre='Crema', precio_base=1, stock=1)
+        producto.imagen.save('crema.png', ContentFile(salida.getvalue()))
+        return producto
+
+    def test_los_derivados_se_generan_al_confirmar(self):
+        producto = self.producto_con_imagen()
+        with self.captureOnCommitCallbacks() as al_confirmar:
+            programar_derivados(producto)
+        producto.refresh_from_db()
+        self.assertEqual(producto.imagenes_derivadas, {})
+        self.assertEqual(len(al_confirmar), 1)
+
+        al_confirmar[0]()
+        producto.refresh_from_db()
+        self.assertEqual(set(producto.imagenes_derivadas), set(TAMANOS_IMAGEN))
+        for tamano, derivado in producto.imagenes_derivadas.items():
+            with almacenamiento_contenido.open(derivado['nombre']) as archivo, Image.open(archivo) as imagen:
+                self.assertEqual(imagen.format, 'WEBP')
+                # Nunca se agranda: el detalle se queda en los 600 px del original
+                self.assertEqual(imagen.size[0], min(TAMANOS_IMAGEN[tamano], 600))
+                self.assertEqual(derivado['ancho'], imagen.size[0])
+            self.assertEqual(ArchivoAlmacenado.objects.get(nombre=derivado['nombre']).referencias, 1)
+        self.assertIn(producto.imagenes_derivadas['tarjeta']['nombre'], producto.url_imagen())
+        self.assertTrue(producto.srcset.endswith(' 600w'))
+
+    def test_una_imagen_nueva_reemplaza_los_derivados(self):
+        producto = self.producto_con_imagen()
+        with self.captureOnCommitCallbacks(execute=True):
+            programar_derivados(producto)
+        producto.refresh_from_db()
+        anteriores = [d['nombre'] for d in producto.imagenes_derivadas.values()]
+        imagen_anterior = producto.imagen.name
+
+        salida = io.BytesIO()
+        Image.new('RGB', (200, 100), 'white').convert('P').save(salida, 'GIF')
+        producto.imagen.save('crema.gif', ContentFile(salida.getvalue()))
+        with self.captureOnCommitCallbacks(execute=True):
+            programar_derivados(producto)
+            # La tarea de la imagen anterior llega tarde y no toca nada
+            generar_derivados(producto.id, imagen_anterior)
+        producto.refresh_from_db()
+        self.assertEqual(producto.imagenes_derivadas['detalle']['ancho'], 200)
+        self.assertFalse(ArchivoAlmacenado.objects.filter(nombre__in=anteriores, referencias__gt=0).exists())
+
+
+class TransicionesBodegaTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 3
+    PEDIDOS = 3
+
+    def setUp(self):
+        self.client.force_login(self.bodeguero)
+        self.pendiente, self.otro, self.enviado = Pedido.objects.order_by('id')
+        mover_pedidos([self.enviado.id], 'Enviado')
+
+    def estado(self, pedido):
+        return Pedido.objects.values_list('estado', flat=True).get(id=pedido.id)
+
+    def test_el_selector_solo_ofrece_el_paso_siguiente(self):
+        html = self.client.get('/bodega/', {'estado': 'todos'}).content.decode()
+        fila = html[html.index(f'/bodega/actualizar/{self.pendiente.id}/'):]
+        fila = fila[:fila.index('</select>')]
+        self.assertIn('value="Enviado"', fila)
+        self.assertNotIn('value="Entregado"', fila)
+
+    def test_saltar_un_estado_se_rechaza_y_se_avisa(self):
+        respuesta = self.client.post(
+            f'/bodega/actualizar/{self.pendiente.id}/', {'estado': 'Entregado'}, follow=True
+        )
+        self.assertContains(respuesta, 'no puede pasar de Pendiente a Entregado')
+        self.assertEqual(self.estado(self.pendiente), 'Pendiente')
+        self.assertFalse(self.pendiente.historial.exists())
+
+    def test_el_lote_avisa_los_que_no_se_movieron(self):
+        respuesta = self.client.post(
+            '/bodega/mover/', {'pedido': [self.pendiente.id, self.enviado.id], 'estado': 'Entregado'}, follow=True
+        )
+        self.assertContains(respuesta, f'No se pudieron pasar a Entregado: #00{self.pendiente.id} (Pendiente)')
+        self.assertEqual(self.estado(self.enviado), 'Entregado')
+        self.assertEqual(self.estado(self.pendiente), 'Pendiente')
+
+
+class ImportacionTests(TestCase):
+
+    def importar(self, texto, carpeta=None):
+        return importar_productos(io.BytesIO(texto.encode()), 'csv', carpeta)
+
+    def carpeta_con(self, nombre, contenido):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        (Path(directorio.name) / nombre).write_bytes(contenido)
+        return directorio.name
+
+    def png(self):
+        salida = io.BytesIO()
+        Image.new('RGB', (4, 4), 'white').save(salida, 'PNG')
+        return salida.getvalue()
+
+    def test_crea_y_actualiza_por_sku(self):
+        resultado = self.importar('sku,nombre,precio_base,stock\nA-1,Crema,10.00,5\nB-2,Jabón,4.50,8\n')
+        self.assertEqual((resultado.creados, resultado.actualizados), (2, 0))
+
+        resultado = self.importar('sku,nombre,precio_base,stock\nA-1,Crema,12.00,5\nB-2,Jabón,4.50,8\nC-3,Tónico,7,1\n')
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.sin_cambios), (1, 1, 1))
+        self.assertEqual(Producto.objects.get(sku='A-1').precio_base, Decimal('12.00'))
+        self.assertEqual(Producto.objects.count(), 3)
+
+    def test_las_filas_invalidas_se_reportan_sin_detener_la_importacion(self):
+        resultado = self.importar(
+            'sku,nombre,precio_base,stock\nA-1,Crema,diez,5\n,Sin SKU,1,1\nB-2,Jabón,4.50,-3\nC-3,Tónico,7,1\n'
+        )
+        self.assertEqual(resultado.creados, 1)
+        self.assertEqual([linea for linea, _ in resultado.errores], [2, 3, 4])
+        self.assertIn('precio_base', resultado.errores[0][1])
+        self.assertEqual(list(Producto.objects.values_list('sku', flat=True)), ['C-3'])
+
+    def test_no_se_descargan_imagenes_de_la_red_interna(self):
+        resultado = self.importar(
+            'sku,nombre,precio_base,stock,imagen\n'
+            'A-1,Crema,1,1,http://127.0.0.1/admin.png\n'
+            'B-2,Jabón,1,1,http://169.254.169.254/latest/meta-data/\n'
+            'C-3,Tónico,1,1,file:///etc/passwd\n'
+            'D-4,Loción,1,1,../fuera.png\n'
+        )
+        self.assertEqual(resultado.total_errores, 4)
+        self.assertFalse(Producto.objects.exists())
+
+        # Un nombre público que resuelve a una dirección privada tampoco
+        privada = [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.7', 0))]
+        with mock.patch('app_tienda.importacion.socket.getaddrinfo', return_value=privada):
+            resultado = self.importar('sku,nombre,precio_base,stock,imagen\nA-1,Crema,1,1,https://cdn.example.com/a.png\n')
+        self.assertEqual(resultado.total_errores, 1)
+
+    def descargar_con_dns(self, origen, dns, servidor=None):
+        """
+        Corre adjuntar_imagen con un DNS falso ({host: [ip, ...]}, una
+        respuesta por consulta) y devuelve las IPs a las que intentó
+        conectarse. La IP pública 93.184.216.34 se desvía al servidor local.
+        """
+        conexiones = []
+
+        def resolver(host, *args, **kwargs):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (dns[host].pop(0), 0))]
+
+        def conectar(direccion, *args):
+            conexiones.append(direccion[0])
+            if servidor is None:
+                raise OSError('sin red')
+            conexion = socket.socket()
+            conexion.connect(('127.0.0.1', servidor.server_port))
+            return conexion
+
+        producto, _ = Producto.objects.update_or_create(
+            sku='A-1', defaults={'nombre': 'Crema', 'precio_base': 1, 'stock': 1, 'imagen_origen': origen}
+        )
+        with mock.patch('app_tienda.importacion.socket.getaddrinfo', resolver), \
+                mock.patch('app_tienda.importacion.socket.create_connection', conectar), \
+                self.assertLogs('app_tienda.importacion', 'WARNING') as registro:
+            adjuntar_imagen(producto.id, origen)
+        return conexiones, registro.output[0]
+
+    def test_la_descarga_se_conecta_a_la_ip_revisada(self):
+        # Pública al importar, privada al descargar (DNS rebinding): no hay conexión
+        dns = {'cdn.example.com': ['93.184.216.34', '10.0.0.7']}
+        with mock.patch('app_tienda.importacion.socket.getaddrinfo', lambda host, *a, **k: [
+            (socket.AF_INET, socket.SOCK_STREAM, 6, '', (dns[host][0], 0))
+        ]):
+            resultado = self.importar('sku,nombre,precio_base,stock,imagen\nA-1,Crema,1,1,https://cdn.example.com/a.png\n')
+        self.assertEqual(resultado.total_errores, 0)
+        dns['cdn.example.com'].pop(0)
+        conexiones, mensaje = self.descargar_con_dns('https://cdn.example.com/a.png', dns)
+        self.assertEqual(conexiones, [])
+        self.assertIn('origen no permitido', mensaje)
+
+        # Y si es pública, se conecta a esa IP y no vuelve a resolver el nombre
+        conexiones, _ = self.descargar_con_dns('https://cdn.example.com/a.png', {'cdn.example.com': ['93.184.216.34']})
+        self.assertEqual(conexiones, ['93.184.216.34'])
+
+    def test_las_redirecciones_pasan_por_la_misma_revision(self):
+        class Redirige(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(302)
+                self.send_header('Location', 'http://metadatos.example.com/latest/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        servidor = HTTPServer(('127.0.0.1', 0), Redirige)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+
+        dns = {'cdn.example.com': ['93.184.216.34'], 'metadatos.example.com': ['169.254.169.254']}
+        conexiones, mensaje = self.descargar_con_dns('http://cdn.example.com/a.png', dns, servidor)
+        self.assertEqual(conexiones, ['93.184.216.34'])
+        self.assertIn('metadatos.example.com', mensaje)
+
+    @override_settings(IMPORTACION_ORIGENES_IMAGEN=['cdn.example.com'])
+    def test_lista_de_origenes_permitidos(self):
+        resultado = self.importar('sku,nombre,precio_base,stock,imagen\nA-1,Crema,1,1,https://otro.example.com/a.png\n')
+        self.assertEqual(resultado.total_errores, 1)
+
+    def test_solo_se_guardan_imagenes_reales(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        medios = override_settings(MEDIA_ROOT=directorio.name)
+        medios.enable()
+        self.addCleanup(medios.disable)
+
+        def adjuntar(nombre, contenido):
+            carpeta = self.carpeta_con(nombre, contenido)
+            producto = Producto.objects.create(
+                sku=nombre, nombre=nombre, precio_base=1, stock=1, imagen_origen=nombre
+            )
+            adjuntar_imagen(producto.id, nombre, carpeta)
+            producto.refresh_from_db()
+            return producto.imagen.name
+
+        # La extensión sale del contenido, no del nombre
+        self.assertTrue(adjuntar('foto.html', self.png()).endswith('.png'))
+        with self.assertLogs('app_tienda.importacion', 'WARNING'):
+            self.assertFalse(adjuntar('pagina.png', b'<script>alert(1)</script>'))
+        with self.assertLogs('app_tienda.importacion', 'WARNING'):
+            self.assertFalse(adjuntar('logo.svg', b'<svg xmlns="http://www.w3.org/2000/svg"></svg>'))
+        with override_settings(IMPORTACION_IMAGEN_MAXIMO_BYTES=10), self.assertLogs('app_tienda.importacion', 'WARNING'):
+            self.assertFalse(adjuntar('grande.png', self.png()))
+
+
+class CarritoConProductoBorradoTests(PresupuestoConsultasMixin, DatosTiendaMixin, TestCase):
+    PRODUCTOS = 3
+    PEDIDOS = 0
+
+    def setUp(self):
+        self.client.force_login(self.cliente)
+        self.borrado, self.queda = self.productos[:2]
+        for producto in (self.borrado, self.queda):
+            self.client.get(f'/agregar-carrito/{producto.id}/')
+        Producto.objects.filter(id=self.borrado.id).delete()
+
+    def carrito(self):
+        return self.client.session['carrito']
+
+    def test_el_carrito_lo_quita_y_avisa(self):
+        respuesta = self.get_con_presupuesto('/carrito/')
+        self.assertContains(respuesta, 'ya no están disponibles')
+        self.assertEqual(list(self.carrito()), [str(self.queda.id)])
+        self.client.post('/checkout/', {'direccion': 'Calle 1'})
+        self.assertEqual(Pedido.objects.get(cliente=self.cliente).items.get().producto, self.queda)
+
+    def test_el_checkout_lo_quita_y_se_puede_volver_a_pagar(self):
+        respuesta = self.client.post('/checkout/', {'direccion': 'Calle 1'}, follow=True)
+        self.assertRedirects(respuesta, '/carrito/')
+        self.assertContains(respuesta, 'ya no están disponibles')
+        self.assertEqual(list(self.carrito()), [str(self.queda.id)])
+        self.assertFalse(Pedido.objects.exists())
+
+        respuesta = self.client.post('/checkout/', {'direccion': 'Calle 1'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(Pedido.objects.filter(cliente=self.cliente).count(), 1)
+        self.assertFalse(Reserva.objects.exists())
+
+    @override_settings(ROOT_URLCONF='tiendaa.urls_asgi')
+    async def test_carrito_async(self):
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.cliente)
+        await cliente.get(f'/agregar-carrito/{self.queda.id}/')
+        await Producto.objects.filter(id=self.queda.id).adelete()
+        respuesta = await cliente.get('/carrito/')
+        self.assertContains(respuesta, 'ya no están disponibles')
+        self.assertEqual(await (await cliente.asession()).aget('carrito'), {})
+
+
+class ExportacionesTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 12
+    PEDIDOS = 6
+
+    def setUp(self):
+        self.client.force_login(self.financiero)
+
+    def exportar(self, tipo, **parametros):
+        respuesta = self.client.get(f'/reporte/exportar/{tipo}/', parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return b''.join(respuesta.streaming_content).decode()
+
+    def filas_csv(self, tipo, **parametros):
+        return list(csv.reader(io.StringIO(self.exportar(tipo, **parametros))))
+
+    def test_pedidos_filtrados_por_fecha_y_estado(self):
+        hace_una_semana = timezone.now() - timedelta(days=7)
+        viejos = list(Pedido.objects.order_by('id').values_list('id', flat=True)[:2])
+        Pedido.objects.filter(id__in=viejos).update(fecha=hace_una_semana)
+        Pedido.objects.filter(id=viejos[0]).update(estado='Enviado')
+
+        filas = self.filas_csv('pedidos')
+        self.assertEqual(filas[0], ['pedido', 'fecha', 'cliente', 'estado', 'subtotal', 'descuento', 'iva', 'total'])
+        self.assertEqual(len(filas), 1 + self.PEDIDOS)
+
+        dia = timezone.localdate(hace_una_semana).isoformat()
+        filas = self.filas_csv('pedidos', desde=dia, hasta=dia)
+        self.assertEqual([int(fila[0]) for fila in filas[1:]], viejos)
+        filas = self.filas_csv('pedidos', desde=dia, hasta=dia, estado='Enviado')
+        self.assertEqual([int(fila[0]) for fila in filas[1:]], viejos[:1])
+        # Fechas y estados inválidos se ignoran
+        self.assertEqual(len(self.filas_csv('pedidos', desde='ayer', estado='Perdido')), 1 + self.PEDIDOS)
+
+    def test_devoluciones_al_precio_pagado(self):
+        linea = self.pedido.items.first()
+        Producto.objects.filter(id=linea.producto_id).update(precio_base=linea.precio_unitario * 3)
+        Devolucion.objects.create(pedido=self.pedido, producto_id=linea.producto_id, cantidad=2, motivo='Roto')
+
+        filas = self.filas_csv('devoluciones')
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(Decimal(filas[1][7]), linea.precio_unitario * 2)
+
+        fila = json.loads(self.exportar('devoluciones', formato='jsonl'))
+        self.assertEqual(Decimal(fila['monto']), linea.precio_unitario * 2)
+        self.assertEqual(fila['motivo'], 'Roto')
+
+    def test_celdas_con_formula_se_neutralizan_en_csv(self):
+        linea = self.pedido.items.first()
+        for motivo in ('=HYPERLINK("http://x")', '+1', '-2+3', '@SUM(A1)'):
+            Devolucion.objects.create(pedido=self.pedido, producto_id=linea.producto_id, motivo=motivo)
+        motivos = [fila[8] for fila in self.filas_csv('devoluciones')[1:]]
+        self.assertEqual(motivos, ["'=HYPERLINK(\"http://x\")", "'+1", "'-2+3", "'@SUM(A1)"])
+        # JSONL no se abre en una hoja de cálculo: va sin cambios
+        self.assertIn('"motivo": "+1"', self.exportar('devoluciones', formato='jsonl'))
+
+    def test_solo_financieros(self):
+        self.client.force_login(self.cliente)
+        self.assertEqual(self.client.get('/reporte/exportar/pedidos/').status_code, 302)
+        self.client.force_login(self.financiero)
+        self.assertEqual(self.client.get('/reporte/exportar/otra/').status_code, 404)
+
+class ExportacionAsgiTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 2
+    PEDIDOS = 5
+
+    @override_settings(ROOT_URLCONF='tiendaa.urls_asgi')
+    async def test_la_exportacion_se_envia_por_bloques(self):
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.financiero)
+        with mock.patch('app_tienda.views_async.PARTES_POR_SALTO', 2), warnings.catch_warnings():
+            warnings.simplefilter('error')
+            respuesta = await cliente.get('/reporte/exportar/pedidos/?formato=csv')
+            self.assertTrue(respuesta.is_async)
+            lineas = [parte async for parte in respuesta.streaming_content]
+        self.assertEqual(len(lineas), 1 + self.PEDIDOS)
+        self.assertTrue(lineas[0].startswith(b'pedido,fecha,cliente'))
+
+
+class CatalogoPaginacionTests(DatosTiendaMixin, TestCase):
+    PRODUCTOS = 30
+    PEDIDOS = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Precios repetidos: el id desempata y ninguna fila se repite ni se salta
+        Producto.objects.filter(id__in=[p.id for p in cls.productos[::3]]).update(precio_base=Decimal('20.00'))
+        Producto.objects.filter(id__in=[p.id for p in cls.productos[:5]]).update(stock=0)
+
+    def recorrer(self, url):
+        ids = []
+        while url:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            ids += [producto.id for producto in respuesta.context['productos']]
+            siguiente = respuesta.context['siguiente_url']
+            url = f'/{siguiente}' if siguiente else None
+        return ids
+
+    def test_recorre_todas_las_paginas_sin_repetir_ni_saltar(self):
+        todos = list(Producto.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual(self.recorrer('/?por_pagina=12'), todos)
+        por_precio = list(Producto.objects.order_by('precio_base', 'id').values_list('id', flat=True))
+        self.assertEqual(self.recorrer('/?orden=precio&por_pagina=12'), por_precio)
+
+    def test_orden_descendente(self):
+        esperado = list(Producto.objects.order_by('-precio_base', 'id'))
+        vistos, cursor = [], None
+        while True:
+            pagina, cursor = paginar_keyset(Producto.objects.all(), 7, cursor, ('-precio_base', 'id'))
+            vistos += pagina
+            if cursor is None:
+                break
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        primera = [p.id for p in self.client.get('/?por_pagina=12').context['productos']]
+        for cursor in ('basura', '!!', 'WyJOYU4iXQ', 'WyIxIiwiMiIsIjMiXQ', 'eyJhIjogMX0'):
+            with self.subTest(cursor=cursor):
+                respuesta = self.client.get('/', {'por_pagina': 12, 'cursor': cursor})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual([p.id for p in respuesta.context['productos']], primera)
+
+    def test_filtros_de_precio_y_stock(self):
+        ids = set(self.recorrer('/?precio_min=20&precio_max=30&disponibles=1'))
+        esperado = set(
+            Producto.objects.filter(precio_base__gte=20, precio_base__lte=30, stock__gt=0).values_list('id', flat=True)
+        )
+        self.assertTrue(esperado)
+        self.assertEqual(ids, esperado)
+
+    def test_precios_no_finitos_se_ignoran(self):
+        todos = list(Producto.objects.order_by('id').values_list('id', flat=True))
+        for parametro in ('precio_min=nan', 'precio_min=Infinity', 'precio_max=-inf', 'precio_max=abc'):
+            with self.subTest(parametro=parametro):
+                self.assertEqual(self.recorrer(f'/?{parametro}&por_pagina=96'), todos)
+        self.assertIsNone(decimal_o_none('sNaN'))
+        self.assertEqual(decimal_o_none('12.50'), Decimal('12.50'))
+
+
+class BusquedaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.serum = Producto.objects.create(nombre='Sérum Ácido Hialurónico', precio_base=20, stock=5)
+        cls.crema_crema = Producto.objects.create(nombre='Crema crema', precio_base=10, stock=5)
+        cls.crema_manos = Producto.objects.create(
+            nombre='Crema de manos con manteca de karité y aceite de almendras', precio_base=8, stock=5
+        )
+
+    def buscar(self, texto):
+        return [producto.id for producto in busqueda.buscar_productos(texto)]
+
+    def test_usa_el_indice_fts(self):
+        self.assertTrue(busqueda.fts_disponible())
+
+    def test_sin_tildes_y_por_prefijo(self):
+        self.assertEqual(self.buscar('serum acido'), [self.serum.id])
+        self.assertEqual(self.buscar('HIAL'), [self.serum.id])
+        self.assertEqual(self.buscar('karite alm'), [self.crema_manos.id])
+        self.assertEqual(self.buscar('"cre" OR *'), [])
+
+    def test_los_mas_relevantes_primero(self):
+        self.assertEqual(self.buscar('crema'), [self.crema_crema.id, self.crema_manos.id])
+
+    def test_cualquier_escritura_actualiza_el_indice(self):
+        Producto.objects.filter(id=self.serum.id).update(nombre='Tónico facial')
+        self.assertEqual(self.buscar('serum'), [])
+        self.assertEqual(self.buscar('tonico'), [self.serum.id])
+
+        self.crema_crema.nombre = 'Gel limpiador'
+        Producto.objects.bulk_update([self.crema_crema], ['nombre'])
+        self.assertEqual(self.buscar('crema'), [self.crema_manos.id])
+
+        Producto.objects.bulk_create([Producto(nombre='Protector solar', precio_base=9, stock=1)])
+        self.assertEqual(self.buscar('sol'), [Producto.objects.get(nombre='Protector solar').id])
+
+        self.crema_manos.delete()
+        self.assertEqual(self.buscar('karite'), [])
+
+    def test_la_vista_de_busqueda(self):
+        respuesta = self.client.get('/buscar/', {'q': 'sérum'})
+        self.assertContains(respuesta, 'Sérum Ácido Hialurónico')
+        self.assertNotContains(respuesta, 'karité')
+
+    def test_los_triggers_se_recrean_si_una_migracion_los_borra(self):
+        with connection.cursor() as cursor:
+            for nombre in busqueda.TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {nombre}')
+        Producto.objects.filter(id=self.serum.id).update(nombre='Tónico facial')
+        busqueda.asegurar_triggers(sender=apps.get_app_config('app_tienda'), using=DEFAULT_DB_ALIAS)
+        self.assertEqual(self.buscar('tonico'), [self.serum.id])
+        Producto.objects.filter(id=self.serum.id).update(nombre='Agua micelar')
+        self.assertEqual(self.buscar('micelar'), [self.serum.id])
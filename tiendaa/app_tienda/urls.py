@@ -8,19 +8,23 @@ from django.contrib.auth import views as auth_views
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', catalogo_publico, name='catalogo_publico'),
+    path('buscar/', buscar, name='buscar'),
     path('reporte/', reporte_financiero, name='reporte_financiero'),
+    path('reporte/exportar/<str:tipo>/', exportar_reporte, name='exportar_reporte'),
     path('checkout/', checkout_view, name='checkout'),
     path('registro/', registro_view, name='registro'),
     path('logout/', logout_view, name='logout'),
     path('login/',auth_views.LoginView.as_view(template_name='login.html'),name='login'),
     path('carrito/', ver_carrito, name='carrito'),
     path('nuevo-producto/', crear_producto, name='crear_producto'),
+    path('importar-productos/', importar_productos_view, name='importar_productos'),
     path('editar-producto/<int:producto_id>/', editar_producto, name='editar_producto'),
     path('eliminar-producto/<int:producto_id>/', eliminar_producto, name='eliminar_producto'),
     path('usuarios-tienda/usuarios/', lista_usuarios, name='lista_usuarios'),
     path('usuarios-tienda/nuevo-empleado/', crear_empleado, name='crear_empleado'),
     path('bodega/', gestion_bodega, name='gestion_bodega'),
     path('bodega/actualizar/<int:pedido_id>/', actualizar_estado_pedido, name='actualizar_estado_pedido'),
+    path('bodega/mover/', mover_pedidos_lote, name='mover_pedidos_lote'),
     path('bodega/devolucion/<int:pedido_id>/', registrar_devolucion, name='registrar_devolucion'),
     path('agregar-carrito/<int:producto_id>/', agregar_al_carrito, name='agregar_carrito'),
     path('eliminar-carrito/<int:producto_id>/', eliminar_del_carrito, name='eliminar_carrito'),
@@ -29,6 +33,7 @@ urlpatterns = [
     path('factura/<int:pedido_id>/', ver_factura, name='ver_factura'),
     path('configuracion-iva/', configuracion_iva, name='configuracion_iva'),
     path('orden-despacho/<int:pedido_id>/', imprimir_orden_despacho, name='imprimir_orden_despacho'),
+    path('orden-despacho/lote/', imprimir_despacho_lote, name='imprimir_despacho_lote'),
     path('mis-compras/', mis_compras, name='mis_compras'),
     path('admin-tienda/cupones/', gestionar_cupones, name='gestionar_cupones'),
     path('usuarios/estado/<int:usuario_id>/', alternar_estado_usuario, name='alternar_estado_usuario'),
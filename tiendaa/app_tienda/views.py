@@ -1,8 +1,19 @@
+import logging
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.db import router
+from django.db.models import F, Prefetch, Sum, prefetch_related_objects
+from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required, user_passes_test
 from decimal import Decimal
+from django.utils import timezone
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.contrib.auth.models import Group
 from django.contrib.auth.models import User
 from .models import (
@@ -10,11 +21,29 @@ from .models import (
     ConfiguracionIVA, PedidoProducto, Factura, Devolucion
 )
 from .forms import *
+from .busqueda import buscar_productos
+from .imagenes import programar_derivados
+from .importacion import detectar_formato, importar_productos
+from .cupones import CuponNoValido
+from .iva import iva_en
+from . import carrito as carrito_sesion
+from . import despacho, exportaciones, facturas, resumen, revalidacion
+from .almacenamiento import almacenamiento_contenido
+from .pedidos import ESTADO_ANTERIOR, TRANSICIONES, StockInsuficiente, TransicionNoValida, cambiar_estado, mover_pedidos, registrar_pedido
+from .pedidos import registrar_devolucion as registrar_devolucion_pedido
+from .reservas import anotar_disponibles, clave_carrito, liberar, renovar, reservar
+from .replicas import leer_de_replica, marcar_escritura
+from .roles import tiene_rol
+from .paginacion import TAMANO_PAGINA_DEFECTO, TAMANOS_PAGINA, decimal_o_none, enlace_siguiente, paginar_keyset, tamano_pagina
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import logout 
 from django.contrib.admin.views.decorators import staff_member_required
 
 
+logger = logging.getLogger(__name__)
+
+# Listados de pedidos: más recientes primero (índices pedido_*_fecha_idx)
+ORDEN_PEDIDOS = ('-fecha', '-id')
 
 
 def logout_view(request):
@@ -22,13 +51,12 @@ def logout_view(request):
     return redirect('catalogo_publico')
 
 def ver_carrito(request):
-    carrito = request.session.get('carrito', {})
-    total = Decimal('0.00')
+    carrito = carrito_sesion.obtener(request)
+    if carrito:
+        renovar(clave_carrito(request))
     
-    # Calculamos los subtotales aquí para no hacerlo en el HTML
-    for item in carrito.values():
-        item['subtotal_item'] = Decimal(item['precio']) * item['cantidad']
-        total += item['subtotal_item']
+    # Precios y disponibilidad actuales, con los subtotales calculados aquí para no hacerlo en el HTML
+    carrito, total = carrito_sesion.resolver(request, carrito)
         
     return render(request, 'carrito.html', {
         'carrito': carrito, 
@@ -38,22 +66,25 @@ def ver_carrito(request):
 
 
 # Funciones de verificación de Rol
+# (los grupos se cargan una vez por sesión, ver roles.py)
 def es_bodeguero(user):
-    return user.groups.filter(name='Bodeguero').exists() or user.is_superuser
+    return tiene_rol(user, 'Bodeguero')
 
 def es_administrador(user):
-    return user.groups.filter(name='Administrador').exists() or user.is_superuser
+    return tiene_rol(user, 'Administrador')
 
 def es_financiero(user):
-    return user.groups.filter(name='Financiero').exists() or user.is_superuser
+    return tiene_rol(user, 'Financiero')
 
 @user_passes_test(es_bodeguero)
 def editar_producto(request, producto_id):
     producto = get_object_or_404(Producto, id=producto_id)
     if request.method == 'POST':
-        form = ProductoForm(request.POST, instance=producto)
+        form = ProductoForm(request.POST, request.FILES, instance=producto)
         if form.is_valid():
-            form.save()
+            producto = form.save()
+            if 'imagen' in form.changed_data:
+                programar_derivados(producto)
             return redirect('catalogo_publico')
     else:
         form = ProductoForm(instance=producto)
@@ -74,25 +105,61 @@ def crear_producto(request):
         # IMPORTANTE: request.FILES es necesario para las imágenes
         form = ProductoForm(request.POST, request.FILES) 
         if form.is_valid():
-            form.save()
+            producto = form.save()
+            programar_derivados(producto)
             return redirect('catalogo_publico')
     else:
         form = ProductoForm()
     return render(request, 'crear_producto.html', {'form': form})
 
 
+@user_passes_test(es_bodeguero)
+def importar_productos_view(request):
+    resultado = None
+    if request.method == 'POST':
+        form = ImportarProductosForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            # Django guarda las subidas grandes en un archivo temporal: se lee por partes
+            resultado = importar_productos(archivo, detectar_formato(archivo.name))
+    else:
+        form = ImportarProductosForm()
+    return render(request, 'bodega/importar_productos.html', {'form': form, 'resultado': resultado})
+
+
 # --- VISTAS DE BODEGA ---
 @user_passes_test(es_bodeguero)
 def gestion_bodega(request):
-    pedidos = Pedido.objects.all().order_by('-fecha')
-    return render(request, 'bodega/ordenes.html', {'pedidos': pedidos})
+    # Por defecto solo lo pendiente de despachar; ?estado=todos muestra todo
+    estado = request.GET.get('estado', 'Pendiente')
+    pedidos = Pedido.objects.select_related('cliente')
+    if estado in dict(Pedido.ESTADOS):
+        pedidos = pedidos.filter(estado=estado)
+    else:
+        estado = 'todos'
+    pedidos, siguiente = paginar_keyset(
+        pedidos, tamano_pagina(request.GET.get('por_pagina')), request.GET.get('cursor'), ORDEN_PEDIDOS
+    )
+    # El selector de cada fila solo ofrece el paso siguiente permitido
+    for pedido in pedidos:
+        pedido.siguiente_estado = TRANSICIONES.get(pedido.estado)
+    return render(request, 'bodega/ordenes.html', {
+        'pedidos': pedidos,
+        'siguiente_url': enlace_siguiente(request, siguiente),
+        'estado': estado,
+        'estados': Pedido.ESTADOS,
+    })
+
+def _cambiar_estado_o_avisar(request, pedido, nuevo_estado):
+    anterior = pedido.estado
+    if not cambiar_estado(pedido, nuevo_estado, request.user):
+        messages.error(request, f'El pedido #00{pedido.id} no puede pasar de {anterior} a {nuevo_estado}.')
 
 @user_passes_test(es_bodeguero)
 def procesar_despacho(request, pedido_id):
     pedido = get_object_or_404(Pedido, id=pedido_id)
     if request.method == 'POST':
-        pedido.estado = request.POST.get('estado')
-        pedido.save()
+        _cambiar_estado_o_avisar(request, pedido, request.POST.get('estado'))
     return redirect('gestion_bodega')
 
 @user_passes_test(es_bodeguero)
@@ -103,55 +170,59 @@ def registrar_devolucion(request, pedido_id):
         cant = int(request.POST.get('cantidad'))
         producto = Producto.objects.get(id=prod_id)
         
-        # Crear registro de devolución
-        Devolucion.objects.create(pedido=pedido, producto=producto, cantidad=cant, motivo="Devolución de cliente")
-        
-        # Retornar al inventario
-        producto.stock += cant
-        producto.save()
+        # Crear registro de devolución, retornar al inventario y actualizar el resumen
+        registrar_devolucion_pedido(pedido, producto, cant)
     return redirect('gestion_bodega')
 
 @user_passes_test(es_bodeguero)
 def actualizar_estado_pedido(request, pedido_id):
     pedido = Pedido.objects.get(id=pedido_id)
     if request.method == 'POST':
-        nuevo_estado = request.POST.get('estado')
-        pedido.estado = nuevo_estado
-        pedido.save()
+        _cambiar_estado_o_avisar(request, pedido, request.POST.get('estado'))
     return redirect('gestion_bodega')
 
+@user_passes_test(es_bodeguero)
+@require_POST
+def mover_pedidos_lote(request):
+    # Pedidos marcados en la bodega -> siguiente estado, en un solo UPDATE
+    ids = [int(valor) for valor in request.POST.getlist('pedido') if valor.isdigit()]
+    nuevo_estado = request.POST.get('estado')
+    try:
+        movidos = mover_pedidos(ids, nuevo_estado, request.user)
+    except TransicionNoValida:
+        movidos = 0
+    if movidos < len(ids):
+        # Los que no estaban en el estado anterior (u otro proceso los movió antes)
+        fallidos = Pedido.objects.filter(id__in=ids).exclude(estado=nuevo_estado).order_by('id')
+        fallidos = [f'#00{pedido_id} ({estado})' for pedido_id, estado in fallidos.values_list('id', 'estado')]
+        if fallidos:
+            messages.error(request, f"No se pudieron pasar a {nuevo_estado}: {', '.join(fallidos)}")
+    return redirect(f"{reverse('gestion_bodega')}?estado={ESTADO_ANTERIOR.get(nuevo_estado, 'Pendiente')}")
+
 # --- VISTAS MÓDULO FINANCIERO (3.3) ---
 @user_passes_test(es_financiero)
 def configuracion_iva(request):
-    config = ConfiguracionIVA.objects.last()
     if request.method == 'POST':
         nuevo_iva = request.POST.get('porcentaje')
         ConfiguracionIVA.objects.create(porcentaje=nuevo_iva) # Creamos uno nuevo para mantener historial
         return redirect('configuracion_iva')
-    return render(request, 'financiero/configurar_iva.html', {'config': config})
+    # El vigente ahora (una fila con vigente_desde futura todavía no cuenta)
+    return render(request, 'financiero/configurar_iva.html', {'iva_actual': iva_en(timezone.now())})
 
 # --- VISTAS DE ADMINISTRADOR ---
 @user_passes_test(es_administrador)
-@user_passes_test(lambda u: u.groups.filter(name='Administrador').exists() or u.is_superuser)
 def gestionar_cupones(request):
     if request.method == 'POST':
-        # .strip() elimina espacios accidentales
-        codigo = request.POST.get('codigo', '').strip().upper()
-        porcentaje = request.POST.get('descuento')
-
-        if codigo and porcentaje:
-            # Usamos update_or_create para evitar errores si el código se repite
-            # o simplemente .create()
-            Cupon.objects.create(
-                codigo=codigo, 
-                descuento_porcentaje=int(porcentaje),
-                activo=True
-            )
+        form = CuponForm(request.POST)
+        if form.is_valid():
+            form.save()
             return redirect('gestionar_cupones') # Recarga la página para mostrar el nuevo
+    else:
+        form = CuponForm()
 
     # Obtenemos todos los cupones para mostrarlos en la tabla
     cupones = Cupon.objects.all().order_by('-fecha_creacion')
-    return render(request, 'admin/cupones.html', {'cupones': cupones})
+    return render(request, 'admin/cupones.html', {'cupones': cupones, 'form': form})
 
 def registro_view(request):
     if request.method == 'POST':
@@ -166,7 +237,7 @@ def registro_view(request):
             # Esto evita el error "Group matching query does not exist"
             grupo, created = Group.objects.get_or_create(name='cliente')
             if created:
-                print("¡Se ha creado el grupo cliente por primera vez!")
+                logger.info('Se creó el grupo cliente')
             # 3. Asignamos el usuario al grupo
             user.groups.add(grupo)
             
@@ -178,112 +249,82 @@ def registro_view(request):
 
 
 
-@login_required(login_url='/login/')
-def checkout_view(request):
-    carrito = request.session.get('carrito', {})
-
-    if not carrito:
-        return redirect('/catalogo_publico/')
-
-    if request.method == 'POST':
-        direccion = request.POST.get('direccion')
-        codigo_cupon = request.POST.get('cupon')
-
-        if not direccion:
-            return render(request, 'checkout.html', {
-                'error': 'La dirección es obligatoria',
-                'carrito': carrito
-            })
-
-        subtotal = Decimal('0.00')
-
-        for item in carrito.values():
-            subtotal += Decimal(item['precio']) * item['cantidad']
-
-        # IVA dinámico
-        iva_config = ConfiguracionIVA.objects.last()
-        iva_porcentaje = iva_config.porcentaje
-        iva_valor = subtotal * (iva_porcentaje / 100)
-
-        descuento = Decimal('0.00')
-        cupon_obj = None
-
-        if codigo_cupon:
-            try:
-                cupon_obj = Cupon.objects.get(
-                    codigo=codigo_cupon,
-                    activo=True
-                )
-                descuento = subtotal * (Decimal(cupon_obj.descuento_porcentaje) / 100)
-            except Cupon.DoesNotExist:
-                pass
-
-        total = subtotal - descuento + iva_valor
-
-        pedido = Pedido.objects.create(
-            cliente=request.user,
-            direccion_envio=direccion,
-            iva_aplicado=iva_porcentaje,
-            subtotal=subtotal,
-            descuento=descuento,
-            total=total
-        )
-
-        # Guardar productos y descontar stock
-        for item in carrito.values():
-            producto = Producto.objects.get(id=item['id'])
-
-            PedidoProducto.objects.create(
-                pedido=pedido,
-                producto=producto,
-                cantidad=item['cantidad'],
-                precio_unitario=item['precio']
-            )
-
-            producto.stock -= item['cantidad']
-            producto.save()
 
-        # Factura ficticia
-        Factura.objects.create(
-            pedido=pedido,
-            documento_digital='facturas/factura_placeholder.pdf'
-        )
 
-        request.session['carrito'] = {}
+def filtros_catalogo(request):
+    """
+    Consulta del catálogo con los filtros de la petición, sin paginar.
+    Devuelve (productos, orden para paginar, filtros para el template).
+    Compartida con la versión async de views_async.py.
+    """
+    productos = Producto.objects.all()
 
-        return render(request, 'confirmacion.html', {
-            'pedido': pedido
-        })
+    # Filtros opcionales: solo con stock y rango de precio
+    solo_disponibles = request.GET.get('disponibles') == '1'
+    precio_min = decimal_o_none(request.GET.get('precio_min'))
+    precio_max = decimal_o_none(request.GET.get('precio_max'))
+    if solo_disponibles:
+        productos = productos.filter(stock__gt=0)
+    if precio_min is not None:
+        productos = productos.filter(precio_base__gte=precio_min)
+    if precio_max is not None:
+        productos = productos.filter(precio_base__lte=precio_max)
+
+    # Orden estable: por id, o por precio con el id como desempate
+    orden = request.GET.get('orden', '')
+    campos_orden = ('precio_base', 'id') if orden == 'precio' else ('id',)
+
+    return productos, campos_orden, {
+        'disponibles': solo_disponibles,
+        'precio_min': precio_min,
+        'precio_max': precio_max,
+        'orden': orden,
+        'por_pagina': tamano_pagina(request.GET.get('por_pagina')),
+    }
+
+
+def contexto_catalogo(request, productos, siguiente, filtros):
+    return {
+        'productos': productos,
+        # Conservamos los filtros en el enlace de "Ver más"
+        'siguiente_url': enlace_siguiente(request, siguiente),
+        'filtros': filtros,
+        'tamanos_pagina': TAMANOS_PAGINA,
+    }
 
-    return render(request, 'checkout.html', {'carrito': carrito})
-    
 
+def catalogo_publico(request):
+    # Si el navegador ya tiene esta versión: 304 sin consultar productos ni renderizar
+    etag = revalidacion.etag_catalogo(request)
+    no_modificado = revalidacion.no_modificado(request, etag)
+    if no_modificado is not None:
+        return no_modificado
 
-# Función para verificar si el usuario es del área financiera
-def es_financiero(user):
-    return user.groups.filter(name='Financiero').exists() or user.is_superuser
-
+    productos, campos_orden, filtros = filtros_catalogo(request)
+    productos, siguiente = paginar_keyset(
+        productos, filtros['por_pagina'], request.GET.get('cursor'), campos_orden
+    )
+    anotar_disponibles(productos)
 
-@user_passes_test(es_financiero)
-def reporte_financiero(request):
-    ingresos = Pedido.objects.filter(
-        estado='Entregado'
-    ).aggregate(Sum('total'))['total__sum'] or 0
+    respuesta = render(request, 'catalogo.html', contexto_catalogo(request, productos, siguiente, filtros))
+    return revalidacion.con_validadores(request, respuesta, etag)
 
-    pendientes = Pedido.objects.filter(
-        estado='Pendiente'
-    ).count()
 
-    return render(request, 'reporte.html', {
-        'ingresos': ingresos,
-        'pendientes': pendientes
-    })
+def buscar(request):
+    texto = request.GET.get('q', '').strip()
+    productos = anotar_disponibles(buscar_productos(texto)) if texto else []
 
+    # Para autocompletar desde el buscador
+    if request.GET.get('formato') == 'json':
+        return JsonResponse({'resultados': [
+            {'id': p.id, 'nombre': p.nombre, 'precio': str(p.precio_base)} for p in productos
+        ]})
 
-def catalogo_publico(request):
-    productos = Producto.objects.all()
     return render(request, 'catalogo.html', {
-        'productos': productos
+        'productos': productos,
+        'busqueda': texto,
+        'filtros': {'por_pagina': TAMANO_PAGINA_DEFECTO},
+        'tamanos_pagina': TAMANOS_PAGINA,
     })
 
 
@@ -300,88 +341,98 @@ def crear_empleado(request):
 
 @user_passes_test(lambda u: u.is_superuser)
 def lista_usuarios(request):
-    usuarios = User.objects.all().order_by('-date_joined')
+    usuarios = User.objects.prefetch_related('groups').order_by('-date_joined')
     return render(request, 'lista_usuarios.html', {'usuarios': usuarios})
 
 # Añade esta vista para generar el documento de salida física
 @user_passes_test(es_bodeguero)
 def imprimir_orden_despacho(request, pedido_id):
-    pedido = get_object_or_404(Pedido, id=pedido_id)
-    # Obtenemos los productos asociados a ese pedido
-    items = PedidoProducto.objects.filter(pedido=pedido)
+    pedido = get_object_or_404(Pedido.objects.select_related('cliente'), id=pedido_id)
+    # Obtenemos los productos asociados a ese pedido (con el producto en la misma consulta)
+    items = PedidoProducto.objects.filter(pedido=pedido).select_related('producto')
     return render(request, 'bodega/orden_despacho_print.html', {
         'pedido': pedido,
         'items': items
     })
+
+
+@user_passes_test(es_bodeguero)
+def imprimir_despacho_lote(request):
+    # ?pedido=1&pedido=2... (seleccionados en bodega) o ?estado=Pendiente&limite=200
+    # (también por POST: el formulario de la bodega comparte los checkboxes con mover_pedidos_lote)
+    datos = request.POST if request.method == 'POST' else request.GET
+    ids = [int(valor) for valor in datos.getlist('pedido') if valor.isdigit()]
+    try:
+        limite = int(datos.get('limite', despacho.MAXIMO_LOTE))
+    except ValueError:
+        limite = despacho.MAXIMO_LOTE
+    pedidos = despacho.pedidos_para_despacho(ids, datos.get('estado', 'Pendiente'), limite)
+    return render(request, 'bodega/despacho_lote_print.html', {
+        'pedidos': pedidos,
+        'recoleccion': despacho.lista_de_recoleccion(pedidos),
+        'maximo_lote': despacho.MAXIMO_LOTE,
+    })
     
 def agregar_al_carrito(request, producto_id):
-    producto = get_object_or_404(Producto, id=producto_id)
-    carrito = request.session.get('carrito', {})
-
-    id_str = str(producto.id)
-    if id_str in carrito:
-        # Validar que no agregue más del stock disponible desde el catálogo
-        if carrito[id_str]['cantidad'] < producto.stock:
-            carrito[id_str]['cantidad'] += 1
-    else:
-        carrito[id_str] = {
-            'id': producto.id,
-            'nombre': producto.nombre,
-            'precio': str(producto.precio_base),
-            'cantidad': 1,
-            'stock': producto.stock, # <--- IMPORTANTE: Guardamos el stock aquí
-            'imagen': producto.imagen.url if producto.imagen else ''
-        }
-
-    request.session['carrito'] = carrito
+    carrito = carrito_sesion.obtener(request)
+
+    id_str = str(producto_id)
+    # Apartamos una unidad más mientras quede disponible (no reservada por otros carritos)
+    try:
+        cantidad, disponible = reservar(clave_carrito(request), producto_id, carrito.get(id_str, 0) + 1)
+    except Producto.DoesNotExist:
+        raise Http404
+    if cantidad:
+        carrito[id_str] = cantidad
+        carrito_sesion.guardar(request, carrito)
     return redirect('catalogo_publico')
 
 def eliminar_del_carrito(request, producto_id):
-    carrito = request.session.get('carrito', {})
+    carrito = carrito_sesion.obtener(request)
     if str(producto_id) in carrito:
         del carrito[str(producto_id)]
-        request.session['carrito'] = carrito
+        carrito_sesion.guardar(request, carrito)
+        liberar(clave_carrito(request), producto_id)
     return redirect('carrito')
 
 def actualizar_carrito(request, producto_id):
     if request.method == 'POST':
         cantidad = int(request.POST.get('cantidad', 1))
-        producto = get_object_or_404(Producto, id=producto_id)
-        carrito = request.session.get('carrito', {})
-
-        # Validación de Stock
-        if cantidad > producto.stock:
-            cantidad = producto.stock # Forzamos al máximo disponible
+        carrito = carrito_sesion.obtener(request)
 
         id_str = str(producto_id)
         if id_str in carrito:
-            carrito[id_str]['cantidad'] = cantidad
-            request.session['carrito'] = carrito
+            # Validación de Stock: se reserva lo pedido o lo que quede libre
+            cantidad, disponible = reservar(clave_carrito(request), producto_id, max(cantidad, 1))
+            if cantidad:
+                carrito[id_str] = cantidad
+            else:
+                del carrito[id_str]
+            carrito_sesion.guardar(request, carrito)
             
     return redirect('carrito')
 
 def procesar_pago(request):
-    carrito = request.session.get('carrito', {})
-    
-    for item_id, item in carrito.items():
-        producto = Producto.objects.get(id=item['id'])
-        # Restamos del stock
-        producto.stock -= int(item['cantidad'])
-        producto.save()
-        
-    # Limpiamos el carrito después del pago
-    request.session['carrito'] = {}
-    return redirect('catalogo')
+    # Enlace antiguo: el pago (stock, pedido y factura) se hace en el checkout
+    return redirect('checkout')
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 # (Mantén tus otros imports igual)
 
+def confirmacion(request, pedido, iva_total):
+    # Las líneas con su producto en una consulta (el template recorre pedido.items.all)
+    prefetch_related_objects([pedido], Prefetch('items', queryset=PedidoProducto.objects.select_related('producto')))
+    return render(request, 'confirmacion.html', {
+        'pedido': pedido,
+        'iva_total': iva_total,
+    })
+
 @login_required(login_url='/login/')
 def checkout_view(request):
-    carrito = request.session.get('carrito', {})
+    carrito = carrito_sesion.obtener(request)
 
     if not carrito:
-        return redirect('/catalogo_publico/')
+        return redirect('catalogo_publico')
 
     if request.method == 'POST':
         direccion = request.POST.get('direccion')
@@ -394,67 +445,31 @@ def checkout_view(request):
                 'carrito': carrito
             })
 
-        subtotal = Decimal('0.00')
-        for item in carrito.values():
-            subtotal += Decimal(str(item['precio'])) * item['cantidad']
-
-        # 1. LÓGICA DE CUPÓN: Validar si existe y está activo
-        descuento = Decimal('0.00')
-        if codigo_cupon:
-            try:
-                cupon_obj = Cupon.objects.get(codigo=codigo_cupon, activo=True)
-                # Calculamos el porcentaje sobre el subtotal
-                descuento = (subtotal * Decimal(str(cupon_obj.descuento_porcentaje / 100))).quantize(Decimal('0.01'))
-            except Cupon.DoesNotExist:
-                # Si el cupón no es válido, el descuento sigue en 0
-                pass
-
-        # 2. IVA DINÁMICO: Se aplica sobre el subtotal ya descontado
-        iva_config = ConfiguracionIVA.objects.last()
-        iva_porcentaje = iva_config.porcentaje if iva_config else Decimal('15.00')
-        
-        # El impuesto se calcula sobre (Subtotal - Descuento)
-        base_imponible = subtotal - descuento
-        iva_valor = (base_imponible * (iva_porcentaje / 100)).quantize(Decimal('0.01'))
-
-        # 3. TOTAL FINAL (Redondeado a 2 decimales para evitar el error de tus fotos)
-        total = (base_imponible + iva_valor).quantize(Decimal('0.01'))
-
-        # 4. CREAR EL PEDIDO
-        pedido = Pedido.objects.create(
-            cliente=request.user,
-            direccion_envio=direccion,
-            iva_aplicado=iva_porcentaje,
-            subtotal=subtotal,
-            descuento=descuento,
-            total=total
-        )
-
-        # 5. GUARDAR PRODUCTOS Y ACTUALIZAR STOCK
-        for item in carrito.values():
-            producto = Producto.objects.get(id=item['id'])
-            PedidoProducto.objects.create(
-                pedido=pedido,
-                producto=producto,
-                cantidad=item['cantidad'],
-                precio_unitario=item['precio']
+        try:
+            pedido, iva_valor = registrar_pedido(
+                request.user, direccion, carrito, codigo_cupon, carrito_id=clave_carrito(request)
             )
-            producto.stock -= item['cantidad']
-            producto.save()
-
-        # 6. REGISTRO DE FACTURA
-        Factura.objects.create(
-            pedido=pedido,
-            documento_digital='facturas/factura_placeholder.pdf'
-        )
+        except StockInsuficiente as error:
+            if error.no_existen:
+                # Se quitan del carrito y el cliente revisa lo que queda antes de confirmar
+                carrito_sesion.descartar(request, carrito, error.no_existen)
+                return redirect('carrito')
+            return render(request, 'checkout.html', {
+                'error': f'No hay stock suficiente de: {error}. Ajusta tu carrito.',
+                'carrito': carrito
+            })
+        except CuponNoValido as error:
+            return render(request, 'checkout.html', {
+                'error': str(error),
+                'carrito': carrito
+            })
 
         # Limpiar carrito y enviar datos a la confirmación
-        request.session['carrito'] = {}
+        carrito_sesion.vaciar(request)
+        # Mis compras no debe mostrarse sin este pedido aunque la réplica vaya atrasada
+        marcar_escritura(request)
 
-        return render(request, 'confirmacion.html', {
-            'pedido': pedido,
-            'iva_total': iva_valor # Pasamos el IVA calculado para el diseño
-        })
+        return confirmacion(request, pedido, iva_valor)  # Pasamos el IVA calculado para el diseño
 
     return render(request, 'checkout.html', {'carrito': carrito})
 
@@ -462,48 +477,98 @@ def checkout_view(request):
 @login_required
 def ver_factura(request, pedido_id):
 # Traemos el pedido (solo si pertenece al usuario logueado)
-    pedido = get_object_or_404(Pedido, id=pedido_id, cliente=request.user)
-    
-    # Calculamos el IVA total para que se muestre correctamente en el diseño
-    # Basado en la lógica de tu checkout
-    iva_total = (pedido.subtotal - pedido.descuento) * (pedido.iva_aplicado / 100)
-    
-    # USAMOS confirmacion.html porque ya tiene tu diseño y colores
-    return render(request, 'confirmacion.html', {
-        'pedido': pedido,
-        'iva_total': iva_total
-    })
+    pedido = get_object_or_404(
+        Pedido.objects.select_related('cliente').annotate(documento=F('factura__documento_digital')),
+        id=pedido_id, cliente=request.user,
+    )
+
+    # Si el PDF ya está generado se envía el archivo tal cual
+    documento = pedido.documento
+    if documento and documento not in facturas.PENDIENTES:
+        # El nombre es el hash del contenido: sirve directamente como ETag
+        etag = quote_etag(os.path.splitext(os.path.basename(documento))[0])
+        no_modificado = get_conditional_response(request, etag=etag)
+        if no_modificado is not None:
+            return no_modificado
+        try:
+            archivo = almacenamiento_contenido.open(documento, 'rb')
+        except FileNotFoundError:
+            archivo = None
+        if archivo is not None:
+            respuesta = FileResponse(archivo, content_type='application/pdf', filename=f'factura_00{pedido.id}.pdf')
+            respuesta['ETag'] = etag
+            respuesta['Cache-Control'] = 'private, max-age=86400'
+            return respuesta
+
+    # Todavía en preparación: USAMOS confirmacion.html porque ya tiene tu diseño y colores
+    etag, modificado = revalidacion.validadores_factura(pedido)
+    no_modificado = revalidacion.no_modificado(request, etag, modificado)
+    if no_modificado is not None:
+        return no_modificado
+    respuesta = confirmacion(request, pedido, facturas.iva_valor(pedido))
+    return revalidacion.con_validadores(request, respuesta, etag, modificado)
 
 # Reporte Financiero Completo (Módulo 3.3)
 @user_passes_test(es_financiero)
+@leer_de_replica
 def reporte_financiero(request):
-    # Cálculos globales (Resumen de las tarjetas)
-    ingresos_reales = Pedido.objects.filter(estado='Entregado').aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    por_cobrar = Pedido.objects.exclude(estado='Entregado').aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-    
-    # Cálculo de pérdidas por devoluciones
-    from django.db.models import F
-    devoluciones_monto = Devolucion.objects.aggregate(
-        total=Sum(F('cantidad') * F('producto__precio_base'))
-    )['total'] or Decimal('0.00')
+    # Cálculos globales (Resumen de las tarjetas), leídos del resumen diario
+    tarjetas = resumen.totales()
     
-    # Lista de TODAS las facturas para la tabla del template
-    todas_las_facturas = Pedido.objects.all().order_by('-fecha')
+    # Facturas más recientes primero, por páginas (el historial completo se exporta)
+    lista_facturas, siguiente = paginar_keyset(
+        Pedido.objects.select_related('cliente'),
+        tamano_pagina(request.GET.get('por_pagina')), request.GET.get('cursor'), ORDEN_PEDIDOS
+    )
     
     return render(request, 'financiero/reporte.html', {
-        'ingresos': ingresos_reales,
-        'pendientes_monto': por_cobrar,
-        'devoluciones_monto': devoluciones_monto,
-        'facturas': todas_las_facturas  # Esta es la lista que recorreremos
+        'ingresos': tarjetas['ingresos'],
+        'pendientes_monto': tarjetas['pendientes_monto'],
+        'devoluciones_monto': tarjetas['devoluciones_monto'],
+        'facturas': lista_facturas,  # Esta es la lista que recorreremos
+        'siguiente_url': enlace_siguiente(request, siguiente),
     })
 
 
 
+@user_passes_test(es_financiero)
+@leer_de_replica
+def exportar_reporte(request, tipo):
+    # Descarga en streaming: ?formato=csv|jsonl&desde=AAAA-MM-DD&hasta=AAAA-MM-DD&estado=...
+    if tipo not in exportaciones.EXPORTACIONES:
+        raise Http404
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportaciones.FORMATOS:
+        formato = 'csv'
+    filas = exportaciones.filtrar(tipo, request.GET.get('desde'), request.GET.get('hasta'), request.GET.get('estado'))
+    # Las filas se leen al enviar la respuesta, ya fuera de la vista: se fija aquí la base
+    filas = filas.using(router.db_for_read(filas.model))
+    respuesta = StreamingHttpResponse(
+        exportaciones.generar(tipo, formato, filas), content_type=exportaciones.FORMATOS[formato]
+    )
+    nombre = f"{tipo}_{timezone.localdate():%Y%m%d}.{formato}"
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+
 @login_required(login_url='/login/')
+@leer_de_replica
 def mis_compras(request):
+    etag, modificado = revalidacion.validadores_compras(request)
+    no_modificado = revalidacion.no_modificado(request, etag, modificado)
+    if no_modificado is not None:
+        return no_modificado
+
     # Obtenemos solo los pedidos del usuario actual, ordenados por los más recientes
-    pedidos = Pedido.objects.filter(cliente=request.user).order_by('-fecha')
-    return render(request, 'mis_compras.html', {'pedidos': pedidos})
+    pedidos, siguiente = paginar_keyset(
+        Pedido.objects.filter(cliente=request.user),
+        tamano_pagina(request.GET.get('por_pagina')), request.GET.get('cursor'), ORDEN_PEDIDOS
+    )
+    respuesta = render(request, 'mis_compras.html', {
+        'pedidos': pedidos,
+        'siguiente_url': enlace_siguiente(request, siguiente),
+    })
+    return revalidacion.con_validadores(request, respuesta, etag, modificado)
 
 @staff_member_required
 def alternar_estado_usuario(request, usuario_id):
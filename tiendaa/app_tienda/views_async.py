@@ -0,0 +1,128 @@
+from functools import wraps
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import carrito as carrito_sesion
+from . import revalidacion
+from .models import Producto
+from .paginacion import apaginar_keyset
+from .reservas import aanotar_disponibles, aclave_carrito, aliberar, arenovar, reservar
+from .views import contexto_catalogo, filtros_catalogo
+
+# Catálogo y carrito para el despliegue ASGI (tiendaa/asgi.py usa
+# tiendaa/urls_asgi.py). Mismo comportamiento que las vistas de views.py,
+# pero las consultas y la sesión se esperan con await: un cliente lento no
+# ocupa un hilo del servidor mientras tanto.
+#
+# Lo que todavía es solo síncrono va con sync_to_async:
+# - reservar(): usa transaction.atomic y select_for_update.
+# - render(): los templates leen request.user y los roles, que se cargan
+#   de forma perezosa con el ORM síncrono.
+# - revalidacion.etag_catalogo(): por lo mismo (y la sesión).
+
+# Partes del cuerpo que se piden al hilo síncrono por cada salto
+PARTES_POR_SALTO = 64
+
+_render = sync_to_async(render)
+_reservar = sync_to_async(reservar)
+_etag_catalogo = sync_to_async(revalidacion.etag_catalogo)
+
+
+async def catalogo_publico(request):
+    etag = await _etag_catalogo(request)
+    no_modificado = revalidacion.no_modificado(request, etag)
+    if no_modificado is not None:
+        return no_modificado
+
+    productos, campos_orden, filtros = filtros_catalogo(request)
+    productos, siguiente = await apaginar_keyset(
+        productos, filtros['por_pagina'], request.GET.get('cursor'), campos_orden
+    )
+    await aanotar_disponibles(productos)
+
+    respuesta = await _render(request, 'catalogo.html', contexto_catalogo(request, productos, siguiente, filtros))
+    return revalidacion.con_validadores(request, respuesta, etag)
+
+
+async def ver_carrito(request):
+    carrito = await carrito_sesion.aobtener(request)
+    if carrito:
+        await arenovar(await aclave_carrito(request))
+
+    carrito, total = await carrito_sesion.aresolver(request, carrito)
+
+    return await _render(request, 'carrito.html', {
+        'carrito': carrito,
+        'total': total
+    })
+
+
+async def agregar_al_carrito(request, producto_id):
+    carrito = await carrito_sesion.aobtener(request)
+
+    id_str = str(producto_id)
+    try:
+        cantidad, disponible = await _reservar(await aclave_carrito(request), producto_id, carrito.get(id_str, 0) + 1)
+    except Producto.DoesNotExist:
+        raise Http404
+    if cantidad:
+        carrito[id_str] = cantidad
+        await carrito_sesion.aguardar(request, carrito)
+    return redirect('catalogo_publico')
+
+
+async def eliminar_del_carrito(request, producto_id):
+    carrito = await carrito_sesion.aobtener(request)
+    if str(producto_id) in carrito:
+        del carrito[str(producto_id)]
+        await carrito_sesion.aguardar(request, carrito)
+        await aliberar(await aclave_carrito(request), producto_id)
+    return redirect('carrito')
+
+
+async def actualizar_carrito(request, producto_id):
+    if request.method == 'POST':
+        cantidad = int(request.POST.get('cantidad', 1))
+        carrito = await carrito_sesion.aobtener(request)
+
+        id_str = str(producto_id)
+        if id_str in carrito:
+            cantidad, disponible = await _reservar(await aclave_carrito(request), producto_id, max(cantidad, 1))
+            if cantidad:
+                carrito[id_str] = cantidad
+            else:
+                del carrito[id_str]
+            await carrito_sesion.aguardar(request, carrito)
+
+    return redirect('carrito')
+
+
+async def _en_bloques(partes):
+    # Cada bloque se lee en el hilo síncrono compartido (thread_sensitive):
+    # el cursor de .iterator() y el archivo abierto siguen en el mismo hilo
+    siguiente_bloque = sync_to_async(lambda: list(islice(partes, PARTES_POR_SALTO)))
+    while bloque := await siguiente_bloque():
+        for parte in bloque:
+            yield parte
+
+
+def transmitir(vista):
+    """
+    Envuelve una vista síncrona que devuelve StreamingHttpResponse o
+    FileResponse para servirla por ASGI. Con un iterador síncrono Django
+    lee la respuesta completa a memoria antes de enviarla; aquí el cuerpo
+    pasa a un iterador async que se consume por bloques.
+    """
+    vista_sync = sync_to_async(vista)
+
+    @wraps(vista)
+    async def vista_async(request, *args, **kwargs):
+        respuesta = await vista_sync(request, *args, **kwargs)
+        if respuesta.streaming and not respuesta.is_async:
+            respuesta.streaming_content = _en_bloques(iter(respuesta.streaming_content))
+        return respuesta
+
+    return vista_async
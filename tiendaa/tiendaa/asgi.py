@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tiendaa.settings')
+# Catálogo y carrito con vistas async (ver tiendaa/urls_asgi.py). Las
+# respuestas en streaming (exportaciones, facturas, estáticos) van envueltas
+# en views_async.transmitir: con un iterador síncrono Django las leería
+# completas a memoria antes de enviarlas. Una vista nueva que devuelva
+# StreamingHttpResponse o FileResponse también debe pasar por ahí.
+os.environ.setdefault('TIENDA_URLCONF', 'tiendaa.urls_asgi')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,16 +44,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_tienda.medicion.MedicionConsultasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app_tienda.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'tiendaa.urls'
+# asgi.py cambia a tiendaa.urls_asgi (catálogo y carrito async)
+ROOT_URLCONF = os.environ.get('TIENDA_URLCONF', 'tiendaa.urls')
 
 TEMPLATES = [
     {
@@ -65,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app_tienda.roles.roles',
             ],
         },
     },
@@ -76,13 +81,101 @@ WSGI_APPLICATION = 'tiendaa.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Perfil de base de datos. Se elige con la variable de entorno TIENDA_BD;
+# comparar con `python manage.py bench_bd --comparar`.
+#   simple      db.sqlite3 tal cual: journal por defecto, una conexión por petición
+#   produccion  WAL (lectores y escritores no se bloquean entre sí), synchronous
+#               NORMAL, hasta BD_ESPERA_SEGUNDOS de espera ante un bloqueo, mmap,
+#               transacciones IMMEDIATE (toman el bloqueo de escritura al empezar
+#               en vez de fallar a mitad), conexiones persistentes y un alias
+#               'replica' de solo lectura para los reportes (app_tienda/replicas.py).
+#               La réplica es el mismo archivo abierto en solo lectura, o la
+#               copia replicada que indique TIENDA_BD_REPLICA.
+# WAL queda guardado en el archivo; `bench_bd --reiniciar-journal` lo devuelve a
+# DELETE. Los tests corren con el perfil simple.
+PRAGMAS_SQLITE = (
+    'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; '
+    'PRAGMA mmap_size=268435456; PRAGMA cache_size=-64000; PRAGMA temp_store=MEMORY'
+)
+PRAGMAS_SQLITE_LECTURA = 'PRAGMA mmap_size=268435456; PRAGMA cache_size=-64000; PRAGMA query_only=1'
+BD_ESPERA_SEGUNDOS = 20
+
+
+def bases_de_datos(perfil, archivo, replica=None):
+    # También para settings locales que apuntan a otro archivo
+    if perfil == 'simple':
+        return {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': archivo}}
+    if perfil != 'produccion':
+        raise ValueError(f'Perfil de base desconocido: {perfil}')
+    comun = {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True}
+    return {
+        'default': {
+            **comun,
+            'NAME': archivo,
+            'OPTIONS': {
+                'init_command': PRAGMAS_SQLITE,
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': BD_ESPERA_SEGUNDOS,
+            },
+        },
+        'replica': {
+            **comun,
+            'NAME': f'{Path(replica or archivo).resolve().as_uri()}?mode=ro',
+            'OPTIONS': {'init_command': PRAGMAS_SQLITE_LECTURA, 'timeout': BD_ESPERA_SEGUNDOS},
+            'TEST': {'MIRROR': 'default'},
+        },
     }
+
+
+BD_PERFIL = os.environ.get('TIENDA_BD', 'simple')
+DATABASES = bases_de_datos(BD_PERFIL, BASE_DIR / 'db.sqlite3', os.environ.get('TIENDA_BD_REPLICA'))
+DATABASE_ROUTERS = ['app_tienda.replicas.RouterReplica']
+# Tras escribir, la sesión lee de la principal este tiempo (atraso máximo de la réplica)
+REPLICA_ATRASO_SEGUNDOS = 10
+
+
+# Cachés: 'default' para datos compartidos (IVA, cupones, roles) y 'sesiones'
+# para los perfiles de sesión que usan caché. En memoria local cada proceso
+# tiene la suya; con TIENDA_CACHE_SESIONES=archivo las sesiones se guardan en
+# disco y las comparten todos los procesos del servidor.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sesiones': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sesiones',
+    } if os.environ.get('TIENDA_CACHE_SESIONES', 'memoria') == 'memoria' else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache_sesiones',
+        'TIMEOUT': 60 * 60 * 24 * 14,
+    },
+    # Tarjetas del catálogo ya renderizadas ({% cache %} en catalogo.html). La
+    # clave lleva la versión del producto: al editarlo, venderlo o devolverlo
+    # cambia `actualizado` y las entradas viejas salen por MAX_ENTRIES
+    'fragmentos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragmentos',
+        'OPTIONS': {'MAX_ENTRIES': 20_000},
+    },
 }
 
+# Perfil de sesiones (carrito, roles, reservas). Se elige con la variable de
+# entorno TIENDA_SESIONES; comparar con `python manage.py bench_sesiones`.
+#   db         tabla django_session (cada cambio del carrito escribe en SQLite)
+#   cached_db  lee de la caché y escribe en ambas: sobrevive a reinicios
+#   cache      solo caché: sin escrituras en SQLite, se pierde si la caché se vacía
+#   firmada    cookie firmada en el navegador: sin servidor, ideal para carritos anónimos
+PERFILES_SESION = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'firmada': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESION_PERFIL = os.environ.get('TIENDA_SESIONES', 'db')
+SESSION_ENGINE = PERFILES_SESION[SESION_PERFIL]
+SESSION_CACHE_ALIAS = 'sesiones'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -120,6 +213,75 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [ BASE_DIR / "static" ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Perfil de estáticos. Se elige con la variable de entorno TIENDA_ESTATICOS;
+# por defecto 'simple' con DEBUG y 'comprimidos' sin él.
+#   simple       los archivos tal cual, sin collectstatic (desarrollo y tests)
+#   comprimidos  collectstatic minifica CSS/JS, pone el hash del contenido en
+#                cada nombre y escribe variantes .gz/.br (ver app_tienda/estaticos.py).
+#                Requiere correr collectstatic antes de levantar el servidor
+PERFILES_ESTATICOS = {
+    'simple': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    'comprimidos': 'app_tienda.estaticos.EstaticosComprimidos',
+}
+ESTATICOS_PERFIL = os.environ.get('TIENDA_ESTATICOS', 'simple' if DEBUG else 'comprimidos')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': PERFILES_ESTATICOS[ESTATICOS_PERFIL]},
+}
+
+# Tareas en segundo plano (derivados de imágenes, etc.)
+TAREAS_TRABAJADORES = 2
+TAREAS_SINCRONAS = False
+
+# Segundos que un proceso usa el IVA leído sin volver a la base (ver app_tienda/iva.py)
+IVA_SEGUNDOS_MEMORIA = 30
+
+# Imágenes de la importación masiva (app_tienda/importacion.py): hosts de los
+# que se pueden descargar (vacío = cualquier host público; nunca la red
+# interna) y tamaño máximo de cada una
+IMPORTACION_ORIGENES_IMAGEN = []
+IMPORTACION_IMAGEN_MAXIMO_BYTES = 10 * 1024 * 1024
+
+# Minutos que un carrito aparta las unidades agregadas
+RESERVA_MINUTOS = 15
+
+# El usuario se carga junto con la versión de sus grupos (app_tienda/roles.py).
+# ModelBackend sigue en la lista para las sesiones abiertas con él antes.
+AUTHENTICATION_BACKENDS = [
+    'app_tienda.roles.BackendConRoles',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Consultas por petición (app_tienda/medicion.py). Con MEDICION_CABECERAS las
+# respuestas llevan X-Consultas y Server-Timing. Exceder el presupuesto de
+# una vista deja un aviso en el log, o un error si MEDICION_ESTRICTA; los
+# tests de app_tienda/tests.py fallan si alguna vista se pasa.
+MEDICION_CABECERAS = DEBUG or os.environ.get('TIENDA_MEDICION') == '1'
+MEDICION_ESTRICTA = False
+# Máximo de consultas por vista, incluidas sesión, usuario y roles (la primera
+# página de una sesión las lee todas y guarda los roles). Los tests miden cada
+# vista así, con sesión nueva y cachés vacías; dentro de la transacción del
+# test guardar la sesión cuenta 3 (SAVEPOINT, UPDATE, RELEASE). No debe
+# depender de cuántas filas se muestran. Catálogo, mis compras y factura
+# incluyen la consulta de revalidación (ETag); sus 304 cuestan menos.
+PRESUPUESTO_CONSULTAS = {
+    'catalogo_publico': 9,
+    'buscar': 9,
+    'carrito': 9,
+    'agregar_carrito': 14,
+    'actualizar_carrito': 12,
+    'eliminar_carrito': 6,
+    'checkout': 21,
+    'mis_compras': 8,
+    'ver_factura': 8,
+    'gestion_bodega': 7,
+    'imprimir_orden_despacho': 8,
+    'imprimir_despacho_lote': 8,
+    'reporte_financiero': 8,
+    'lista_usuarios': 8,
+}
 
 LOGIN_REDIRECT_URL = 'catalogo_publico'
 LOGOUT_ON_GET = True
@@ -19,8 +19,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from app_tienda import estaticos
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Con DEBUG, runserver los sirve antes de llegar aquí
+    path(f"{settings.STATIC_URL.lstrip('/')}<path:ruta>", estaticos.servir, name='estaticos'),
     path('', include('app_tienda.urls')), 
 ]
 
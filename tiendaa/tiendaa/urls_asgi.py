@@ -0,0 +1,26 @@
+"""
+URL configuration for the ASGI deployment (tiendaa/asgi.py).
+
+Same routes as tiendaa/urls.py, but the catalog and cart endpoints are served
+by the async views in app_tienda/views_async.py. Views that stream their
+body (exports, invoices, static files) are wrapped with
+views_async.transmitir so the body is sent in chunks instead of buffered.
+"""
+from django.conf import settings
+from django.urls import path
+
+from app_tienda import estaticos, views, views_async
+from .urls import urlpatterns as urlpatterns_comunes
+
+# Van primero: al resolver gana la primera ruta que coincide
+urlpatterns = [
+    path('', views_async.catalogo_publico, name='catalogo_publico'),
+    path('carrito/', views_async.ver_carrito, name='carrito'),
+    path('agregar-carrito/<int:producto_id>/', views_async.agregar_al_carrito, name='agregar_carrito'),
+    path('eliminar-carrito/<int:producto_id>/', views_async.eliminar_del_carrito, name='eliminar_carrito'),
+    path('actualizar-carrito/<int:producto_id>/', views_async.actualizar_carrito, name='actualizar_carrito'),
+    path('reporte/exportar/<str:tipo>/', views_async.transmitir(views.exportar_reporte), name='exportar_reporte'),
+    path('factura/<int:pedido_id>/', views_async.transmitir(views.ver_factura), name='ver_factura'),
+    path(f"{settings.STATIC_URL.lstrip('/')}<path:ruta>", views_async.transmitir(estaticos.servir), name='estaticos'),
+    *urlpatterns_comunes,
+]